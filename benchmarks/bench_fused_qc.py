@@ -0,0 +1,97 @@
+"""--------------------------------------------------------------------------------
+Benchmark of the fused QC engine (`utils.FusedQualityManagement`) against tsdat's
+`QualityManagement` on a synthetic ADCP-sized dataset (4 beams x 30 cells at 1 Hz)
+with missing, valid_min, and valid_max checks that remove failed values and record
+their results. Checks that both engines produce identical datasets.
+
+Usage: python -m benchmarks.bench_fused_qc [N_HOURS]
+
+--------------------------------------------------------------------------------"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from types import SimpleNamespace
+from tsdat.config import QualityManagerDefinition
+from tsdat.qc import QualityManagement
+from utils import FusedQualityManagement
+
+
+def make_config() -> SimpleNamespace:
+    checks = {
+        "manage_missing_values": ("CheckMissing", 1, "Missing"),
+        "manage_min": ("CheckValidMin", 2, "Below valid_range"),
+        "manage_max": ("CheckValidMax", 3, "Above valid_range"),
+    }
+    quality_managers = dict()
+    for name, (checker, bit, meaning) in checks.items():
+        definition = {
+            "checker": {"classname": f"tsdat.qc.checkers.{checker}"},
+            "handlers": [
+                {"classname": "tsdat.qc.handlers.RemoveFailedValues"},
+                {
+                    "classname": "tsdat.qc.handlers.RecordQualityResults",
+                    "parameters": {"bit": bit, "assessment": "Bad", "meaning": meaning},
+                },
+            ],
+            "variables": ["DATA_VARS"],
+        }
+        quality_managers[name] = QualityManagerDefinition(name, definition)
+    return SimpleNamespace(quality_managers=quality_managers)
+
+
+def make_adcp_dataset(n_hours: int, seed: int = 0) -> xr.Dataset:
+    rng = np.random.default_rng(seed)
+    n_time = n_hours * 3600
+    shape = (4, 30, n_time)
+    velocity = rng.normal(0, 1, shape).astype("float32")
+    velocity[:, 25:, :] = np.nan  # Above the surface
+    attrs = {"_FillValue": -9999.0, "valid_range": [-3, 3]}
+    return xr.Dataset(
+        {
+            "velocity": (("dir", "range", "time"), velocity, attrs),
+            "amplitude": (
+                ("beam", "range", "time"),
+                rng.uniform(0, 100, shape).astype("float32"),
+                {"_FillValue": -9999.0, "valid_range": [5, 95]},
+            ),
+            "correlation": (
+                ("beam", "range", "time"),
+                rng.uniform(0, 100, shape).astype("float32"),
+                {"_FillValue": -9999.0, "valid_range": [30, 100]},
+            ),
+            "depth": (("time",), rng.normal(10, 0.5, n_time), attrs),
+        },
+        coords={
+            "time": pd.date_range("2021-08-01", periods=n_time, freq="1s"),
+            "range": np.arange(30, dtype="float32") * 0.5 + 0.6,
+            "dir": ["E", "N", "U1", "U2"],
+            "beam": np.arange(1, 5, dtype="int32"),
+        },
+    )
+
+
+def timed(engine, n_hours: int):
+    ds = make_adcp_dataset(n_hours)
+    start = time.perf_counter()
+    ds = engine.run(ds, make_config(), None)
+    return ds, time.perf_counter() - start
+
+
+def main(n_hours: int = 6):
+    ds = make_adcp_dataset(n_hours)
+    print(f"ADCP dataset: {ds.nbytes / 2**20:.1f} MB in memory")
+
+    expected, elapsed = timed(QualityManagement, n_hours)
+    print(f"  {'tsdat QualityManagement:':<30}{elapsed:.3f}s")
+
+    actual, elapsed = timed(FusedQualityManagement, n_hours)
+    xr.testing.assert_identical(actual, expected)
+    print(f"  {'FusedQualityManagement:':<30}{elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
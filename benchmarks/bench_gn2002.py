@@ -0,0 +1,58 @@
+"""--------------------------------------------------------------------------------
+Benchmark of Goring & Nikora 2002 despiking on synthetic Spotter displacements.
+Compares `dolfyn.adv.clean.GN2002` with the block-parallel `despike_gn2002` used by
+the wave_clallam `GoringNikora2002` checker, and checks that their masks match.
+
+Usage: python -m benchmarks.bench_gn2002 [N_DAYS] [N_POINTS]
+
+--------------------------------------------------------------------------------"""
+import os
+import sys
+import time
+
+import numpy as np
+
+from dolfyn.adv.clean import GN2002
+from ingest.wave_clallam.pipeline.qc import despike_gn2002
+
+
+def make_displacement(n_days: float, seed: int = 0) -> np.ndarray:
+    # 2.5 Hz x/y/z displacements in mm: 8 s waves plus noise, with 0.5% spikes and a
+    # few gaps
+    rng = np.random.default_rng(seed)
+    n_time = int(n_days * 86400 * 2.5)
+    phase = np.arange(n_time) / 2.5 / 8 * 2 * np.pi
+    displacement = np.stack(
+        [
+            400 * np.sin(phase + offset) + rng.normal(0, 20, n_time)
+            for offset in (0, 1, 2)
+        ]
+    )
+    spikes = rng.integers(0, n_time, n_time // 200)
+    displacement[:, spikes] += rng.normal(0, 2000, (3, len(spikes)))
+    for start in rng.integers(0, n_time, 3):
+        displacement[:, start : start + 600] = np.nan
+    return displacement
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(n_days: float = 7, npt: int = 1000):
+    displacement = make_displacement(n_days)
+    print(f"Synthetic displacement: {displacement.shape[1]} samples x 3 directions")
+
+    expected, elapsed = timed(GN2002, displacement, npt=npt)
+    print(f"  {'dolfyn GN2002:':<28}{elapsed:.3f}s ({expected.sum()} spikes)")
+
+    for workers in sorted({1, os.cpu_count() or 1}):
+        actual, elapsed = timed(despike_gn2002, displacement, npt, workers)
+        assert np.array_equal(actual, expected), "Masks differ from GN2002"
+        print(f"  {f'despike_gn2002 ({workers} workers):':<28}{elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main(*[float(arg) for arg in sys.argv[1:2]], *[int(arg) for arg in sys.argv[2:3]])
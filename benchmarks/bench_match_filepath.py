@@ -0,0 +1,67 @@
+"""--------------------------------------------------------------------------------
+Benchmark for `PipelineCache._match_key` on a large synthetic list of archived
+filepaths. Compares the indexed `PatternMatcher` against the previous approach of
+running every registered regex against every filepath.
+
+Usage: python -m benchmarks.bench_match_filepath [N_FILES] [N_PATTERNS]
+
+--------------------------------------------------------------------------------"""
+import random
+import re
+import sys
+import time
+
+from utils import PatternMatcher
+
+
+def make_patterns(n_patterns: int):
+    patterns = [r"\d{4}_FLT.CSV", r"\d{4}_LOC.CSV", r".*_sea_spider.ad2cp"]
+    for i in range(n_patterns - len(patterns)):
+        patterns.append(rf".*/site{i:03d}/.*\.instrument{i:03d}\.(raw|dat)")
+    return [re.compile(pattern) for pattern in patterns]
+
+
+def make_filepaths(n_files: int, n_patterns: int, seed: int = 0):
+    rng = random.Random(seed)
+    filepaths = list()
+    for n in range(n_files):
+        kind = rng.randrange(4)
+        if kind == 0:
+            filepaths.append(f"{n % 10000:04d}_FLT.CSV")
+        elif kind == 1:
+            filepaths.append(f"/archive/2021/08/{n:06d}_sea_spider.ad2cp")
+        elif kind == 2:
+            i = rng.randrange(max(1, n_patterns - 3))
+            filepaths.append(f"/archive/site{i:03d}/{n:06d}.instrument{i:03d}.raw")
+        else:
+            filepaths.append(f"/archive/unknown/{n:06d}.txt")
+    return filepaths
+
+
+def match_listcomp(patterns, filepath):
+    return [regex for regex in patterns if regex.match(filepath)]
+
+
+def main(n_files: int = 100_000, n_patterns: int = 50):
+    patterns = make_patterns(n_patterns)
+    filepaths = make_filepaths(n_files, n_patterns)
+
+    start = time.perf_counter()
+    expected = [tuple(match_listcomp(patterns, path)) for path in filepaths]
+    baseline = time.perf_counter() - start
+
+    matcher = PatternMatcher()
+    for regex in patterns:
+        matcher.add(regex)
+    start = time.perf_counter()
+    actual = [matcher.match(path) for path in filepaths]
+    indexed = time.perf_counter() - start
+
+    assert actual == expected
+    print(f"{n_files} filepaths x {n_patterns} patterns")
+    print(f"  list comprehension: {baseline:8.3f}s")
+    print(f"  PatternMatcher:     {indexed:8.3f}s  ({baseline / indexed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
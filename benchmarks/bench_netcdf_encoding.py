@@ -0,0 +1,96 @@
+"""--------------------------------------------------------------------------------
+Benchmark of netCDF encoding policies (see `utils.netcdf_encoding`) on synthetic
+datasets shaped like the ADCP (current_mcrl, see `benchmarks.synthetic`) and Spotter
+(wave_clallam) datasets. Reports the write time, full read time, and file size of each
+policy.
+
+Usage: python -m benchmarks.bench_netcdf_encoding [N_HOURS]
+
+--------------------------------------------------------------------------------"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from benchmarks.synthetic import make_adcp_dataset
+from utils import netcdf_encoding
+
+POLICIES = {
+    "none": None,
+    "zlib1 (legacy)": {"default": {"zlib": True, "complevel": 1}},
+    "zlib1+shuffle": {
+        "default": {"zlib": True, "complevel": 1, "shuffle": True},
+        "min_size": 4096,
+    },
+    "zlib4+shuffle": {
+        "default": {"zlib": True, "complevel": 4, "shuffle": True},
+        "min_size": 4096,
+    },
+    "zlib1+shuffle+chunks": {
+        "default": {"zlib": True, "complevel": 1, "shuffle": True},
+        "min_size": 4096,
+        "time_chunk": 3600,
+    },
+}
+
+
+def make_spotter_dataset(n_hours: int, seed: int = 0) -> xr.Dataset:
+    # 2.5 Hz displacements in mm, as read from the Spotter FLT files
+    rng = np.random.default_rng(seed)
+    n_time = int(n_hours * 3600 * 2.5)
+    time = pd.date_range("2021-08-01", periods=n_time, freq="400ms")
+    phase = np.linspace(0, n_time / 2.5 / 8 * 2 * np.pi, n_time)
+    displacement = np.stack(
+        [
+            400 * np.sin(phase + offset) + rng.normal(0, 20, n_time)
+            for offset in (0, 1, 2)
+        ]
+    ).round()
+    return xr.Dataset(
+        {"displacement": (("dir", "time"), displacement.astype("float64"))},
+        coords={"time": time, "dir": ["x", "y", "z"]},
+    )
+
+
+def bench(ds: xr.Dataset, policy, directory: str):
+    filename = os.path.join(directory, "bench.nc")
+    kwargs = dict(format="NETCDF4")
+    if policy is not None:
+        kwargs["encoding"] = netcdf_encoding(ds, policy)
+
+    start = time.perf_counter()
+    ds.to_netcdf(filename, **kwargs)
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    xr.load_dataset(filename)
+    read = time.perf_counter() - start
+
+    size = os.path.getsize(filename)
+    os.remove(filename)
+    return write, read, size
+
+
+def main(n_hours: int = 6):
+    datasets = {
+        "ADCP": make_adcp_dataset(n_hours * 3600),
+        "Spotter": make_spotter_dataset(n_hours),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name, ds in datasets.items():
+            print(f"{name} dataset: {ds.nbytes / 2**20:.1f} MB in memory")
+            print(f"  {'policy':<22}{'write (s)':>10}{'read (s)':>10}{'size (MB)':>11}")
+            for policy_name, policy in POLICIES.items():
+                write, read, size = bench(ds, policy, directory)
+                print(
+                    f"  {policy_name:<22}{write:>10.3f}{read:>10.3f}"
+                    f"{size / 2**20:>11.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,68 @@
+"""--------------------------------------------------------------------------------
+Benchmark for `SpotterFltFileHandler.read` on a large synthetic Spotter FLT file.
+Compares the typed, column-selective read (with the C and pyarrow engines) against
+the previous approach of inferring every column's type and stacking the columns
+with `np.array`.
+
+Usage: python -m benchmarks.bench_spotter_csv [N_DAYS]
+
+--------------------------------------------------------------------------------"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from benchmarks.synthetic import make_flt_file
+from ingest.wave_clallam.pipeline.filehandler import SpotterFltFileHandler
+
+
+def read_previous(filename: str) -> xr.Dataset:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        df = pd.read_csv(filename, delimiter=",", index_col=False)
+    return xr.Dataset(
+        data_vars={
+            "displacement": (
+                ["dir", "time"],
+                np.array([df["outx(mm)"], df["outy(mm)"], df["outz(mm)"]]),
+            ),
+            "t_elapsed": (["time"], df["millis"]),
+        },
+        coords={
+            "dir": ("dir", ["x", "y", "z"]),
+            "time": ("time", df["GPS_Epoch_Time(s)"]),
+        },
+    )
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(n_days: float = 7):
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "0001_FLT.CSV")
+        n_rows = int(n_days * 86400 * 2.5)
+        make_flt_file(filename, n_rows)
+        size = os.path.getsize(filename) / 2**20
+        print(f"Synthetic FLT file: {n_rows} rows, {size:.1f} MB")
+
+        expected, elapsed = timed(read_previous, filename)
+        print(f"  {'previous read:':<22}{elapsed:.3f}s")
+
+        for engine in ["c", "pyarrow"]:
+            handler = SpotterFltFileHandler(parameters={"engine": engine})
+            actual, elapsed = timed(handler.read, filename)
+            xr.testing.assert_allclose(actual, expected.astype("float64"))
+            print(f"  {f'typed read ({engine}):':<22}{elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main(*[float(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,351 @@
+"""--------------------------------------------------------------------------------
+Benchmark suite for the ingests. Times each input file handler and each stage of the
+wave_clallam (motion and gps), current_mcrl, and current_vm_mcrl pipelines (see
+`utils.profiling.StageTimer`) on synthetic data (see `benchmarks.synthetic`) of
+several sizes, and writes the best time of each benchmark to a JSON file.
+
+The results can be compared against a baseline from a previous run (e.g., on the
+main branch) on the same machine. The suite fails (exits with status 1) if any
+benchmark is more than `--threshold` slower than its baseline, ignoring differences
+of less than `--min-seconds`.
+
+The current_mcrl and current_vm_mcrl pipelines read the synthetic ADCP data from a
+netCDF file instead of an .ad2cp file, so their `read_and_persist_raw` stages time
+the handlers' cleaning but not dolfyn's binary parsing.
+
+Usage:
+    python -m benchmarks.suite [--sizes small,medium] [--repeat 3] [--output FILE]
+        [--baseline FILE] [--threshold 0.25] [--min-seconds 0.01]
+
+    # Save a baseline, make changes, then check them for regressions
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --baseline baseline.json
+
+--------------------------------------------------------------------------------"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import matplotlib
+import xarray as xr
+import yaml
+
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from tsdat import FileHandler
+from benchmarks.synthetic import make_adcp_dataset, make_flt_file, make_loc_file
+from ingest.current_mcrl.pipeline.filehandler import AdcpUpHandler
+from ingest.current_vm_mcrl.pipeline.filehandler import AdcpDownHandler
+from ingest.wave_clallam.pipeline.filehandler import (
+    SpotterFltFileHandler,
+    SpotterLocFileHandler,
+)
+from utils import IngestSpec, LazyJson, expand, get_tail_cache, logger, set_env
+
+# Hours of data in each size of synthetic input
+SIZES = {"small": 1, "medium": 6, "large": 24}
+
+INGESTS = {
+    "wave": ("wave_clallam", "pipeline_config_clallam_wave.yml"),
+    "gps": ("wave_clallam", "pipeline_config_clallam_gps.yml"),
+    "current": ("current_mcrl", "pipeline_config_mcrl.yml"),
+    "vessel": ("current_vm_mcrl", "pipeline_config_vm.yml"),
+}
+STORAGE_CONFIGS = {
+    "wave_clallam": "storage_config_clallam.yml",
+    "current_mcrl": "storage_config_mcrl.yml",
+    "current_vm_mcrl": "storage_config_vm.yml",
+}
+
+
+class _SyntheticAdcpUpHandler(AdcpUpHandler):
+    # Reads the raw (synthetic) ADCP dataset from a netCDF file instead of parsing
+    # an .ad2cp file with dolfyn, then cleans it like the lander's handler does
+    def read(self, filename: str, **kwargs) -> xr.Dataset:
+        return self._clean(xr.load_dataset(filename))
+
+
+class _SyntheticAdcpDownHandler(AdcpDownHandler):
+    # Same as above, for the vessel's (downward-looking) handler
+    def read(self, filename: str, **kwargs) -> xr.Dataset:
+        return self._clean(xr.load_dataset(filename))
+
+
+# The input file pattern and synthetic handler of the ingests that read .ad2cp files
+SYNTHETIC_HANDLERS = {
+    "current_mcrl": (".*_sea_spider.ad2cp", _SyntheticAdcpUpHandler),
+    "current_vm_mcrl": (".*_Desdemona.ad2cp", _SyntheticAdcpDownHandler),
+}
+
+
+class _StageRecords(logging.Handler):
+    # Collects the records that pipelines log when `PIPELINE_TIMING` is set
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.records: List[Dict] = list()
+
+    def emit(self, record: logging.LogRecord):
+        if isinstance(record.msg, LazyJson) and "Stages" in record.msg.fields():
+            self.records.append(record.msg.fields())
+
+
+def best_time(
+    func: Callable, repeat: int, setup: Callable = None
+) -> Tuple[float, object]:
+    # The minimum is the least noisy estimate of the time the code itself takes
+    times, result = list(), None
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def handler_parameters(ingest: str, name: str) -> Dict:
+    config = expand(f"config/{STORAGE_CONFIGS[ingest]}", f"ingest/{ingest}/")
+    with open(config) as file:
+        storage = yaml.safe_load(file)["storage"]
+    return storage["file_handlers"]["input"][name].get("parameters") or {}
+
+
+def bench_handlers(directory: str, size: str, repeat: int) -> Dict[str, float]:
+    hours = SIZES[size]
+    results = dict()
+
+    csv_handlers = {
+        "SpotterFltFileHandler.read": (
+            SpotterFltFileHandler(handler_parameters("wave_clallam", "wave_motion")),
+            make_flt_file(os.path.join(directory, "0001_FLT.CSV"), hours * 9000),
+        ),
+        "SpotterLocFileHandler.read": (
+            SpotterLocFileHandler(handler_parameters("wave_clallam", "gps")),
+            make_loc_file(os.path.join(directory, "0001_LOC.CSV"), hours * 3600),
+        ),
+    }
+    for name, (handler, filename) in csv_handlers.items():
+        results[name], _ = best_time(handler.read, repeat, lambda: (filename,))
+
+    # The cleaning steps modify the dataset in place, so each repeat gets a copy
+    raw = make_adcp_dataset(hours * 3600)
+    adcp_handlers = {
+        "AdcpUpHandler._clean": (
+            AdcpUpHandler(handler_parameters("current_mcrl", "lander")),
+            raw,
+        ),
+        "AdcpDownHandler._clean": (
+            AdcpDownHandler(handler_parameters("current_vm_mcrl", "vessel")),
+            raw.assign_attrs(orientation="down"),
+        ),
+    }
+    for name, (handler, ds) in adcp_handlers.items():
+        results[name], _ = best_time(
+            handler._clean, repeat, lambda: (ds.copy(deep=True),)
+        )
+
+    return {f"handlers/{size}/{name}": value for name, value in results.items()}
+
+
+def bench_pipelines(directory: str, size: str, repeat: int) -> Dict[str, float]:
+    hours = SIZES[size]
+    inputs = {
+        "wave": make_flt_file(os.path.join(directory, "0001_FLT.CSV"), hours * 9000),
+        "gps": make_loc_file(os.path.join(directory, "0001_LOC.CSV"), hours * 3600),
+        "current": os.path.join(directory, "bench_sea_spider.ad2cp"),
+        "vessel": os.path.join(directory, "bench_Desdemona.ad2cp"),
+    }
+    raw = make_adcp_dataset(hours * 3600)
+    raw.to_netcdf(inputs["current"])
+    raw.assign_attrs(orientation="down").to_netcdf(inputs["vessel"])
+
+    records = _StageRecords()
+    logger.addHandler(records)
+    results = dict()
+    try:
+        for name, (ingest, pipeline_config) in INGESTS.items():
+            stages: Dict[str, List[float]] = dict()
+            for i in range(repeat):
+                # Every repeat starts from an empty store, so they all do the same work
+                os.environ["ROOT_DIR"] = os.path.join(directory, f"storage_{name}_{i}")
+                get_tail_cache().clear()
+                pipeline = _instantiate(ingest, pipeline_config, name)
+                records.records.clear()
+                if ingest == "wave_clallam":
+                    pipeline.run_daily(inputs[name])
+                else:
+                    pipeline.run(inputs[name])
+                for record in records.records:
+                    for stage, timing in record["Stages"].items():
+                        stages.setdefault(stage, list()).append(timing["Wall"])
+                    stages.setdefault("total", list()).append(record["Wall"])
+            for stage, times in stages.items():
+                results[f"pipelines/{size}/{name}/{stage}"] = min(times)
+    finally:
+        logger.removeHandler(records)
+    return results
+
+
+def _instantiate(ingest: str, pipeline_config: str, name: str):
+    parent = f"ingest/{ingest}/"
+    spec = IngestSpec(
+        pipeline=importlib.import_module(f"ingest.{ingest}").Pipeline,
+        pipeline_config=expand(f"config/{pipeline_config}", parent),
+        storage_config=expand(f"config/{STORAGE_CONFIGS[ingest]}", parent),
+        name=name,
+    )
+    # tsdat registers file handlers globally, and loose patterns from one ingest
+    # (e.g., ".*.nc") can match another's (temporary) input files, so each pipeline
+    # runs with only its own handlers, as it would in its own process
+    FileHandler.FILEREADERS.clear()
+    FileHandler.FILEWRITERS.clear()
+    pipeline = spec.instantiate(use_cache=False)
+    if ingest in SYNTHETIC_HANDLERS:
+        pattern, handler = SYNTHETIC_HANDLERS[ingest]
+        parameters = FileHandler.FILEREADERS[pattern].parameters
+        FileHandler.register_file_handler("read", pattern, handler(parameters))
+    return pipeline
+
+
+def compare(
+    results: Dict[str, float],
+    baseline: Dict[str, float],
+    threshold: float = 0.25,
+    min_seconds: float = 0.01,
+) -> List[Tuple[str, float, float]]:
+    """----------------------------------------------------------------------------
+    Compares benchmark results against a baseline.
+
+    Args:
+        results (Dict[str, float]): The time of each benchmark, in seconds.
+        baseline (Dict[str, float]): The baseline time of each benchmark. Benchmarks
+        missing from either one are not compared.
+        threshold (float, optional): The fraction by which a benchmark may be slower
+        than its baseline. Defaults to 0.25.
+        min_seconds (float, optional): Slowdowns smaller than this many seconds are
+        considered noise. Defaults to 0.01.
+
+    Returns:
+        List[Tuple[str, float, float]]: The (name, baseline, result) of each
+        benchmark that regressed.
+
+    ----------------------------------------------------------------------------"""
+    regressions = list()
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if value > base * (1 + threshold) and value - base > min_seconds:
+            regressions.append((name, base, value))
+    return regressions
+
+
+def run(sizes: List[str], repeat: int) -> Dict[str, float]:
+    results = dict()
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            print(f"Running the {size} ({SIZES[size]}h) benchmarks...", flush=True)
+            results.update(bench_handlers(directory, size, repeat))
+            results.update(bench_pipelines(directory, size, repeat))
+    return results
+
+
+def report(results: Dict[str, float], baseline: Optional[Dict[str, float]] = None):
+    baseline = baseline or {}
+    for name, value in results.items():
+        line = f"  {name:<58}{value:>9.4f}s"
+        if name in baseline and baseline[name] > 0:
+            line += f"  ({value / baseline[name]:.2f}x baseline)"
+        print(line)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.suite",
+        description="Times the ingests' file handlers and pipeline stages.",
+    )
+    parser.add_argument(
+        "--sizes",
+        default="small,medium",
+        help=f"Comma-separated sizes of data to run ({', '.join(SIZES)})",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per benchmark; the best is kept"
+    )
+    parser.add_argument("--output", help="Path to write the results to (JSON)")
+    parser.add_argument("--baseline", help="Path to results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Fail if a benchmark is this fraction slower than its baseline",
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.01,
+        help="Ignore slowdowns of less than this many seconds",
+    )
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes.split(",")
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"Unknown sizes: {unknown}")
+
+    os.environ["PIPELINE_TIMING"] = "True"
+    root_dir = os.environ.get("ROOT_DIR")
+    set_env(LOG_LEVEL="WARNING")
+    # The stage timings are logged at the INFO level
+    logger.setLevel(min(logger.getEffectiveLevel(), logging.INFO))
+    matplotlib.use("Agg")
+    try:
+        results = run(sizes, max(1, args.repeat))
+    finally:
+        if root_dir is None:
+            os.environ.pop("ROOT_DIR", None)
+        else:
+            os.environ["ROOT_DIR"] = root_dir
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["Results"]
+    report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "Created": datetime.now(timezone.utc).isoformat(),
+                    "Machine": {
+                        "Platform": platform.platform(),
+                        "Python": platform.python_version(),
+                        "CPUs": os.cpu_count(),
+                    },
+                    "Sizes": sizes,
+                    "Repeat": args.repeat,
+                    "Results": results,
+                },
+                file,
+                indent=2,
+            )
+        print(f"Results written to {args.output}")
+
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.threshold, args.min_seconds)
+    for name, base, value in regressions:
+        print(f"REGRESSION {name}: {base:.4f}s -> {value:.4f}s")
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
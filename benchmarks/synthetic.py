@@ -0,0 +1,150 @@
+"""--------------------------------------------------------------------------------
+Generators of synthetic input data for the benchmarks: Spotter FLT (motion) and LOC
+(gps) csv files written like the ones on the Spotter's SD card, and datasets shaped
+like what `dolfyn.read()` returns for the Nortek Signature ADCP on the MCRL lander,
+so that the ADCP handlers' post-read code paths can be driven without .ad2cp files.
+
+--------------------------------------------------------------------------------"""
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+# 2021-08-04 00:00:01 UTC, the start of the clallam deployment's data
+START_EPOCH = 1628035201.0
+
+
+def make_flt_file(filename: str, n_rows: int, seed: int = 0, start=START_EPOCH):
+    # 2.5 Hz displacements in mm
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "millis": np.arange(n_rows) * 400 + 1158,
+            "GPS_Epoch_Time(s)": start + np.arange(n_rows) * 0.4,
+            "outx(mm)": rng.integers(-2000, 2000, n_rows),
+            "outy(mm)": rng.integers(-2000, 2000, n_rows),
+            "outz(mm)": rng.integers(-2000, 2000, n_rows),
+            "INIT_flag": np.zeros(n_rows, dtype=int),
+        }
+    )
+    df.to_csv(filename, index=False, float_format="%.3f")
+    return filename
+
+
+def make_loc_file(filename: str, n_rows: int, seed: int = 0, start=START_EPOCH):
+    # 1 Hz positions, drifting around the mooring in Clallam Bay
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "GPS_Epoch_Time(s)": (start + np.arange(n_rows)).astype(int),
+            "lat(deg)": np.full(n_rows, 48),
+            "lat(min*1e5)": 1534000 + rng.integers(-500, 500, n_rows),
+            "long(deg)": np.full(n_rows, -124),
+            "long(min*1e5)": 1540000 + rng.integers(-500, 500, n_rows),
+        }
+    )
+    df.to_csv(filename, index=False)
+    return filename
+
+
+def make_adcp_dataset(n_times: int, n_cells: int = 30, seed: int = 0) -> xr.Dataset:
+    """----------------------------------------------------------------------------
+    Creates a dataset with the variables, dimensions, and attributes `dolfyn.read()`
+    returns for an upward-looking Nortek Signature1000 in earth coordinates, with
+    4-beam ensembles and 5th-beam ensembles at 1 Hz and a tidal water level, so that
+    the surface detection and correlation filters in the ADCP handlers do real work.
+
+    Args:
+        n_times (int): The number of ensembles.
+        n_cells (int, optional): The number of range cells. Defaults to 30.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        xr.Dataset: The raw ADCP dataset.
+
+    ----------------------------------------------------------------------------"""
+    rng = np.random.default_rng(seed)
+    time = START_EPOCH + np.arange(n_times, dtype="float64")
+    cells = 0.35 * np.arange(1, n_cells + 1) + 0.5
+    # M2 tide around a 9 m mean depth, so the upper cells are sometimes in the air
+    tide = np.sin(2 * np.pi * np.arange(n_times) / 44712)
+    depth = 9 + 2 * tide
+
+    def random(shape, low=-1.0, high=1.0):
+        return rng.uniform(low, high, shape).astype("float32")
+
+    # Echo amplitude drops with range and peaks at the surface
+    amp = 80 - cells[None, :, None] + random((4, n_cells, n_times), 0, 5)
+    surface = np.abs(cells[None, :, None] - depth[None, None, :]) < 0.5
+    amp = np.where(surface, 100, amp).astype("float32")
+
+    ds = xr.Dataset(
+        {
+            "vel": (
+                ("dir", "range", "time"),
+                # Tidal currents plus noise, so the data compress like real data
+                (tide[None, None, :] + 0.1 * random((4, n_cells, n_times))).astype(
+                    "float32"
+                ),
+            ),
+            "vel_b5": (("range_b5", "time_b5"), random((n_cells, n_times))),
+            "amp": (("beam", "range", "time"), amp),
+            "amp_b5": (("range_b5", "time_b5"), amp[0]),
+            "corr": (("beam", "range", "time"), random((4, n_cells, n_times), 30, 100)),
+            "corr_b5": (("range_b5", "time_b5"), random((n_cells, n_times), 30, 100)),
+            "heading": (("time",), random(n_times, 0, 360)),
+            "pitch": (("time",), random(n_times)),
+            "roll": (("time",), random(n_times)),
+            "quaternion": (("q", "time"), random((4, n_times))),
+            "quaternion_b5": (("q", "time_b5"), random((4, n_times))),
+            "accel": (("dirIMU", "time"), random((3, n_times))),
+            "angrt": (("dirIMU", "time"), random((3, n_times))),
+            "mag": (("dirIMU", "time"), random((3, n_times))),
+            "accel_b5": (("dirIMU", "time_b5"), random((3, n_times))),
+            "angrt_b5": (("dirIMU", "time_b5"), random((3, n_times))),
+            "mag_b5": (("dirIMU", "time_b5"), random((3, n_times))),
+            "beam2inst_orientmat": (("x", "x*"), np.eye(4)),
+            "orientmat": (
+                ("earth", "inst", "time"),
+                np.repeat(np.eye(3, dtype="float32")[:, :, None], n_times, axis=2),
+            ),
+            "c_sound": (("time",), random(n_times, 1490, 1500)),
+            "pressure": (("time",), (depth - 0.6).astype("float32")),
+            "temp": (("time",), random(n_times, 11, 13)),
+            "ensemble": (("time",), np.arange(n_times, dtype="uint32")),
+            "ensemble_b5": (("time_b5",), np.arange(n_times, dtype="uint32")),
+            "error": (("time",), np.zeros(n_times, dtype="uint32")),
+            "error_b5": (("time_b5",), np.zeros(n_times, dtype="uint32")),
+            "batt": (("time",), random(n_times, 14, 15)),
+        },
+        coords={
+            "time": time,
+            "time_b5": time + 0.5,
+            "range": cells,
+            "range_b5": cells,
+            "dir": ["E", "N", "U1", "U2"],
+            "dirIMU": ["E", "N", "U"],
+            "beam": [1, 2, 3, 4],
+            "earth": ["E", "N", "U"],
+            "inst": ["X", "Y", "Z"],
+            "q": ["w", "x", "y", "z"],
+            "x": [1, 2, 3, 4],
+            "x*": [1, 2, 3, 4],
+        },
+        attrs={
+            "fs": 1,
+            "coord_sys": "earth",
+            "inst_type": "ADCP",
+            "inst_make": "Nortek",
+            "inst_model": "Signature1000",
+            "orientation": "up",
+            "beam_angle": 25,
+            "cell_size": 0.35,
+            "blank_dist": 0.1,
+            "has_imu": 1,
+            "rotate_vars": ["vel", "accel", "angrt", "mag"],
+            "config_filename": "synthetic",
+        },
+    )
+    ds["vel"].attrs["units"] = "m s-1"
+    ds["corr"].attrs["units"] = "%"
+    return ds
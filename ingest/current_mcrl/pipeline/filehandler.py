@@ -4,14 +4,37 @@ import os
 
 import dolfyn as dlfn
 from dolfyn.adp import api
+from dolfyn.io.nortek2_lib import get_index
 from tsdat import AbstractFileHandler
 from tsdat.utils import DSUtil
 from tsdat.config import Config
+from utils import netcdf_encoding, partition_by_time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 
 
 class AdcpUpHandler(AbstractFileHandler):
     """-------------------------------------------------------------------
     Custom file handler for reading ADCP binary files.
+
+    Long deployments can be read in blocks of ensembles to bound the memory
+    used while reading and cleaning the data. Blocks are enabled by setting
+    either of the following optional parameters in the storage config file:
+
+    .. code-block:: yaml
+
+        parameters:
+          # Upper bound (in MB) on the memory used to read and clean a block
+          max_block_memory: 1024
+          # Upper bound on the number of ensembles in a block
+          block_ensembles: 100000
+
+    Only the working memory of dolfyn's reader and the cleaning steps is
+    bounded by these; `read()` still returns the whole deployment, which it
+    builds by concatenating the cleaned blocks, so its peak memory is about
+    twice the size of the cleaned dataset. Code that can process the data
+    one block at a time should use `read_blocks()` instead.
+
     -------------------------------------------------------------------"""
 
     def read(self, filename: str, **kwargs) -> xr.Dataset:
@@ -25,8 +48,54 @@ class AdcpUpHandler(AbstractFileHandler):
         Returns:
             xr.Dataset: An xr.Dataset object
         -------------------------------------------------------------------"""
+        if not self._is_blocked():
+            return self._clean(dlfn.read(filename))
 
-        ds = dlfn.read(filename)
+        return _concat_blocks(list(self.read_blocks(filename)))
+
+    def read_blocks(self, filename: str) -> Iterator[xr.Dataset]:
+        """-------------------------------------------------------------------
+        Reads the ADCP file one block of ensembles at a time and yields each
+        cleaned block. Every cleaning step operates on individual ensembles, so
+        concatenating the blocks along their time dimensions gives the same
+        dataset as reading and cleaning the whole file at once.
+
+        Args:
+            filename (str): The path to the ADCP file to read in.
+
+        Yields:
+            xr.Dataset: The cleaned dataset for each block, in time order.
+        -------------------------------------------------------------------"""
+        n_ensembles = _count_ensembles(filename)
+        block_size = min(
+            self.parameters.get("block_ensembles", n_ensembles), _PROBE_ENSEMBLES
+        )
+
+        start = 0
+        while start < n_ensembles:
+            stop = min(start + block_size, n_ensembles)
+            ds = dlfn.read(filename, nens=(start, stop))
+            if start == 0:
+                # Size the remaining blocks from the memory used by the first one
+                block_size = self._block_size(ds.nbytes / (stop - start))
+            yield self._clean(ds)
+            start = stop
+
+    def _is_blocked(self) -> bool:
+        return any(
+            key in self.parameters for key in ("max_block_memory", "block_ensembles")
+        )
+
+    def _block_size(self, bytes_per_ensemble: float) -> int:
+        block_size = self.parameters.get("block_ensembles", np.inf)
+        if "max_block_memory" in self.parameters:
+            max_bytes = self.parameters["max_block_memory"] * 2**20
+            block_size = min(
+                block_size, max_bytes / (bytes_per_ensemble * _MEMORY_OVERHEAD)
+            )
+        return max(1, int(block_size))
+
+    def _clean(self, ds: xr.Dataset) -> xr.Dataset:
 
         # The ADCP transducers were measured to be 0.6 m from the feet of the lander
         depth = self.parameters["depth"]
@@ -35,11 +104,11 @@ class AdcpUpHandler(AbstractFileHandler):
         # Locate surface using pressure data and remove data above it
         s = self.parameters["salinity"]
         api.clean.find_surface_from_P(ds, salinity=s)
-        ds = api.clean.nan_beyond_surface(ds)
+        api.clean.nan_beyond_surface(ds, inplace=True)
 
         # Clean out low correlation data
         thresh = self.parameters["corr_threshold"]
-        ds = api.clean.correlation_filter(ds, thresh=thresh)
+        api.clean.correlation_filter(ds, thresh=thresh, inplace=True)
 
         # Set declination (already in earth coordinates, so fixes in place)
         declin = self.parameters["magn_declination"]
@@ -60,6 +129,57 @@ class AdcpUpHandler(AbstractFileHandler):
         return ds.swap_dims({"x*": "inst*"})
 
 
+# Reading and cleaning a block holds roughly this many copies of the block's data
+_MEMORY_OVERHEAD = 3
+
+# The number of ensembles in the first block, which is read to measure the memory
+# used per ensemble before the size of the remaining blocks is chosen
+_PROBE_ENSEMBLES = 64
+
+
+def _count_ensembles(filename: str) -> int:
+    # Mirrors how dolfyn 1.3.0's `_Ad2cpReader` counts the ensembles `dlfn.read()`
+    # reads from a Signature file: one per change of the ensemble counter in the
+    # file's index, less the last one if it was cut short. These are dolfyn internals
+    # rather than a public API, which is one reason dolfyn is pinned in
+    # requirements.txt. `get_index()` builds (or reuses) the file's .index file,
+    # which `dlfn.read()` then reuses too.
+    index = get_index(filename)
+    first_pings = np.ones(index["ens"].shape, dtype=bool)
+    first_pings[1:] = np.diff(index["ens"]) != 0
+    positions = index["pos"][first_pings]
+    if len(positions) < 2:
+        return len(positions)
+
+    sizes, counts = np.unique(np.diff(positions), return_counts=True)
+    last_is_whole = os.path.getsize(filename) - positions[-1] == sizes[counts.argmax()]
+    return len(positions) - int(not last_is_whole)
+
+
+def _concat_blocks(blocks: List[xr.Dataset]) -> xr.Dataset:
+    # Signature datasets have several time dimensions (e.g., "time" and "time_b5"),
+    # so each one is concatenated separately and merged with the time-independent
+    # variables from the first block.
+    if len(blocks) == 1:
+        return blocks[0]
+
+    first = blocks[0]
+    time_dims = [dim for dim in first.dims if str(dim).startswith("time")]
+    parts = [first.drop_dims(time_dims)]
+    for dim in time_dims:
+        names = [name for name in first.data_vars if dim in first[name].dims]
+        parts.append(
+            xr.concat(
+                [block[names] for block in blocks],
+                dim=dim,
+                data_vars="minimal",
+                coords="minimal",
+                compat="override",
+            )
+        )
+    return xr.merge(parts, compat="override", combine_attrs="override")
+
+
 class NetCdfHandler(AbstractFileHandler):
     """FileHandler to read from and write to netCDF files. Takes a number of
     parameters that are passed in from the storage config file. Parameters
@@ -71,9 +191,17 @@ class NetCdfHandler(AbstractFileHandler):
           write:
             to_netcdf:
               # Parameters here will be passed to xr.Dataset.to_netcdf()
+            encoding:
+              # Optional per-variable / per-dtype encoding policy; see
+              # utils.netcdf_encoding() for the supported options
           read:
             load_dataset:
               # Parameters here will be passed to xr.load_dataset()
+            open_dataset:
+              # If provided, the file is opened lazily instead and these parameters
+              # are passed to xr.open_dataset() (e.g., chunks: {time: 3600})
+            variables:
+              # Optional list of the variables to read; others are never loaded
 
     :param parameters:
         Parameters that were passed to the FileHandler when it was registered
@@ -102,11 +230,22 @@ class NetCdfHandler(AbstractFileHandler):
             if variable.dtype == np.dtype("O") and "_FillValue" in variable.encoding:
                 del variable.encoding["_FillValue"]
 
-        ds.to_netcdf(filename, **to_netcdf_kwargs)
+        _to_netcdf(ds, filename, to_netcdf_kwargs, self._encoding_policy())
+
+    def _encoding_policy(self) -> Optional[Dict]:
+        write_params = self.parameters.get("write", {})
+        if "encoding" in write_params:
+            return write_params["encoding"]
+        # Legacy option to compress every variable
+        if write_params.get("compression", False):
+            return dict(default=dict(zlib=True, complevel=1))
+        return None
 
     def read(self, filename: str, **kwargs) -> xr.Dataset:
         """Reads in the given file and converts it into an Xarray dataset for
-        use in the pipeline.
+        use in the pipeline. If the 'open_dataset' read parameter is set, the
+        returned dataset is lazy and the file stays open until the dataset is
+        closed.
 
         :param filename: The path to the file to read in.
         :type filename: str
@@ -114,8 +253,17 @@ class NetCdfHandler(AbstractFileHandler):
         :rtype: xr.Dataset
         """
         read_params = self.parameters.get("read", {})
+        variables = read_params.get("variables")
+        if "open_dataset" in read_params:
+            ds = xr.open_dataset(filename, **read_params["open_dataset"])
+            return ds[variables] if variables else ds
+
         load_dataset_kwargs = read_params.get("load_dataset", {})
-        return xr.load_dataset(filename, **load_dataset_kwargs)
+        if not variables:
+            return xr.load_dataset(filename, **load_dataset_kwargs)
+
+        with xr.open_dataset(filename, **load_dataset_kwargs) as ds:
+            return ds[variables].load()
 
 
 class SplitNetCdfHandler(NetCdfHandler):
@@ -126,7 +274,11 @@ class SplitNetCdfHandler(NetCdfHandler):
         self, ds: xr.Dataset, filename: str, config: Config = None, **kwargs
     ) -> None:
         """Saves the given dataset to netCDF file(s) based on the 'time_interval'
-        and 'time_unit' config parameters.
+        and 'time_unit' config parameters. Every time dimension listed in the
+        'time_dims' parameter (by default, every datetime64 dimension) is split
+        at the same boundaries. If the 'workers' parameter is greater than 1,
+        the files are written concurrently by that many processes. Variables
+        are encoded according to the 'encoding' policy, if provided.
 
         :param ds: The dataset to save.
         :type ds: xr.Dataset
@@ -146,51 +298,67 @@ class SplitNetCdfHandler(NetCdfHandler):
             if variable.dtype == np.dtype("O") and "_FillValue" in variable.encoding:
                 del variable.encoding["_FillValue"]
 
-        # Option to compress netcdf files
-        compression = write_params.get("compression", False)
-        if compression:
-            enc = dict()
-            for ky in ds.variables:
-                enc[ky] = dict(zlib=True, complevel=1)
-            if "encoding" in to_netcdf_kwargs:
-                # Overwrite ('update') values in enc with whatever is in kwargs['encoding']
-                to_netcdf_kwargs["encoding"] = enc.update(to_netcdf_kwargs["encoding"])
-            else:
-                to_netcdf_kwargs["encoding"] = enc
-
-        interval = write_params.get("time_interval", "1")
+        interval = write_params.get("time_interval", 1)
         unit = write_params.get("time_unit", "D")
-
-        t1 = ds.time[0]
-        t2 = t1 + np.timedelta64(interval, unit)
-
-        # # Add other time variables
-        # t_coords = [t for t in ds.coords if np.issubdtype(ds[t].dtype, np.datetime64)]
-        # t_data = [t for t in ds.data_vars if np.issubdtype(ds[t].dtype, np.datetime64)]
-        # t_coords.extend(t_data)
+        time_dims = write_params.get("time_dims")
 
         # HACK: The first file is treated differently because FileHandlers are expected
         # to only write to one output file (the 'filename' provided as an argument).
-        ds_temp = ds.sel(time=slice(t1, t2))
-        ds_temp2 = ds_temp.sel(time_b5=slice(t1, t2))
-
-        ds_temp2.to_netcdf(filename, **to_netcdf_kwargs)
-        t1 = t2
-        t2 = t1 + np.timedelta64(interval, unit)
-
-        while t1 < ds.time[-1]:
-            ds_temp = ds.sel(time=slice(t1, t2))
-            ds_temp2 = ds_temp.sel(time_b5=slice(t1, t2))
+        datasets = partition_by_time(ds, interval, unit, time_dims)
+        partitions = [(datasets[0], filename, None)]
 
+        for ds_temp in datasets[1:]:
             temp_filedir = filename.rsplit("/")[:-1]
-            new_filename = DSUtil.get_dataset_filename(ds_temp2)
+            new_filename = DSUtil.get_dataset_filename(ds_temp)
             temp_filedir.append(new_filename)
             temp_filepath = "/" + os.path.join(
                 *temp_filedir
             )  # Write permission denied without "/"
 
-            ds_temp2.to_netcdf(temp_filepath, **to_netcdf_kwargs)
+            partitions.append((ds_temp, temp_filepath, new_filename))
+
+        # Compression dominates the cost of writing, so the files can optionally be
+        # written concurrently by separate processes (HDF5 is not thread-safe)
+        workers = write_params.get("workers", 1)
+        _write_partitions(
+            partitions, to_netcdf_kwargs, self._encoding_policy(), workers
+        )
+
+        for _, temp_filepath, new_filename in partitions[1:]:
             storage.save_local_path(temp_filepath, new_filename)
 
-            t1 = t2
-            t2 = t1 + np.timedelta64(interval, unit)
+
+def _write_partitions(
+    partitions: List[Tuple[xr.Dataset, str, Optional[str]]],
+    to_netcdf_kwargs: Dict,
+    encoding_policy: Optional[Dict] = None,
+    workers: int = 1,
+):
+    if workers <= 1 or len(partitions) <= 1:
+        for ds, filepath, _ in partitions:
+            _to_netcdf(ds, filepath, to_netcdf_kwargs, encoding_policy)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(partitions))) as executor:
+        futures = [
+            executor.submit(_to_netcdf, ds, filepath, to_netcdf_kwargs, encoding_policy)
+            for ds, filepath, _ in partitions
+        ]
+        for future in futures:
+            future.result()
+
+
+def _to_netcdf(
+    ds: xr.Dataset,
+    filepath: str,
+    to_netcdf_kwargs: Dict,
+    encoding_policy: Optional[Dict] = None,
+):
+    # The encoding is built for each file written because chunk sizes can't exceed
+    # the length of the (partitioned) time dimensions
+    if encoding_policy is not None:
+        to_netcdf_kwargs = dict(to_netcdf_kwargs)
+        to_netcdf_kwargs["encoding"] = netcdf_encoding(
+            ds, encoding_policy, to_netcdf_kwargs.get("encoding")
+        )
+    ds.to_netcdf(filepath, **to_netcdf_kwargs)
@@ -4,7 +4,7 @@ import matplotlib.pyplot as plt
 
 from typing import Dict
 from tsdat import DSUtil
-from utils import IngestPipeline
+from utils import IngestPipeline, axes_pixel_width, bin_to_pixels, decimate_minmax
 
 
 class Pipeline(IngestPipeline):
@@ -15,6 +15,9 @@ class Pipeline(IngestPipeline):
 
     --------------------------------------------------------------------------------"""
 
+    # Only these variables are read when plots are regenerated from saved files
+    plot_variables = ["speed", "speed_dir", "depth"]
+
     def hook_customize_raw_datasets(
         self, raw_dataset_mapping: Dict[str, xr.Dataset]
     ) -> Dict[str, xr.Dataset]:
@@ -132,19 +135,27 @@ class Pipeline(IngestPipeline):
                 nrows=2, ncols=1, figsize=(14, 8), constrained_layout=True
             )
 
+            # Draw at most one cell / a few line points per pixel column, so that
+            # plotting time does not grow with the length of the deployment
+            width = axes_pixel_width(ax[0])
+            speed = bin_to_pixels(ds.speed, width)
+            speed_dir = bin_to_pixels(ds.speed_dir, width, how="circmean")
+            bin_date = pd.to_datetime(speed.time.values)
+            depth = decimate_minmax(ds.depth.values, width)
+
             magn = ax[0].pcolormesh(
-                date, ds.range, ds.speed, cmap="Blues", shading="nearest"
+                bin_date, ds.range, speed, cmap="Blues", shading="nearest"
             )
-            ax[0].plot(date, ds.depth)
+            ax[0].plot(date[depth], ds.depth.values[depth])
             ax[0].set_xlabel("Time (UTC)")
             ax[0].set_ylabel(r"Range [m]")
             ax[0].set_ylim([0, 11])
             add_colorbar(ax[0], magn, r"Speed [m/s]")
 
             dirc = ax[1].pcolormesh(
-                date, ds.range, ds.speed_dir, cmap="twilight", shading="nearest"
+                bin_date, ds.range, speed_dir, cmap="twilight", shading="nearest"
             )
-            ax[1].plot(date, ds.depth)
+            ax[1].plot(date[depth], ds.depth.values[depth])
             ax[1].set_xlabel("Time (UTC)")
             ax[1].set_ylabel(r"Range [m]")
             ax[1].set_ylim([0, 11])
@@ -1,17 +1,24 @@
 from ingest.current_mcrl import Pipeline
-from utils import expand, set_env
+from utils import expand, set_env, IngestLedger
 from glob import glob
 import os
 
 
 if __name__ == "__main__":
+    # Files whose contents and configs are unchanged since the last run are skipped
     set_env()
-    pipeline = Pipeline(
+    ledger = IngestLedger()
+    configs = [
         expand("config/pipeline_config_mcrl.yml", __file__),
         expand("config/storage_config_mcrl.yml", __file__),
-    )
+    ]
+    pipeline = Pipeline(*configs)
 
     files = glob(os.path.join("ingest", "current_mcrl", "data", "*.ad2cp"))
     for fname in files:
         fname = os.path.join(*fname.rsplit("/")[2:])
-        pipeline.run(expand(fname, __file__))
+        fpath = expand(fname, __file__)
+        if ledger.is_processed(fpath, "current", configs):
+            continue
+        pipeline.run(fpath)
+        ledger.record(fpath, "current", configs, pipeline.output_files)
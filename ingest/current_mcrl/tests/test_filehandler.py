@@ -0,0 +1,143 @@
+import glob
+import os
+import shutil
+
+import dolfyn as dlfn
+import numpy as np
+import pytest
+import pandas as pd
+import xarray as xr
+
+from benchmarks.synthetic import make_adcp_dataset
+from ingest.current_mcrl.pipeline import filehandler
+from ingest.current_mcrl.pipeline.filehandler import (
+    AdcpUpHandler,
+    NetCdfHandler,
+    SplitNetCdfHandler,
+    _concat_blocks,
+    _count_ensembles,
+)
+
+
+def _signature_like_dataset(n: int, freq: str = "1s") -> xr.Dataset:
+    time = pd.date_range("2021-08-01", periods=n, freq=freq)
+    return xr.Dataset(
+        {
+            "vel": (("dir", "range", "time"), np.random.rand(4, 3, n)),
+            "vel_b5": (("range_b5", "time_b5"), np.random.rand(2, n)),
+            "pressure": (("time",), np.random.rand(n)),
+            "beam2inst_orientmat": (("x", "x*"), np.eye(4)),
+        },
+        coords={
+            "time": time,
+            "time_b5": time + pd.Timedelta("0.5s"),
+            "range": [1.0, 2.0, 3.0],
+            "range_b5": [1.0, 2.0],
+            "dir": ["E", "N", "U1", "U2"],
+        },
+        attrs={"fs": 1, "datastream_name": "mcrl.lander.b1"},
+    )
+
+
+def test_concatenated_blocks_match_whole_dataset():
+    ds = _signature_like_dataset(10)
+    blocks = [ds.isel(time=slice(i, i + 4), time_b5=slice(i, i + 4)) for i in (0, 4, 8)]
+    xr.testing.assert_identical(_concat_blocks(blocks), ds)
+
+
+def test_blocked_read_matches_whole_read(monkeypatch):
+    # There are no .ad2cp files small enough to keep in the repo, so dolfyn's reader
+    # is replaced by one that returns ensembles of a synthetic Signature dataset
+    raw = make_adcp_dataset(200)
+
+    def read(filename, nens=None):
+        start, stop = nens or (0, raw.sizes["time"])
+        return raw.isel(time=slice(start, stop), time_b5=slice(start, stop)).copy(
+            deep=True
+        )
+
+    monkeypatch.setattr(filehandler.dlfn, "read", read)
+    monkeypatch.setattr(filehandler, "_count_ensembles", lambda f: raw.sizes["time"])
+    parameters = dict(depth=0.6, salinity=31, magn_declination=15.8, corr_threshold=50)
+
+    whole = AdcpUpHandler(parameters=parameters).read("lander.ad2cp")
+    blocked = AdcpUpHandler(parameters=dict(parameters, block_ensembles=30))
+    sizes = [block.sizes["time"] for block in blocked.read_blocks("lander.ad2cp")]
+    assert sizes == [30] * 6 + [20]
+    xr.testing.assert_identical(blocked.read("lander.ad2cp"), whole)
+
+
+def test_count_ensembles_matches_dolfyn_read(tmp_path):
+    # `_count_ensembles` mirrors dolfyn internals, so it is checked against the
+    # Signature files in dolfyn's example data, if this install of dolfyn has them
+    samples = glob.glob(
+        os.path.join(os.path.dirname(dlfn.__file__), "example_data", "*.ad2cp")
+    )
+    if not samples:
+        pytest.skip("No Signature (.ad2cp) example files in this dolfyn install")
+    for sample in samples:
+        # Copied so that the .index files are not written to the dolfyn install
+        filename = shutil.copy(sample, tmp_path)
+        assert _count_ensembles(filename) == len(dlfn.read(filename).time)
+
+
+def test_block_size_is_capped_by_memory_and_ensembles():
+    handler = AdcpUpHandler(parameters={"max_block_memory": 1})
+    assert handler._block_size(1024) == 2**20 // (1024 * 3)
+    handler = AdcpUpHandler(parameters={"max_block_memory": 1, "block_ensembles": 10})
+    assert handler._block_size(1024) == 10
+    assert not AdcpUpHandler(parameters={"depth": 0.6})._is_blocked()
+
+
+def test_netcdf_read_lazily_selects_variables(tmp_path):
+    filename = str(tmp_path / "data.nc")
+    ds = _signature_like_dataset(10)
+    ds.to_netcdf(filename)
+
+    handler = NetCdfHandler(
+        parameters={
+            "read": {"open_dataset": {"chunks": {"time": 4}}, "variables": ["vel"]}
+        }
+    )
+    with handler.read(filename) as lazy:
+        assert list(lazy.data_vars) == ["vel"]
+        assert lazy.vel.chunks is not None
+        xr.testing.assert_identical(lazy.vel.load(), ds.vel)
+
+    eager = NetCdfHandler(parameters={"read": {"variables": ["pressure"]}})
+    result = eager.read(filename)
+    assert list(result.data_vars) == ["pressure"]
+    xr.testing.assert_identical(result.pressure, ds.pressure)
+
+
+class _Storage:
+    def __init__(self, root):
+        self.root = root
+        self.saved = []
+
+    def save_local_path(self, local_path, new_filename):
+        dest_path = os.path.join(self.root, new_filename)
+        shutil.copy(local_path, dest_path)
+        self.saved.append(dest_path)
+
+
+def test_split_netcdf_parallel_writes_match_serial(tmp_path):
+    ds = _signature_like_dataset(72, freq="1h")
+    outputs = dict()
+    for workers in (1, 3):
+        out_dir = tmp_path / str(workers)
+        os.makedirs(out_dir / "tmp")
+        storage = _Storage(str(out_dir))
+        handler = SplitNetCdfHandler(
+            parameters={"write": {"compression": True, "workers": workers}}
+        )
+        handler.write(ds, str(out_dir / "tmp" / "first.nc"), storage=storage)
+        outputs[workers] = [str(out_dir / "tmp" / "first.nc")] + storage.saved
+
+    assert len(outputs[1]) == 3
+    assert [os.path.basename(path) for path in outputs[1]] == [
+        os.path.basename(path) for path in outputs[3]
+    ]
+    for serial, parallel in zip(outputs[1], outputs[3]):
+        with xr.open_dataset(serial) as expected, xr.open_dataset(parallel) as actual:
+            xr.testing.assert_identical(actual, expected)
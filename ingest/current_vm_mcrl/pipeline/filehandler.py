@@ -20,8 +20,9 @@ class AdcpDownHandler(AbstractFileHandler):
         Returns:
             xr.Dataset: An xr.Dataset object
         -------------------------------------------------------------------"""
+        return self._clean(dlfn.read(filename))
 
-        ds = dlfn.read(filename)
+    def _clean(self, ds: xr.Dataset) -> xr.Dataset:
 
         # The ADCP transducers were measured to be 0.6 m from the feet of the lander
         d = self.parameters["depth"]
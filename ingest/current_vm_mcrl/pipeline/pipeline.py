@@ -4,7 +4,7 @@ import matplotlib.pyplot as plt
 
 from typing import Dict
 from tsdat import DSUtil
-from utils import IngestPipeline
+from utils import IngestPipeline, axes_pixel_width, bin_to_pixels
 
 
 class Pipeline(IngestPipeline):
@@ -15,6 +15,9 @@ class Pipeline(IngestPipeline):
 
     --------------------------------------------------------------------------------"""
 
+    # Only these variables are read when plots are regenerated from saved files
+    plot_variables = ["current_speed", "current_direction"]
+
     def hook_customize_raw_datasets(
         self, raw_dataset_mapping: Dict[str, xr.Dataset]
     ) -> Dict[str, xr.Dataset]:
@@ -122,7 +125,6 @@ class Pipeline(IngestPipeline):
             return cb
 
         ds = dataset
-        date = pd.to_datetime(ds.time.values)
 
         filename = DSUtil.get_plot_filename(dataset, "h_vel", "png")
         with self.storage._tmp.get_temp_filepath(filename) as tmp_path:
@@ -132,8 +134,15 @@ class Pipeline(IngestPipeline):
                 nrows=2, ncols=1, figsize=(14, 8), constrained_layout=True
             )
 
+            # Draw at most one cell per pixel column, so that plotting time does not
+            # grow with the length of the deployment
+            width = axes_pixel_width(ax[0])
+            speed = bin_to_pixels(ds["current_speed"], width)
+            direction = bin_to_pixels(ds["current_direction"], width, how="circmean")
+            bin_date = pd.to_datetime(speed.time.values)
+
             magn = ax[0].pcolormesh(
-                date, -ds["range"], ds["current_speed"], cmap="Blues", shading="nearest"
+                bin_date, -ds["range"], speed, cmap="Blues", shading="nearest"
             )
             ax[0].set_xlabel("Time (UTC)")
             ax[0].set_ylabel(r"Range [m]")
@@ -142,9 +151,9 @@ class Pipeline(IngestPipeline):
             magn.set_clim(0, 2.5)
 
             dirc = ax[1].pcolormesh(
-                date,
+                bin_date,
                 -ds["range"],
-                ds["current_direction"],
+                direction,
                 cmap="twilight",
                 shading="nearest",
             )
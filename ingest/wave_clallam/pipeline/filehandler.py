@@ -3,6 +3,66 @@ import pandas as pd
 import xarray as xr
 import warnings
 from tsdat import AbstractFileHandler
+from typing import Dict
+from utils import logger
+
+
+# The columns read from each file type (all others are skipped) and their dtypes
+FLT_COLUMNS = {
+    "millis": "float64",
+    "GPS_Epoch_Time(s)": "float64",
+    "outx(mm)": "float64",
+    "outy(mm)": "float64",
+    "outz(mm)": "float64",
+}
+LOC_COLUMNS = {
+    "GPS_Epoch_Time(s)": "float64",
+    "lat(deg)": "float64",
+    "lat(min*1e5)": "float64",
+    "long(deg)": "float64",
+    "long(min*1e5)": "float64",
+}
+
+
+def read_spotter_csv(
+    filename: str, columns: Dict[str, str], parameters: Dict = None
+) -> pd.DataFrame:
+    """----------------------------------------------------------------------------
+    Reads only the named columns of a Spotter csv file, with explicit dtypes. The csv
+    engine can be selected with the FileHandler's `engine` parameter in the storage
+    config file (e.g., `engine: pyarrow`, which parses the file on multiple threads).
+    Falls back to pandas' C engine if pyarrow is not installed or cannot parse the
+    file.
+
+    Args:
+        filename (str): The path to the file to read in.
+        columns (Dict[str, str]): The columns to read and their dtypes.
+        parameters (Dict, optional): The FileHandler's parameters. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The requested columns.
+
+    ----------------------------------------------------------------------------"""
+    parameters = parameters or {}
+    read_csv_kwargs = dict(delimiter=",", usecols=list(columns))
+    read_csv_kwargs.update(parameters.get("read_csv", {}))
+
+    if parameters.get("engine", "c") == "pyarrow":
+        try:
+            return pd.read_csv(
+                filename, engine="pyarrow", dtype=columns, **read_csv_kwargs
+            )
+        except (ImportError, ValueError) as error:
+            logger.warning(f"Reading {filename} with the C engine instead: {error}")
+
+    # Ignore pandas ParserWarning:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        df = pd.read_csv(filename, index_col=False, **read_csv_kwargs)
+
+    # The C engine parses numbers faster when it infers their types than when it is
+    # given dtypes, so the columns are cast afterwards instead
+    return df.astype(columns, copy=False)
 
 
 class SpotterFltFileHandler(AbstractFileHandler):
@@ -23,28 +83,21 @@ class SpotterFltFileHandler(AbstractFileHandler):
         ----------------------------------------------------------------------------"""
         # Reads "FLT" filetype from spotter: wave displacement data
         # Units are converted to m through config file
+        df = read_spotter_csv(filename, FLT_COLUMNS, self.parameters)
+
+        # Copy each column straight into a single (3, N) array
+        displacement = np.empty((3, len(df)), dtype=np.float64)
+        for i, column in enumerate(["outx(mm)", "outy(mm)", "outz(mm)"]):
+            displacement[i] = df[column].to_numpy()
 
-        # Ignore pandas ParserWarning:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            df = pd.read_csv(filename, delimiter=",", index_col=False)
         ds = xr.Dataset(
             data_vars={
-                "displacement": (
-                    ["dir", "time"],
-                    np.array(
-                        [
-                            df["outx(mm)"],
-                            df["outy(mm)"],
-                            df["outz(mm)"],
-                        ]
-                    ),
-                ),
-                "t_elapsed": (["time"], df["millis"]),
+                "displacement": (["dir", "time"], displacement),
+                "t_elapsed": (["time"], df["millis"].to_numpy()),
             },
             coords={
                 "dir": ("dir", ["x", "y", "z"]),
-                "time": ("time", df["GPS_Epoch_Time(s)"]),
+                "time": ("time", df["GPS_Epoch_Time(s)"].to_numpy()),
             },
         )
         return ds
@@ -68,18 +121,18 @@ class SpotterLocFileHandler(AbstractFileHandler):
         ----------------------------------------------------------------------------"""
 
         # Reads "LOC" filetype from spotter: GPS data
-        df = pd.read_csv(filename, delimiter=",", index_col=False)
+        df = read_spotter_csv(filename, LOC_COLUMNS, self.parameters)
         ds = xr.Dataset(
             data_vars={
                 "lat": (
                     ["time"],
-                    np.array(df["lat(deg)"] + df["lat(min*1e5)"] * 1e-5 / 60),
+                    (df["lat(deg)"] + df["lat(min*1e5)"] * 1e-5 / 60).to_numpy(),
                 ),
                 "lon": (
                     ["time"],
-                    np.array(df["long(deg)"] + df["long(min*1e5)"] * 1e-5 / 60),
+                    (df["long(deg)"] + df["long(min*1e5)"] * 1e-5 / 60).to_numpy(),
                 ),
             },
-            coords={"time": ("time", df["GPS_Epoch_Time(s)"])},
+            coords={"time": ("time", df["GPS_Epoch_Time(s)"].to_numpy())},
         )
         return ds
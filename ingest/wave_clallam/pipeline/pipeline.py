@@ -4,7 +4,12 @@ import matplotlib.pyplot as plt
 
 from typing import Dict
 from tsdat import DSUtil
-from utils import IngestPipeline, format_time_xticks
+from utils import (
+    IngestPipeline,
+    axes_pixel_width,
+    decimate_minmax,
+    format_time_xticks,
+)
 
 
 class Pipeline(IngestPipeline):
@@ -15,6 +20,9 @@ class Pipeline(IngestPipeline):
 
     --------------------------------------------------------------------------------"""
 
+    # Only these variables are read when plots are regenerated from saved files
+    plot_variables = ["displacement"]
+
     def hook_customize_raw_datasets(
         self, raw_dataset_mapping: Dict[str, xr.Dataset]
     ) -> Dict[str, xr.Dataset]:
@@ -125,9 +133,15 @@ class Pipeline(IngestPipeline):
             with self.storage._tmp.get_temp_filepath(filename) as tmp_path:
                 fig, ax = plt.subplots()
 
-                ax.plot(ds.time, ds.displacement.sel(dir="x"), label="x-direction")
-                ax.plot(ds.time, ds.displacement.sel(dir="y"), label="y-direction")
-                ax.plot(ds.time, ds.displacement.sel(dir="z"), label="z-direction")
+                # Only draw the samples that are visible at the width of the plot
+                width = axes_pixel_width(ax)
+                time = ds.time.values
+                for direction in ["x", "y", "z"]:
+                    values = ds.displacement.sel(dir=direction).values
+                    index = decimate_minmax(values, width)
+                    ax.plot(
+                        time[index], values[index], label=f"{direction}-direction"
+                    )
 
                 ax.set_title("")  # Remove bogus title created by xarray
                 ax.legend(ncol=2, bbox_to_anchor=(1, -0.05))
@@ -1,7 +1,9 @@
+import os
 import numpy as np
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
-from dolfyn.adv.clean import GN2002, clean_fill
+from dolfyn.tools.misc import group
 from tsdat import DSUtil, QualityChecker, QualityHandler
 
 
@@ -48,43 +50,255 @@ class GoringNikora2002(QualityChecker):
         Args:
             variable_name (str): array (1D or 3D) to clean.
             n_points (int) : The number of points over which to perform the method.
+            workers (int) : The number of threads used to process the components and
+            blocks of the array. Defaults to the number of CPUs.
 
         Returns:
             mask [np.ndarray]: Logical vector with spikes labeled as 'True'
 
         ----------------------------------------------------------------------------"""
 
-        return GN2002(self.ds[variable_name], npt=self.params["n_points"])
+        return despike_gn2002(
+            self.ds[variable_name].values,
+            npt=self.params["n_points"],
+            workers=self.params.get("workers", os.cpu_count()),
+        )
+
+
+def despike_gn2002(
+    u: np.ndarray, npt: int = 5000, workers: int = 1, blocks_per_task: int = 64
+) -> np.ndarray:
+    """--------------------------------------------------------------------------------
+    Identifies spikes along the last axis of the array with the Goring & Nikora 2002
+    phase-space method (with the Wahl 2003 correction), producing the same mask as
+    `dolfyn.adv.clean.GN2002`. Each 1D component is split into the same `npt`-point
+    blocks as GN2002 uses, and groups of `blocks_per_task` blocks are thresholded at
+    once in vectorized NumPy on a pool of `workers` threads, so the components and
+    blocks of a long record are processed in parallel.
+
+    :param u: The array to despike (e.g., displacement with dims (dir, time)).
+    :type u: np.ndarray
+    :param npt: The number of points in each block, defaults to 5000.
+    :type npt: int, optional
+    :param workers: The number of threads to use, defaults to 1.
+    :type workers: int, optional
+    :param blocks_per_task: The number of blocks thresholded in each task, defaults to
+        64.
+    :type blocks_per_task: int, optional
+    :return: A boolean array with the shape of `u` that is True where spikes are found.
+    :rtype: np.ndarray
+
+    --------------------------------------------------------------------------------"""
+    u = np.asarray(u)
+    mask = np.zeros(u.shape, dtype=bool)
+
+    # (index of the 1D component, start, stop, data to threshold), in the order the
+    # results must be applied: GN2002 overwrites the end of each region with the
+    # result for its last `npt` points.
+    tasks: List[Tuple[tuple, int, int, np.ndarray]] = list()
+    for index in np.ndindex(u.shape[:-1]):
+        series = u[index]
+        for start, stop in _gn2002_regions(series, npt):
+            tasks += [
+                (index, start + begin, start + end, data)
+                for begin, end, data in _gn2002_blocks(
+                    series[start:stop], npt, blocks_per_task
+                )
+            ]
+
+    if workers > 1 and len(tasks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_phase_space_thresh, [t[3] for t in tasks]))
+    else:
+        results = [_phase_space_thresh(task[3]) for task in tasks]
+
+    for (index, start, stop, _), result in zip(tasks, results):
+        mask[index + (slice(start, stop),)] = result
+    return mask
+
+
+def _gn2002_regions(u: np.ndarray, npt: int) -> List[Tuple[int, int]]:
+    # The regions between long runs of NaNs, which GN2002 despikes independently
+    nans = np.isnan(u)
+    bad_segs = group(nans, min_length=int(npt // 10)) if nans.any() else []
+    if len(bad_segs) <= 2:
+        return [(0, len(u))] if len(u) else []
+
+    start, end = 0, len(u)
+    if bad_segs[0].start == start:
+        start = bad_segs[0].stop
+        bad_segs = bad_segs[1:]
+    if bad_segs[-1].stop == end:
+        end = bad_segs[-1].start
+        bad_segs = bad_segs[:-1]
+
+    regions = list()
+    for bad_seg in bad_segs:
+        regions.append((start, bad_seg.start))
+        start = bad_seg.stop
+    regions.append((start, end))
+    return [(start, stop) for start, stop in regions if stop > start]
+
+
+def _gn2002_blocks(u: np.ndarray, npt: int, blocks_per_task: int):
+    # Whole blocks are columns of an (npt, nbins) array, as in GN2002, followed by the
+    # last npt points (which overlap the final whole block)
+    nbins = len(u) // npt
+    blocks = np.reshape(u[: nbins * npt], (npt, nbins), order="F")
+    for first in range(0, nbins, blocks_per_task):
+        last = min(first + blocks_per_task, nbins)
+        yield first * npt, last * npt, blocks[:, first:last]
+    tail = u[-npt:]
+    yield len(u) - len(tail), len(u), tail[:, None]
+
+
+def _phase_space_thresh(u: np.ndarray) -> np.ndarray:
+    # Vectorized equivalent of dolfyn.adv.clean._phaseSpaceThresh for an (npt, n)
+    # array of n blocks. The angles of each point in phase space are only needed
+    # through their sines and cosines, which are ratios of its coordinates.
+    u = np.array(u)
+    Lu = (2 * np.log(u.shape[0])) ** 0.5
+    u = u - u.mean(0)
+    du = np.zeros_like(u)
+    d2u = np.zeros_like(u)
+    du[1:-1] = (u[2:] - u[:-2]) / 2
+    d2u[2:-2] = (du[3:-1] - du[1:-3]) / 2
+    p = u**2 + du**2 + d2u**2
+    std_u = np.std(u, axis=0)
+    std_du = np.std(du, axis=0)
+    std_d2u = np.std(d2u, axis=0)
+    alpha = np.arctan2(np.sum(u * d2u, axis=0), np.sum(u**2, axis=0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Equations 10 and 11 of Goring & Nikora 2002, solved for every block at once
+        cos2, sin2 = np.cos(alpha) ** 2, np.sin(alpha) ** 2
+        lhs = np.stack([np.stack([cos2, sin2], -1), np.stack([sin2, cos2], -1)], -2)
+        rhs = np.stack([(Lu * std_u) ** 2, (Lu * std_d2u) ** 2], -1)
+        a, b = np.linalg.solve(lhs, rhs).T
+
+        # sin(phi) * cos(theta), sin(phi) * sin(theta), and cos(phi). At the origin
+        # theta = phi = 0.
+        radius = np.sqrt(p)
+        origin = radius == 0
+        radius[origin] = 1
+        x, y, z = u / radius, du / radius, d2u / radius
+        z[origin] = 1
+
+        cos_a, sin_a = np.cos(alpha), np.sin(alpha)
+        ellipse = (x * cos_a + z * sin_a) ** 2 / a + (x * sin_a - z * cos_a) ** 2 / b
+        pe = (ellipse + y**2 / (Lu * std_du) ** 2) ** -1
+    pe[:, np.isnan(pe[0, :])] = 0
+    return (p > pe).flatten("F")
 
 
 class CubicSplineInterp(QualityHandler):
     def run(self, variable_name: str, results_array: np.ndarray):
-        """
-        Interpolate over mask values in timeseries data using the specified method
-
-        Parameters
-        ----------
-        variable_name : xarray.DataArray
-            The dataArray to clean.
-        mask : bool
-            Logical tensor of elements to "nan" out and replace
-        npt : int
-            The number of points on either side of the bad values that
-        interpolation occurs over
-        method : string
-            Interpolation scheme to use (linear, cubic, pchip, etc)
-        max_gap : int
-            Max number of consective nan's to interpolate across, must be <= npt/2
-
-        Returns
-        -------
-        da : xarray.DataArray
-            The dataArray with nan's filled in
-
-        """
+        """----------------------------------------------------------------------------
+        Replaces the values that failed the check with values interpolated from the
+        `npt` points on either side of each run of bad (or missing) values, as
+        `dolfyn.adv.clean.clean_fill` does. Only the neighbourhood of each run is
+        interpolated, and the variable's data are updated in place, so the cost scales
+        with the number of spikes rather than the length of the series. Takes the
+        following optional parameters from the pipeline config file:
+
+        .. code-block:: yaml
+
+            parameters:
+              # Number of points on either side of each gap used for the fit
+              npt: 12
+              # Interpolation scheme (linear, cubic, pchip, etc)
+              method: cubic
+              # Max number of consecutive values to fill in each gap
+              max_gap: 6
+
+        Args:
+            variable_name (str): The name of the variable to clean.
+            results_array (np.ndarray): Logical array of the values to replace.
+
+        ----------------------------------------------------------------------------"""
         if results_array.any():
 
-            self.ds[variable_name] = clean_fill(
-                self.ds[variable_name], mask=results_array, npt=12, method="cubic"
-            )
+            variable = self.ds[variable_name]
+            data = variable.values
+            data[results_array] = np.nan
+
+            time = variable[variable.dims[-1]].values
+            npt = self.params.get("npt", 12)
+            method = self.params.get("method", "cubic")
+            max_gap = self.params.get("max_gap", 6)
+            for index in np.ndindex(data.shape[:-1]):
+                _fill_gaps(data[index], time, npt, method, max_gap)
+
             self.record_correction(variable_name)
+
+
+def _fill_gaps(
+    y: np.ndarray, x: np.ndarray, npt: int, method: str, max_gap: Optional[int]
+):
+    # Fills the NaNs in y (in place) block by block. As in dolfyn's _interp_nan, runs
+    # of NaNs separated by fewer than npt good points share a block, and each block
+    # extends npt points past its first and last NaN.
+    nans = np.isnan(y)
+    edges = np.flatnonzero(np.diff(nans, prepend=False, append=False))
+    starts, stops = edges[::2], edges[1::2]
+    if not len(starts):
+        return
+
+    split = np.flatnonzero(starts[1:] - stops[:-1] >= npt) + 1
+    first_runs = np.concatenate([[0], split])
+    last_runs = np.concatenate([split - 1, [len(starts) - 1]])
+
+    for first, last in zip(first_runs, last_runs):
+        block = slice(max(starts[first] - npt, 0), min(stops[last] + npt, len(y)))
+        block_nans = nans[block]
+        n_nans = stops[first : last + 1].sum() - starts[first : last + 1].sum()
+        if n_nans >= len(block_nans) - 1:
+            continue
+
+        # Interpolate against the coordinate as xarray's interpolate_na does
+        x_block = x[block]
+        if np.issubdtype(x_block.dtype, np.datetime64):
+            x_block = (x_block - np.datetime64("1970-01-01")).astype("timedelta64[ns]")
+        x_block = x_block.astype("float64")
+
+        y_block = y[block]
+        filled = _interpolator(method, x_block[~block_nans], y_block[~block_nans])(
+            x_block[block_nans]
+        )
+
+        # Only the first max_gap values of each run are filled
+        if max_gap is not None:
+            run_starts = np.repeat(
+                starts[first : last + 1],
+                stops[first : last + 1] - starts[first : last + 1],
+            )
+            positions = np.flatnonzero(block_nans) + block.start - run_starts
+            filled[positions >= max_gap] = np.nan
+        y_block[block_nans] = filled
+
+
+def _interpolator(method: str, xi: np.ndarray, yi: np.ndarray):
+    # The interpolators xarray's interpolate_na uses for each method, without
+    # extrapolation
+    if method == "linear":
+        return lambda x: np.interp(x, xi, yi, left=np.nan, right=np.nan)
+    if method == "pchip":
+        from scipy.interpolate import PchipInterpolator
+
+        return PchipInterpolator(xi, yi, extrapolate=False)
+    if method == "akima":
+        from scipy.interpolate import Akima1DInterpolator
+
+        return Akima1DInterpolator(xi, yi)
+
+    from scipy.interpolate import interp1d
+
+    return interp1d(
+        xi,
+        yi,
+        kind=method,
+        fill_value=np.nan,
+        bounds_error=False,
+        assume_sorted=True,
+        copy=False,
+    )
@@ -2,27 +2,39 @@ import os
 from glob import glob
 
 from ingest.wave_clallam import Pipeline
-from utils import expand, set_env
+from utils import expand, set_env, IngestLedger
 
 
 if __name__ == "__main__":
-    # Run wave data
+    # Files whose contents and configs are unchanged since the last run are skipped.
+    # The remaining files are combined and processed once per UTC day of data.
     set_env()
-    pipeline = Pipeline(
+    ledger = IngestLedger()
+
+    # Run wave data
+    configs = [
         expand("config/pipeline_config_clallam_wave.yml", __file__),
         expand("config/storage_config_clallam.yml", __file__),
-    )
+    ]
+    pipeline = Pipeline(*configs)
     files = glob(os.path.join("ingest", "wave_clallam", "data", "Aug2021", "*_FLT.CSV"))
-    for fname in files:
-        fname = os.path.join(*fname.rsplit("/")[2:])
-        pipeline.run(expand(fname, __file__))
+    fpaths = [expand(os.path.join(*f.rsplit("/")[2:]), __file__) for f in files]
+    fpaths = [f for f in sorted(fpaths) if not ledger.is_processed(f, "wave", configs)]
+    if fpaths:
+        pipeline.run_daily(fpaths)
+        for fpath in fpaths:
+            ledger.record(fpath, "wave", configs, pipeline.output_files)
 
     # Run GPS data
-    pipeline = Pipeline(
+    configs = [
         expand("config/pipeline_config_clallam_gps.yml", __file__),
         expand("config/storage_config_clallam.yml", __file__),
-    )
+    ]
+    pipeline = Pipeline(*configs)
     files = glob(os.path.join("ingest", "wave_clallam", "data", "Aug2021", "*_LOC.CSV"))
-    for fname in files:
-        fname = os.path.join(*fname.rsplit("/")[2:])
-        pipeline.run(expand(fname, __file__))
+    fpaths = [expand(os.path.join(*f.rsplit("/")[2:]), __file__) for f in files]
+    fpaths = [f for f in sorted(fpaths) if not ledger.is_processed(f, "gps", configs)]
+    if fpaths:
+        pipeline.run_daily(fpaths)
+        for fpath in fpaths:
+            ledger.record(fpath, "gps", configs, pipeline.output_files)
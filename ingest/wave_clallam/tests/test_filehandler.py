@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from ingest.wave_clallam.pipeline.filehandler import (
+    SpotterFltFileHandler,
+    SpotterLocFileHandler,
+)
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_spotter_flt_read(tmp_path, engine):
+    filename = tmp_path / "0001_FLT.CSV"
+    filename.write_text(
+        "millis,GPS_Epoch_Time(s),outx(mm),outy(mm),outz(mm),INIT_flag\n"
+        "1158,1628006401.400, -21, -5, 16,0\n"
+        "1558,1628006401.800, -20, -4, 15,0\n"
+    )
+    ds = SpotterFltFileHandler(parameters={"engine": engine}).read(str(filename))
+    assert ds.displacement.dtype == np.float64
+    np.testing.assert_array_equal(
+        ds.displacement.values, [[-21, -20], [-5, -4], [16, 15]]
+    )
+    np.testing.assert_array_equal(ds.t_elapsed.values, [1158, 1558])
+    np.testing.assert_allclose(ds.time.values, [1628006401.4, 1628006401.8])
+
+
+def test_spotter_loc_read(tmp_path):
+    filename = tmp_path / "0001_LOC.CSV"
+    filename.write_text(
+        "GPS_Epoch_Time(s),lat(deg),lat(min*1e5),long(deg),long(min*1e5)\n"
+        "1628006401,48,1234567,-123,3000000\n"
+    )
+    ds = SpotterLocFileHandler().read(str(filename))
+    np.testing.assert_allclose(ds.lat.values, [48 + 12.34567 / 60])
+    np.testing.assert_allclose(ds.lon.values, [-123 + 30 / 60])
@@ -1,5 +1,7 @@
 import os
+import numpy as np
 import xarray as xr
+from tsdat import IngestPipeline
 from utils import expand, set_env
 from ingest.wave_clallam import Pipeline
 
@@ -15,3 +17,60 @@ def test_wave_pipeline():
     output = pipeline.run(expand("tests/data/input/data.csv", parent))
     expected = xr.open_dataset(expand("tests/data/expected/data.csv", parent))
     xr.testing.assert_allclose(output, expected)
+
+
+def test_gps_pipeline_runs_once_per_day(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROOT_DIR", str(tmp_path / "storage"))
+    set_env()
+    # Four 2-hour files spanning 2021-08-03 21:00 to 2021-08-04 05:00 UTC
+    filepaths = []
+    for i in range(4):
+        filepath = tmp_path / f"{i + 1:04d}_LOC.CSV"
+        times = 1628024400 + 7200 * i + np.arange(7200)
+        rows = "".join(f"{t},48,1234567,-123,3000000\n" for t in times)
+        filepath.write_text(
+            "GPS_Epoch_Time(s),lat(deg),lat(min*1e5),long(deg),long(min*1e5)\n" + rows
+        )
+        filepaths.append(str(filepath))
+
+    pipeline = Pipeline(
+        expand("config/pipeline_config_clallam_gps.yml", parent),
+        expand("config/storage_config_clallam.yml", parent),
+    )
+    monkeypatch.setattr(pipeline, "hook_generate_and_persist_plots", lambda ds: None)
+    outputs = pipeline.run_daily(filepaths[::-1], workers=2)
+
+    assert [ds.sizes["time"] for ds in outputs] == [3 * 3600, 5 * 3600]
+    assert str(outputs[1].time.values[0]) == "2021-08-04T00:00:00.000000000"
+    assert [os.path.basename(f) for f in pipeline.output_files] == [
+        "clallam.wave_buoy-gps-400ms.a1.20210803.210000.nc",
+        "clallam.wave_buoy-gps-400ms.a1.20210804.000000.nc",
+    ]
+
+
+def test_reduce_concatenates_only_matching_coordinates(monkeypatch):
+    set_env()
+    pipeline = Pipeline(
+        expand("config/pipeline_config_clallam_gps.yml", parent),
+        expand("config/storage_config_clallam.yml", parent),
+    )
+    monkeypatch.setattr(
+        IngestPipeline,
+        "reduce_raw_datasets",
+        lambda self, raw_mapping, definition: list(raw_mapping.values()),
+    )
+
+    def reduced(times, ranges):
+        return xr.Dataset(
+            {"vel": (("time", "range"), np.ones((len(times), len(ranges))))},
+            coords={"time": times, "range": ranges},
+        )
+
+    same = {"a": reduced([0, 1], [1, 2]), "b": reduced([2, 3], [1, 2])}
+    (combined,) = pipeline.reduce_raw_datasets(same, None)
+    assert list(combined.time.values) == [0, 1, 2, 3]
+
+    mismatched = {"a": reduced([0, 1], [1, 2]), "b": reduced([2, 3], [5, 6])}
+    outputs = pipeline.reduce_raw_datasets(mismatched, None)
+    assert [list(ds.range.values) for ds in outputs] == [[1, 2], [5, 6]]
+    assert list(xr.merge(outputs).range.values) == [1, 2, 5, 6]
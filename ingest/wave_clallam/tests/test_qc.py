@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from dolfyn.adv.clean import GN2002, clean_fill
+from ingest.wave_clallam.pipeline.qc import CubicSplineInterp, despike_gn2002
+
+
+def _displacement(n_time: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    phase = np.arange(n_time) / 2.5 / 8 * 2 * np.pi
+    displacement = np.stack(
+        [400 * np.sin(phase + i) + rng.normal(0, 20, n_time) for i in range(3)]
+    )
+    spikes = rng.integers(0, n_time, n_time // 100)
+    displacement[:, spikes] += rng.normal(0, 2000, (3, len(spikes)))
+    return displacement
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_despike_gn2002_matches_dolfyn(workers):
+    displacement = _displacement(25_300)
+    # Long gaps (including at the start) split the record into separate regions
+    displacement[:, :300] = np.nan
+    displacement[:, 5000:5200] = np.nan
+    displacement[:, 12000:12150] = np.nan
+    displacement[1, 20000:20010] = np.nan
+
+    expected = GN2002(displacement, npt=1000)
+    actual = despike_gn2002(displacement, npt=1000, workers=workers, blocks_per_task=4)
+    assert expected.any()
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_despike_gn2002_handles_short_records():
+    displacement = _displacement(700, seed=1)
+    np.testing.assert_array_equal(
+        despike_gn2002(displacement[0], npt=1000), GN2002(displacement[0], npt=1000)
+    )
+
+
+@pytest.mark.parametrize("method", ["cubic", "linear", "pchip"])
+def test_cubic_spline_interp_matches_clean_fill(method):
+    displacement = _displacement(6000, seed=2)
+    displacement[:, 100:110] = np.nan
+    displacement[2, -2:] = np.nan
+    da = xr.DataArray(
+        displacement,
+        dims=("dir", "time"),
+        coords={
+            "dir": ["x", "y", "z"],
+            "time": pd.date_range("2021-08-01", periods=6000, freq="400ms"),
+        },
+    )
+    mask = despike_gn2002(displacement, npt=1000)
+    expected = clean_fill(da.copy(deep=True), mask.copy(), npt=12, method=method)
+
+    ds = xr.Dataset({"displacement": da})
+    data = ds.displacement.values
+    params = {"npt": 12, "method": method, "max_gap": 6}
+    CubicSplineInterp(ds, None, None, params).run("displacement", mask)
+    assert ds.displacement.values is data
+    np.testing.assert_array_equal(ds.displacement.values, expected.values)
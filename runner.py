@@ -1,9 +1,21 @@
+import json
+import matplotlib
+import os
 import typer
 
 from typing import List
 from pathlib import Path
 from enum import Enum
-from utils import logger, PipelineDispatcher, set_env
+from utils import (
+    logger,
+    FolderWatcher,
+    IngestLedger,
+    PipelineDispatcher,
+    PlotQueue,
+    set_env,
+    start_logging,
+    summarize,
+)
 
 
 app = typer.Typer()
@@ -14,7 +26,7 @@ class Mode(str, Enum):
     local = "local"
 
 
-@app.command()
+@app.command("run")
 def run_pipeline(
     files: List[Path] = typer.Argument(
         ...,
@@ -25,6 +37,41 @@ def run_pipeline(
         resolve_path=True,
         help="Path(s) to the file(s) to process",
     ),
+    workers: int = typer.Option(
+        0,
+        "--workers",
+        "-w",
+        min=0,
+        help="Process each file on its own across N worker processes",
+    ),
+    skip_processed: bool = typer.Option(
+        False,
+        help="Skip input files that the ingest ledger shows were already processed"
+        " with the current configuration, and record newly-processed files",
+    ),
+    daily: bool = typer.Option(
+        False,
+        help="Read the files concurrently and process and save their data once per"
+        " UTC day (e.g., for the sequential files from a Spotter SD card). Cannot be"
+        " combined with --workers",
+    ),
+    plot_workers: int = typer.Option(
+        0,
+        min=0,
+        help="Render plots in N background worker processes from the saved files,"
+        " so that ingestion does not wait for them",
+    ),
+    wait_plots: bool = typer.Option(
+        False,
+        help="Wait for background plots to finish before reporting the pipeline"
+        " status, and count plotting failures as failures",
+    ),
+    memory_report: bool = typer.Option(
+        False,
+        help="Log the peak and net memory allocated by each pipeline stage and the"
+        " largest dataset variables after each stage (slow; for diagnosing memory"
+        " problems)",
+    ),
 ):
     """--------------------------------------------------------------------------
     Main entry point to run a registered ingestion pipeline on provided data
@@ -35,21 +82,193 @@ def run_pipeline(
     Args:
 
         files (List[Path], optional): The path(s) to the input file(s) to process.
+        workers (int, optional): If provided, runs in batch mode: each file is
+        matched to its ingest and processed on its own across a pool of this many
+        worker processes. Otherwise all files are processed together.
+        skip_processed (bool, optional): Whether to use the ingest ledger (see
+        `utils.ledger`) to skip files that have already been processed.
+        daily (bool, optional): Whether to combine the files and run the pipeline
+        once per UTC day of data (see `IngestPipeline.run_daily()`). Not supported
+        in batch mode, as files from the same day would be processed separately.
+        plot_workers (int, optional): If provided, plots are rendered by a
+        `PlotQueue` with this many worker processes instead of by each pipeline.
+        wait_plots (bool, optional): Whether to wait for the plot queue before
+        reporting the pipeline status. Otherwise the status is reported as soon as
+        the data are saved, and the remaining plots are logged as they finish.
+        memory_report (bool, optional): Whether to enable per-stage memory
+        accounting (see `utils.profiling.StageTimer`) for the pipeline runs.
 
     --------------------------------------------------------------------------"""
 
+    if daily and workers:
+        raise typer.BadParameter(
+            "cannot be combined with --workers, which processes each file on its"
+            " own",
+            param_hint="'--daily'",
+        )
+    if memory_report:
+        # Set before any worker processes are started so that they inherit it
+        os.environ["PIPELINE_MEMORY"] = "True"
     set_env()
+    start_logging()
 
-    logger.info(f"Found input files: {files}")
+    logger.info("Found input files: %s", files)
 
-    dispatcher = PipelineDispatcher(auto_discover=True)
+    ledger = IngestLedger() if skip_processed else None
+    plot_queue = PlotQueue(workers=plot_workers) if plot_workers else None
+    dispatcher = PipelineDispatcher(
+        auto_discover=True, ledger=ledger, plot_queue=plot_queue
+    )
+
+    logger.debug("Discovered ingest modules: \n%s", dispatcher._cache._modules)
 
-    logger.debug(f"Discovered ingest modules: \n{dispatcher._cache._modules}")
+    if workers:
+        results = dispatcher.dispatch_batch(files, workers=workers)
+        summary = summarize(results)
+        logger.info(f"Batch summary: {json.dumps(summary)}")
+        success = summary["Failed"] == 0
+    else:
+        success = dispatcher.dispatch(files, daily=daily)
 
-    success = dispatcher.dispatch(files)
+    if plot_queue and wait_plots:
+        plot_summary = summarize(plot_queue.wait())
+        logger.info(f"Plot summary: {json.dumps(plot_summary)}")
+        success = success and plot_summary["Failed"] == 0
 
     logger.info(f"Pipeline status: {'success' if success else 'failure'}")
 
+    if plot_queue:
+        plot_queue.shutdown()
+
+
+@app.command("plot")
+def regenerate_plots(
+    files: List[Path] = typer.Argument(
+        ...,
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+        readable=True,
+        resolve_path=True,
+        help="Path(s) to the processed file(s) to plot",
+    ),
+    workers: int = typer.Option(
+        1,
+        "--workers",
+        "-w",
+        min=1,
+        help="Render the files across N worker processes",
+    ),
+):
+    """--------------------------------------------------------------------------
+    Regenerates the plots for processed data files without reprocessing them,
+    e.g., after changing an ingest's plotting style. Only the variables each
+    ingest declares in `plot_variables` are read, and the files are rendered in
+    parallel with the non-interactive Agg backend. The render time of each file
+    is logged, followed by a summary.
+
+    Args:
+
+        files (List[Path]): The path(s) to the processed file(s) to plot.
+        workers (int, optional): The number of worker processes to use.
+
+    --------------------------------------------------------------------------"""
+
+    set_env()
+    start_logging()
+    matplotlib.use("Agg")
+
+    dispatcher = PipelineDispatcher(auto_discover=True)
+    results = dispatcher.dispatch_plots(files, workers=workers)
+    summary = summarize(results)
+    logger.info(f"Plot summary: {json.dumps(summary)}")
+    logger.info(f"Plot status: {'success' if summary['Failed'] == 0 else 'failure'}")
+
+
+@app.command("watch")
+def watch_folder(
+    directory: Path = typer.Argument(
+        ...,
+        exists=True,
+        file_okay=False,
+        dir_okay=True,
+        readable=True,
+        resolve_path=True,
+        help="Path to the folder to watch for new files",
+    ),
+    workers: int = typer.Option(
+        1,
+        "--workers",
+        "-w",
+        min=1,
+        help="Maximum number of files to process concurrently",
+    ),
+    poll_interval: float = typer.Option(
+        1.0, min=0.01, help="Seconds between scans of the folder"
+    ),
+    settle: float = typer.Option(
+        2.0,
+        min=0,
+        help="Seconds a file must be unchanged before it is considered fully written",
+    ),
+    recursive: bool = typer.Option(False, help="Also watch subfolders"),
+    process_existing: bool = typer.Option(
+        False, help="Also process files already in the folder at startup"
+    ),
+    skip_processed: bool = typer.Option(
+        False,
+        help="Skip input files that the ingest ledger shows were already processed"
+        " with the current configuration, and record newly-processed files",
+    ),
+    plot_workers: int = typer.Option(
+        0,
+        min=0,
+        help="Render plots in N background worker processes from the saved files,"
+        " so that ingestion does not wait for them",
+    ),
+):
+    """--------------------------------------------------------------------------
+    Stays resident and runs the registered ingestion pipelines on new data
+    files as they land in the provided folder. Discovered ingests and parsed
+    pipeline configurations are kept warm between files, so each file only pays
+    for its own processing.
+
+    Args:
+
+        directory (Path): The folder to watch.
+        workers (int, optional): The number of worker processes to use.
+        skip_processed (bool, optional): Whether to use the ingest ledger (see
+        `utils.ledger`) to skip files that have already been processed.
+        plot_workers (int, optional): If provided, plots are rendered by a
+        `PlotQueue` with this many worker processes instead of by each pipeline.
+
+    --------------------------------------------------------------------------"""
+
+    set_env()
+    start_logging()
+
+    ledger = IngestLedger() if skip_processed else None
+    plot_queue = PlotQueue(workers=plot_workers) if plot_workers else None
+    dispatcher = PipelineDispatcher(
+        auto_discover=True, ledger=ledger, plot_queue=plot_queue
+    )
+
+    logger.debug("Discovered ingest modules: \n%s", dispatcher._cache._modules)
+
+    watcher = FolderWatcher(
+        str(directory),
+        dispatcher,
+        workers=workers,
+        poll_interval=poll_interval,
+        settle=settle,
+        recursive=recursive,
+        process_existing=process_existing,
+    )
+    watcher.run()
+
+    if plot_queue:
+        plot_queue.shutdown()
+
 
 if __name__ == "__main__":
-    typer.run(run_pipeline)
+    app()
@@ -0,0 +1,46 @@
+import numpy as np
+
+from benchmarks.suite import compare
+from benchmarks.synthetic import make_adcp_dataset, make_flt_file, make_loc_file
+from ingest.current_mcrl.pipeline.filehandler import AdcpUpHandler
+from ingest.wave_clallam.pipeline.filehandler import (
+    SpotterFltFileHandler,
+    SpotterLocFileHandler,
+)
+
+
+def test_synthetic_spotter_files_are_readable(tmp_path):
+    flt = SpotterFltFileHandler().read(make_flt_file(str(tmp_path / "0001_FLT.CSV"), 25))
+    loc = SpotterLocFileHandler().read(make_loc_file(str(tmp_path / "0001_LOC.CSV"), 10))
+    assert flt.displacement.shape == (3, 25)
+    assert np.allclose(np.diff(flt.time), 0.4)
+    assert loc.sizes == {"time": 10}
+    assert np.all((loc.lat > 48.25) & (loc.lat < 48.26))
+
+
+def test_synthetic_adcp_dataset_drives_handler_cleaning():
+    handler = AdcpUpHandler(
+        parameters={
+            "depth": 0.6,
+            "salinity": 31,
+            "magn_declination": 15.8,
+            "corr_threshold": 50,
+        }
+    )
+    ds = handler._clean(make_adcp_dataset(120, n_cells=30))
+    assert ds.vel.sizes == {"dir": 4, "range": 30, "time": 120}
+    assert 8 < float(ds.depth.mean()) < 11
+    # Cells above the surface and with low correlation are removed
+    assert 0 < float(np.isnan(ds.vel).mean()) < 1
+
+
+def test_compare_flags_only_significant_regressions():
+    baseline = {"a": 1.0, "b": 0.001, "c": 1.0, "removed": 1.0}
+    results = {"a": 1.3, "b": 0.005, "c": 1.2, "new": 5.0}
+    assert compare(results, baseline, threshold=0.25, min_seconds=0.01) == [
+        ("a", 1.0, 1.3)
+    ]
+    assert compare(results, baseline, threshold=0.1, min_seconds=0.01) == [
+        ("a", 1.0, 1.3),
+        ("c", 1.0, 1.2),
+    ]
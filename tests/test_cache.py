@@ -0,0 +1,45 @@
+import re
+import pytest
+
+from utils import MultipleMatchError, NoMatchError, PatternMatcher, PipelineCache
+
+
+def test_pattern_matcher_matches_like_regex():
+    patterns = [
+        re.compile(r"\d{4}_FLT.CSV"),
+        re.compile(r".*_sea_spider.ad2cp"),
+        re.compile(r".*\.(nc|cdf)"),
+        re.compile(r"(?i).*_loc.csv"),
+        re.compile(r".*/raw[\]_]+_(a|b)xc{0,2}\.dat"),
+        re.compile(r"\d{4}_(FLT|LOC)\.CSV|.*\.txt"),
+    ]
+    matcher = PatternMatcher()
+    for regex in patterns:
+        matcher.add(regex)
+
+    filepaths = [
+        "0001_FLT.CSV",
+        "data/0001_FLT.CSV",
+        "/data/lander_sea_spider.ad2cp",
+        "/data/lander_sea_spider.ad2cp.nc",
+        "0002_LOC.CSV",
+        "notes.txt",
+        "/data/raw]__bx.dat",
+        "/data/raw__axcc.dat",
+        "/data/raw_axc.dat",
+    ]
+    for filepath in filepaths:
+        expected = tuple(regex for regex in patterns if regex.match(filepath))
+        assert matcher.match(filepath) == expected
+
+
+def test_match_key_distinguishes_zero_and_multiple_matches():
+    cache = PipelineCache(auto_discover=False)
+    cache._register(re.compile(r".*\.ad2cp"), None)
+    cache._register(re.compile(r".*_sea_spider\.ad2cp"), None)
+
+    assert cache._match_key("lander.ad2cp").pattern == r".*\.ad2cp"
+    with pytest.raises(NoMatchError):
+        cache._match_key("lander.csv")
+    with pytest.raises(MultipleMatchError):
+        cache._match_key("lander_sea_spider.ad2cp")
@@ -0,0 +1,78 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from tsdat.io import FileHandler
+from tsdat.qc import QualityManagement
+from utils import (
+    invalidate_config_cache,
+    load_pipeline_config,
+    load_storage,
+    set_env,
+)
+from utils.config_cache import _PIPELINE_CONFIGS
+
+config_dir = "ingest/wave_clallam/config"
+
+
+def test_pipeline_config_is_reused_until_changed(tmp_path):
+    config = shutil.copy(f"{config_dir}/pipeline_config_clallam_gps.yml", tmp_path)
+    path = os.path.realpath(config)
+    load_pipeline_config(config)
+    first = _PIPELINE_CONFIGS[path][1]
+    load_pipeline_config(config)
+    assert _PIPELINE_CONFIGS[path][1] is first
+
+    mtime = os.path.getmtime(config)
+    os.utime(config, (mtime + 10, mtime + 10))
+    load_pipeline_config(config)
+    second = _PIPELINE_CONFIGS[path][1]
+    assert second is not first
+
+    invalidate_config_cache(config)
+    load_pipeline_config(config)
+    assert _PIPELINE_CONFIGS[path][1] is not second
+
+
+def test_qc_does_not_modify_the_cached_pipeline_config(tmp_path):
+    config = shutil.copy(f"{config_dir}/pipeline_config_clallam_gps.yml", tmp_path)
+    load_pipeline_config(config)
+    cached = _PIPELINE_CONFIGS[os.path.realpath(config)][1]
+    variables = {
+        name: list(definition.variables)
+        for name, definition in cached.quality_managers.items()
+    }
+
+    time = pd.date_range("2021-08-04", periods=4, freq="s")
+    for names in (["lat", "lon"], ["lat"]):
+        ds = xr.Dataset(
+            {name: ("time", np.zeros(4), {"_FillValue": -9999}) for name in names},
+            coords={"time": time},
+        )
+        QualityManagement.run(ds, load_pipeline_config(config), None)
+
+    assert {
+        name: definition.variables
+        for name, definition in cached.quality_managers.items()
+    } == variables
+    invalidate_config_cache(config)
+
+
+def test_storage_is_reused_until_env_changes(tmp_path, monkeypatch):
+    set_env()
+    config = f"{config_dir}/storage_config_clallam.yml"
+    monkeypatch.setenv("ROOT_DIR", str(tmp_path / "a"))
+    first = load_storage(config)
+    assert load_storage(config) is first
+
+    # File handler registrations are replayed when the cached storage is reused
+    FileHandler.FILEREADERS.pop(".*_FLT.CSV")
+    load_storage(config)
+    assert ".*_FLT.CSV" in FileHandler.FILEREADERS
+
+    monkeypatch.setenv("ROOT_DIR", str(tmp_path / "b"))
+    assert load_storage(config) is not first
+    invalidate_config_cache()
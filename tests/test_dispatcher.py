@@ -0,0 +1,34 @@
+from utils import DispatchResult, PipelineDispatcher, summarize
+from utils.dispatcher import _dispatch_file
+
+
+def test_batch_reports_unmatched_files():
+    dispatcher = PipelineDispatcher(auto_discover=False)
+    results = dispatcher.dispatch_batch(["a.unknown", "b.unknown"], workers=2)
+    assert [result.filepath for result in results] == ["a.unknown", "b.unknown"]
+    assert not any(result.success for result in results)
+
+
+def test_worker_reports_its_own_dispatch_errors(monkeypatch):
+    # The worker's dispatcher knows no ingests, so it can't match the file
+    monkeypatch.setattr(
+        "utils.dispatcher._worker_dispatcher", PipelineDispatcher(auto_discover=False)
+    )
+    result = _dispatch_file("0001_LOC.CSV", "gps")
+    assert result.filepath == "0001_LOC.CSV" and result.ingest == "gps"
+    assert not result.success and result.error
+    assert result.elapsed > 0
+
+
+def test_summarize_batch_results():
+    results = [
+        DispatchResult("a_FLT.CSV", "wave", True, 1.5),
+        DispatchResult("b_FLT.CSV", "wave", False, 0.5, "error"),
+        DispatchResult("c_LOC.CSV", "gps", True, 1.0),
+    ]
+    summary = summarize(results)
+    assert summary["Total"] == 3
+    assert summary["Succeeded"] == 2
+    assert summary["Failed_Files"] == ["b_FLT.CSV"]
+    assert summary["Ingests"]["wave"] == {"Succeeded": 1, "Failed": 1}
+    assert summary["Elapsed"] == 3.0
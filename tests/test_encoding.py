@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from utils import netcdf_encoding
+
+
+def _dataset(n: int = 100) -> xr.Dataset:
+    return xr.Dataset(
+        {
+            "vel": (("dir", "time"), np.zeros((3, n), dtype="float32")),
+            "pressure": (("time",), np.zeros(n, dtype="float64")),
+            "label": (("dir",), np.array(["x", "y", "z"], dtype=object)),
+        },
+        coords={
+            "time": pd.date_range("2021-08-01", periods=n, freq="1s"),
+            "dir": ["x", "y", "z"],
+        },
+    )
+
+
+def test_netcdf_encoding_applies_rules_in_order():
+    policy = {
+        "default": {"zlib": True, "complevel": 1},
+        "dtypes": {"float64": {"complevel": 4}},
+        "variables": {"vel": {"complevel": 9, "shuffle": True}},
+        "time_chunk": 40,
+        "skip_coordinates": True,
+    }
+    encoding = netcdf_encoding(_dataset(), policy)
+
+    # String variables and (skipped) coordinates are not encoded
+    assert sorted(encoding) == ["pressure", "vel"]
+    assert encoding["vel"] == {
+        "zlib": True,
+        "complevel": 9,
+        "shuffle": True,
+        "chunksizes": (3, 40),
+    }
+    assert encoding["pressure"] == {
+        "zlib": True,
+        "complevel": 4,
+        "chunksizes": (40,),
+    }
+
+
+def test_netcdf_encoding_skips_small_variables_and_merges_overrides():
+    policy = {"default": {"zlib": True}, "min_size": 500, "time_chunk": 1000}
+    encoding = netcdf_encoding(_dataset(), policy, {"pressure": {"complevel": 2}})
+    assert encoding["vel"] == {"zlib": True, "chunksizes": (3, 100)}
+    assert encoding["time"] == {"zlib": True, "chunksizes": (100,)}
+    assert encoding["pressure"] == {"zlib": True, "chunksizes": (100,), "complevel": 2}
+    assert "dir" not in encoding
@@ -0,0 +1,44 @@
+import os
+import shutil
+
+from utils import IngestLedger
+
+config_dir = "ingest/wave_clallam/config"
+
+
+def test_ledger_skips_processed_files_until_config_changes(tmp_path):
+    ledger = IngestLedger(str(tmp_path / "ledger.sqlite"))
+    configs = [
+        shutil.copy(f"{config_dir}/pipeline_config_clallam_gps.yml", tmp_path),
+        shutil.copy(f"{config_dir}/storage_config_clallam.yml", tmp_path),
+    ]
+    data_file = tmp_path / "0001_LOC.CSV"
+    data_file.write_text("a,b\n1,2\n")
+
+    assert not ledger.is_processed(str(data_file), "gps", configs)
+    ledger.record(str(data_file), "gps", configs, ["out.nc"])
+    assert ledger.is_processed(str(data_file), "gps", configs)
+    assert not ledger.is_processed(str(data_file), "wave", configs)
+
+    # A renamed copy with the same contents is also recognized
+    copied_file = shutil.copy(data_file, tmp_path / "0002_LOC.CSV")
+    assert ledger.is_processed(copied_file, "gps", configs)
+
+    with open(configs[0], "a") as file:
+        file.write("\n# changed\n")
+    assert not ledger.is_processed(str(data_file), "gps", configs)
+    ledger.close()
+
+
+def test_content_hash_is_recomputed_when_file_changes(tmp_path):
+    ledger = IngestLedger(str(tmp_path / "ledger.sqlite"))
+    data_file = tmp_path / "0001_FLT.CSV"
+    data_file.write_text("a,b\n1,2\n")
+    first = ledger.content_hash(str(data_file))
+    assert ledger.content_hash(str(data_file)) == first
+
+    data_file.write_text("a,b\n3,4\n")
+    mtime = os.path.getmtime(data_file)
+    os.utime(data_file, (mtime + 10, mtime + 10))
+    assert ledger.content_hash(str(data_file)) != first
+    ledger.close()
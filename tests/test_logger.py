@@ -0,0 +1,158 @@
+import gc
+import json
+import logging
+import pytest
+import weakref
+
+from concurrent.futures import ProcessPoolExecutor
+from logging.handlers import QueueHandler
+from utils import (
+    JsonFormatter,
+    LazyJson,
+    get_lazy_log_message,
+    get_log_message,
+    init_worker_logging,
+    log_exception,
+    logger,
+    start_logging,
+    stop_logging,
+    worker_log_config,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(JsonFormatter())
+        self.lines = list()
+
+    def emit(self, record):
+        self.lines.append(json.loads(self.format(record)))
+
+
+@pytest.fixture
+def queued_logs():
+    handler = ListHandler()
+    level = logger.level
+    logger.setLevel(logging.INFO)
+    start_logging([handler], run_id="run-1")
+    yield handler.lines
+    stop_logging()
+    logger.setLevel(level)
+
+
+class RecordHandler(logging.Handler):
+    # Keeps records without formatting them, like a queue waiting for its listener
+    def __init__(self):
+        super().__init__()
+        self.records = list()
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _log_from_worker(value: int):
+    logger.info(LazyJson({"Value": value}))
+    try:
+        raise ValueError(value)
+    except ValueError:
+        log_exception("worker failed")
+
+
+def test_lazy_messages_are_only_built_when_emitted(queued_logs):
+    calls = list()
+
+    def build(value):
+        calls.append(value)
+        return {"Value": value}
+
+    logger.debug(LazyJson(build, 1))
+    logger.info(LazyJson(build, 2))
+    logger.info("Processed %s in %.1fs", "file.csv", 1.25)
+    stop_logging()
+
+    assert calls == [2]
+    assert queued_logs[0]["Value"] == 2
+    assert queued_logs[0]["Run_Id"] == "run-1"
+    assert queued_logs[0]["Worker_Id"] == "MainProcess"
+    assert queued_logs[0]["Level"] == "INFO"
+    assert queued_logs[0]["Time"].endswith("Z")
+    assert queued_logs[1]["Message"] == "Processed file.csv in 1.2s"
+    assert logger.propagate
+    assert not any(isinstance(h, QueueHandler) for h in logger.handlers)
+
+
+def test_worker_records_reach_the_parent_listener(queued_logs):
+    with ProcessPoolExecutor(
+        max_workers=2,
+        initializer=init_worker_logging,
+        initargs=(worker_log_config(),),
+    ) as executor:
+        list(executor.map(_log_from_worker, [1, 2]))
+    stop_logging()
+
+    values = sorted(line["Value"] for line in queued_logs if "Value" in line)
+    errors = [line for line in queued_logs if "Error_Message" in line]
+    assert values == [1, 2]
+    assert len(errors) == 2
+    assert all(line["Run_Id"] == "run-1" for line in queued_logs)
+    assert all(line["Worker_Id"] != "MainProcess" for line in queued_logs)
+    assert errors[0]["Error_Type"] == "ValueError"
+    assert "raise ValueError(value)" in "".join(errors[0]["Stack_Trace"])
+
+
+def test_log_exception_message_is_unchanged_without_queue(caplog):
+    with caplog.at_level(logging.ERROR, logger="utils.logger"):
+        try:
+            raise KeyError("missing")
+        except KeyError:
+            log_exception("lookup failed")
+
+    message = json.loads(caplog.records[0].getMessage())
+    assert list(message) == [
+        "Error_Message",
+        "Error_Type",
+        "Exception_Message",
+        "Stack_Trace",
+    ]
+    assert message["Error_Type"] == "KeyError"
+
+
+def test_log_exception_does_not_keep_frames_alive(monkeypatch):
+    class Dataset:
+        pass
+
+    def process(dataset):
+        raise ValueError("bad data")
+
+    handler = RecordHandler()
+    monkeypatch.setattr(logger, "propagate", False)
+    logger.addHandler(handler)
+    try:
+        dataset = Dataset()
+        reference = weakref.ref(dataset)
+        try:
+            process(dataset)
+        except ValueError:
+            log_exception("processing failed")
+        del dataset
+        gc.collect()
+        assert reference() is None
+        message = json.loads(handler.records[0].getMessage())
+    finally:
+        logger.removeHandler(handler)
+
+    assert message["Exception_Message"] == "bad data"
+    assert 'raise ValueError("bad data")' in "".join(message["Stack_Trace"])
+
+
+def test_log_message_is_a_json_string():
+    try:
+        raise KeyError("missing")
+    except KeyError:
+        message = get_log_message("Failed", "gps", "local", ["a.csv"], exception=True)
+        lazy = get_lazy_log_message("Failed", "gps", "local", ["a.csv"], exception=True)
+
+    assert isinstance(message, str)
+    assert json.loads(message)["Error_Type"] == "KeyError"
+    assert json.loads(str(lazy)) == json.loads(message)
@@ -0,0 +1,142 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from tsdat import FileHandler
+from ingest.current_mcrl.pipeline.filehandler import SplitNetCdfHandler
+from ingest.wave_clallam import Pipeline
+from utils import IngestSpec, PipelineDispatcher, PlotQueue, expand, set_env
+
+config_dir = "ingest/wave_clallam/config"
+
+
+def make_spec(name: str = "gps") -> IngestSpec:
+    config = "wave" if name == "plot_wave" else name
+    return IngestSpec(
+        pipeline=Pipeline,
+        pipeline_config=expand(
+            f"{config_dir}/pipeline_config_clallam_{config}.yml", "."
+        ),
+        storage_config=expand(f"{config_dir}/storage_config_clallam.yml", "."),
+        name=name,
+    )
+
+
+def write_loc_file(filepath, start: int, n: int = 3600):
+    times = start + np.arange(n)
+    rows = "".join(f"{t},48,1234567,-123,3000000\n" for t in times)
+    filepath.write_text(
+        "GPS_Epoch_Time(s),lat(deg),lat(min*1e5),long(deg),long(min*1e5)\n" + rows
+    )
+    return str(filepath)
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.submitted = list()
+
+    def submit(self, specification, filepath):
+        self.submitted.append((specification.name, filepath))
+
+
+def test_deferred_pipeline_submits_saved_files(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROOT_DIR", str(tmp_path / "storage"))
+    set_env()
+    spec = make_spec()
+    pipeline = spec.instantiate(use_cache=False)
+
+    def hook(dataset):
+        raise AssertionError("Plots should have been deferred")
+
+    monkeypatch.setattr(pipeline, "hook_generate_and_persist_plots", hook)
+    queue = RecordingQueue()
+    pipeline.defer_plots(queue, spec)
+    pipeline.run_daily([write_loc_file(tmp_path / "0001_LOC.CSV", 1628031600)])
+
+    assert queue.submitted == [("gps", path) for path in pipeline.output_files]
+
+
+def test_deferred_pipeline_submits_every_split_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROOT_DIR", str(tmp_path / "storage"))
+    set_env()
+    spec = make_spec()
+    pipeline = spec.instantiate(use_cache=False)
+    monkeypatch.setitem(
+        FileHandler.FILEWRITERS, ".*\\.nc", SplitNetCdfHandler(parameters={})
+    )
+    queue = RecordingQueue()
+    pipeline.defer_plots(queue, spec)
+    # 25 hours from 2021-08-03 23:00 UTC, saved as one file per 24 hours
+    pipeline.run(write_loc_file(tmp_path / "0001_LOC.CSV", 1628031600, n=90000))
+
+    assert [os.path.basename(path) for _, path in queue.submitted] == [
+        "clallam.wave_buoy-gps-400ms.a1.20210803.230000.nc",
+        "clallam.wave_buoy-gps-400ms.a1.20210804.230000.nc",
+    ]
+    assert all(os.path.exists(path) for _, path in queue.submitted)
+
+
+def test_plot_queue_reports_results(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROOT_DIR", str(tmp_path / "storage"))
+    set_env()
+    saved_file = str(tmp_path / "clallam.wave_buoy-gps-400ms.a1.20210804.000000.nc")
+    xr.Dataset(
+        {"latitude": (("time",), np.zeros(10))},
+        coords={"time": pd.date_range("2021-08-04", periods=10, freq="1s")},
+    ).to_netcdf(saved_file)
+
+    queue = PlotQueue(workers=1)
+    queue.submit(make_spec(), saved_file)
+    queue.submit(make_spec(), str(tmp_path / "missing.nc"))
+    results = queue.wait()
+    queue.shutdown()
+
+    assert [result.filepath for result in results] == [
+        saved_file,
+        str(tmp_path / "missing.nc"),
+    ]
+    assert [result.success for result in results] == [True, False]
+    assert all(result.ingest == "gps" for result in results)
+    assert results[1].error
+
+
+def test_dispatch_plots_reads_plot_variables_in_parallel(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROOT_DIR", str(tmp_path / "storage"))
+    set_env()
+    files = list()
+    for day in ["20210801", "20210802"]:
+        filepath = str(tmp_path / f"clallam.wave_buoy-motion-400ms.a1.{day}.000000.nc")
+        xr.Dataset(
+            {
+                "displacement": (("dir", "time"), np.zeros((3, 100))),
+                "unused": (("time",), np.ones(100)),
+            },
+            coords={
+                "time": pd.date_range(day, periods=100, freq="400ms"),
+                "dir": ["x", "y", "z"],
+            },
+            attrs={"datastream_name": "clallam.wave_buoy-motion-400ms.a1"},
+        ).to_netcdf(filepath)
+        files.append(filepath)
+
+    spec = make_spec("plot_wave")
+    pipeline = spec.instantiate(use_cache=False)
+    assert list(pipeline.read_plot_dataset(files[0]).data_vars) == ["displacement"]
+
+    dispatcher = PipelineDispatcher(auto_discover=False)
+    dispatcher._cache._register(re.compile(r".*motion.*\.nc"), spec)
+    unmatched = str(tmp_path / "notes.txt")
+    results = dispatcher.dispatch_plots(files + [unmatched], workers=2)
+
+    assert [result.filepath for result in results] == files + [unmatched]
+    assert [result.success for result in results] == [True, True, False]
+    assert all(result.elapsed > 0 for result in results[:2])
+    plots = [
+        filename
+        for _, _, filenames in os.walk(tmp_path / "storage")
+        for filename in filenames
+        if filename.endswith(".png")
+    ]
+    assert len(plots) == 2
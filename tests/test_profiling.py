@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import time
+import tracemalloc
+import numpy as np
+import pytest
+import xarray as xr
+
+from concurrent.futures import ProcessPoolExecutor
+
+from ingest.wave_clallam import Pipeline
+from utils import IngestSpec, StageTimer, expand, set_env
+
+config_dir = "ingest/wave_clallam/config"
+
+
+def write_loc_file(filepath, start: int, n: int = 3600):
+    times = start + np.arange(n)
+    rows = "".join(f"{t},48,1234567,-123,3000000\n" for t in times)
+    filepath.write_text(
+        "GPS_Epoch_Time(s),lat(deg),lat(min*1e5),long(deg),long(min*1e5)\n" + rows
+    )
+    return str(filepath)
+
+
+def test_stage_timer_disabled_by_default(monkeypatch, caplog):
+    monkeypatch.delenv("PIPELINE_TIMING", raising=False)
+    timer = StageTimer("test")
+    with timer.stage("extract"):
+        pass
+    with caplog.at_level(logging.INFO, logger="utils.logger"):
+        timer.emit()
+    assert not timer.stages and not caplog.records
+
+
+def test_pipeline_emits_stage_timings(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv("ROOT_DIR", str(tmp_path / "storage"))
+    monkeypatch.setenv("PIPELINE_TIMING", "True")
+    set_env()
+    pipeline = IngestSpec(
+        pipeline=Pipeline,
+        pipeline_config=expand(f"{config_dir}/pipeline_config_clallam_gps.yml", "."),
+        storage_config=expand(f"{config_dir}/storage_config_clallam.yml", "."),
+        name="gps",
+    ).instantiate(use_cache=False)
+    input_files = [
+        write_loc_file(tmp_path / "0001_LOC.CSV", 1628031600),
+        write_loc_file(tmp_path / "0002_LOC.CSV", 1628118000),
+    ]
+
+    with caplog.at_level(logging.INFO, logger="utils.logger"):
+        pipeline.run_daily(input_files)
+
+    records = [
+        json.loads(r.getMessage()) for r in caplog.records if "Stages" in r.getMessage()
+    ]
+    assert len(records) == 1
+    record = records[0]
+    assert record["State"] == "success"
+    assert record["Input_Bytes"] == sum(os.path.getsize(f) for f in input_files)
+    assert record["Output_Bytes"] == sum(
+        os.path.getsize(f) for f in pipeline.output_files
+    )
+    assert set(record["Stages"]) >= {
+        "extract",
+        "read_and_persist_raw",
+        "standardize",
+        "qc",
+        "save",
+        "plots",
+    }
+    assert all(stage["Wall"] >= 0 for stage in record["Stages"].values())
+    assert record["Wall"] >= sum(stage["Wall"] for stage in record["Stages"].values())
+
+
+def test_stage_timer_accounts_for_memory(caplog):
+    timer = StageTimer("test", memory=True)
+    with timer.stage("allocate"):
+        data = np.ones(2**20)
+        del data
+    with timer.stage("keep"):
+        dataset = xr.Dataset(
+            {"big": ("time", np.ones(2**18)), "small": ("time", np.ones(2**18, "f4"))}
+        )
+    timer.inspect("keep", {"raw": dataset})
+    with caplog.at_level(logging.INFO, logger="utils.logger"):
+        timer.emit()
+
+    record = json.loads(caplog.records[0].getMessage())
+    allocate, keep = record["Stages"]["allocate"], record["Stages"]["keep"]
+    assert allocate["Peak_Alloc"] >= 8 * 2**20 > abs(allocate["Net_Alloc"])
+    assert keep["Net_Alloc"] >= 12 * 2**18
+    assert allocate["Peak_RSS"] > 0
+    assert list(keep["Largest_Variables"]) == ["raw:big", "raw:small"]
+    assert "Memory report for test (success)" in caplog.records[1].getMessage()
+    assert not tracemalloc.is_tracing()
+
+
+def hold_memory(size: int, seconds: float) -> int:
+    data = np.ones(size, dtype="uint8")
+    time.sleep(seconds)
+    return int(data.sum())
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="requires /proc")
+def test_stage_timer_accounts_for_child_process_memory(caplog):
+    timer = StageTimer("test", memory=True)
+    with timer.stage("write"):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(hold_memory, 2**26, 0.5) for _ in range(2)]
+            assert [future.result() for future in futures] == [2**26] * 2
+    with caplog.at_level(logging.INFO, logger="utils.logger"):
+        timer.emit()
+
+    record = json.loads(caplog.records[0].getMessage())
+    assert record["Stages"]["write"]["Peak_Child_RSS"] >= 2 * 2**26
+    assert "Child RSS" in caplog.records[1].getMessage()
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from types import SimpleNamespace
+from tsdat.config import QualityManagerDefinition
+from tsdat.qc import QualityManagement
+from utils import FusedQualityManagement
+
+
+def _record(bit: int, meaning: str):
+    return {
+        "classname": "tsdat.qc.handlers.RecordQualityResults",
+        "parameters": {"bit": bit, "assessment": "bad", "meaning": meaning},
+    }
+
+
+def _config():
+    remove = {
+        "classname": "tsdat.qc.handlers.RemoveFailedValues",
+        "parameters": {"correction": "Replaced failed values with _FillValue"},
+    }
+    definitions = {
+        "manage_missing_values": {
+            "checker": {"classname": "tsdat.qc.checkers.CheckMissing"},
+            "handlers": [remove, _record(1, "Missing")],
+            "variables": ["DATA_VARS"],
+            "exclude": ["ensemble"],
+        },
+        # Not fusable: splits the fused quality managers into two groups
+        "manage_coordinate_monotonicity": {
+            "checker": {"classname": "tsdat.qc.checkers.CheckMonotonic"},
+            "handlers": [
+                {
+                    "classname": "tsdat.qc.handlers.SortDatasetByCoordinate",
+                    "parameters": {"ascending": True},
+                }
+            ],
+            "variables": ["time"],
+        },
+        "manage_min": {
+            "checker": {"classname": "tsdat.qc.checkers.CheckValidMin"},
+            "handlers": [remove, _record(2, "Below min")],
+            "variables": ["DATA_VARS"],
+            "exclude": ["ensemble"],
+        },
+        "manage_max": {
+            "checker": {"classname": "tsdat.qc.checkers.CheckValidMax"},
+            "handlers": [remove, _record(3, "Above max")],
+            "variables": ["DATA_VARS"],
+            "exclude": ["ensemble"],
+        },
+    }
+    return SimpleNamespace(
+        quality_managers={
+            name: QualityManagerDefinition(name, definition)
+            for name, definition in definitions.items()
+        }
+    )
+
+
+def _dataset(n_time: int = 200_000, seed: int = 0) -> xr.Dataset:
+    rng = np.random.default_rng(seed)
+    velocity = rng.normal(0, 1, (4, 30, n_time)).astype("float32")
+    velocity[velocity > 2.5] = np.nan
+    velocity[:, :, 10] = -9999
+    amplitude = rng.integers(0, 256, (4, 30, n_time), dtype="uint8")
+    return xr.Dataset(
+        {
+            "velocity": (
+                ("dir", "range", "time"),
+                velocity,
+                {"_FillValue": -9999, "valid_range": [-2, 2]},
+            ),
+            # Replacing with -9999 would change the dtype, so this isn't fused
+            "amplitude": (
+                ("beam", "range", "time"),
+                amplitude,
+                {"_FillValue": -9999, "valid_range": [10, 250]},
+            ),
+            "depth": (
+                ("time",),
+                rng.normal(10, 1, n_time),
+                {"_FillValue": np.nan, "valid_range": [8.0, 12.0]},
+            ),
+            "ensemble": (("time",), np.arange(n_time)),
+        },
+        coords={
+            "time": pd.date_range("2021-08-01", periods=n_time, freq="1s"),
+            "range": np.arange(30, dtype="float32"),
+            "dir": ["E", "N", "U1", "U2"],
+            "beam": [1, 2, 3, 4],
+        },
+    )
+
+
+def test_fused_qc_matches_tsdat():
+    config = _config()
+    expected = QualityManagement.run(_dataset(), _config(), None)
+    actual = FusedQualityManagement.run(_dataset(), config, None)
+
+    xr.testing.assert_identical(actual, expected)
+    for name in expected.variables:
+        assert actual[name].attrs == expected[name].attrs, name
+        assert actual[name].dtype == expected[name].dtype, name
+    assert (actual.qc_velocity.values & 1).any()
+    assert (actual.qc_depth.values & 4).any()
+
+    # The definitions are left as they were, so the config can be reused
+    assert config.quality_managers["manage_min"].variables == ["DATA_VARS"]
+    again = FusedQualityManagement.run(_dataset(), config, None)
+    xr.testing.assert_identical(again, expected)
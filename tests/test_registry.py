@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+from utils import IngestSpec, LazyIngestSpec
+from utils.registry import build_manifest, load_manifest
+
+
+def test_registry_manifest_is_up_to_date():
+    # Regenerate with `python -m utils.registry` if this fails
+    assert load_manifest() == build_manifest()
+
+
+def test_lazy_specs_resolve_to_ingest_specs():
+    for entry in load_manifest().values():
+        for spec in entry["specifications"]:
+            lazy = LazyIngestSpec(
+                module=entry["module"],
+                pattern=spec["pattern"],
+                pipeline_config=spec["pipeline_config"],
+                storage_config=spec["storage_config"],
+                name=spec["name"],
+            )
+            specification = lazy.resolve()
+            assert isinstance(specification, IngestSpec)
+            assert specification.name == spec["name"]
+
+
+def test_importing_utils_does_not_import_tsdat():
+    code = (
+        "import sys, utils; utils.set_env(); "
+        "print(sorted({m.split('.')[0] for m in sys.modules} & "
+        "{'tsdat', 'xarray', 'pandas', 'matplotlib', 'act'}))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "[]"
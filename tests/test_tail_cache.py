@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from ingest.wave_clallam import Pipeline
+from utils import IngestSpec, TailCache, expand, get_tail_cache, set_env
+
+config_dir = "ingest/wave_clallam/config"
+
+
+def make_dataset(start: str, n: int = 100) -> xr.Dataset:
+    time = pd.date_range(start, periods=n, freq="1s")
+    return xr.Dataset(
+        {
+            "temperature": (("time",), np.arange(n, dtype="float64")),
+            "depth": (("range",), np.arange(4, dtype="float64")),
+        },
+        coords={"time": time, "range": np.arange(4)},
+    )
+
+
+def test_tail_cache_returns_tail_of_previous_dataset():
+    cache = TailCache(max_records=10)
+    ds = make_dataset("2021-08-01")
+    cache.put("a", ds, "20210801.000000")
+
+    tail = cache.get("a", "20210801.120000")
+    assert tail.sizes == {"time": 10, "range": 4}
+    xr.testing.assert_identical(tail, ds.isel(time=slice(-10, None)))
+    assert not np.may_share_memory(tail.temperature.values, ds.temperature.values)
+
+    # Storage only looks back one day, and never at or after the dataset's start
+    assert cache.get("a", "20210802.000001") is None
+    assert cache.get("a", "20210801.000000") is None
+    assert cache.get("b", "20210801.120000") is None
+
+
+def test_tail_cache_checks_the_latest_file_in_storage():
+    cache = TailCache(max_records=10)
+    cache.put("a", make_dataset("2021-08-01"), "20210801.000000", "20210801.000139")
+
+    # The latest file before the next dataset was written from the cached one
+    assert cache.get("a", "20210801.120000", latest="20210801.000000") is not None
+    # A newer file (e.g., saved by another worker) is in storage
+    assert cache.get("a", "20210801.120000", latest="20210801.060000") is None
+    assert cache.get("a", "20210801.120000", latest="20210731.060000") is None
+
+
+def test_previous_dataset_is_not_a_stale_tail(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROOT_DIR", str(tmp_path / "storage"))
+    set_env()
+    get_tail_cache().clear()
+    pipeline = IngestSpec(
+        pipeline=Pipeline,
+        pipeline_config=expand(f"{config_dir}/pipeline_config_clallam_gps.yml", "."),
+        storage_config=expand(f"{config_dir}/storage_config_clallam.yml", "."),
+        name="gps",
+    ).instantiate(use_cache=False)
+    monkeypatch.setattr(pipeline, "hook_generate_and_persist_plots", lambda ds: None)
+
+    def loc_file(name: str, start: int) -> str:
+        times = start + np.arange(600)
+        rows = "".join(f"{t},48,1234567,-123,3000000\n" for t in times)
+        (tmp_path / name).write_text(
+            "GPS_Epoch_Time(s),lat(deg),lat(min*1e5),long(deg),long(min*1e5)\n" + rows
+        )
+        return str(tmp_path / name)
+
+    # 02:00 is processed before 00:00, so the cache holds the older dataset
+    later = pipeline.run(loc_file("0002_LOC.CSV", 1628042400))
+    pipeline.run(loc_file("0001_LOC.CSV", 1628035200))
+    following = later.isel(time=slice(-1, None)).assign_coords(
+        time=later.time[-1:] + np.timedelta64(1, "h")
+    )
+
+    previous = pipeline.get_previous_dataset(following)
+    assert previous.time.values[-1] == later.time.values[-1]
+    get_tail_cache().clear()
+
+
+def test_tail_cache_evicts_least_recently_used():
+    nbytes = make_dataset("2021-08-01").isel(time=slice(-10, None)).nbytes
+    cache = TailCache(max_records=10, max_bytes=2 * nbytes)
+    cache.put("a", make_dataset("2021-08-01"), "20210801.000000")
+    cache.put("b", make_dataset("2021-08-01"), "20210801.000000")
+    assert cache.get("a", "20210801.120000") is not None
+
+    cache.put("c", make_dataset("2021-08-01"), "20210801.000000")
+    assert len(cache) == 2 and cache.nbytes == 2 * nbytes
+    assert cache.get("b", "20210801.120000") is None
+    assert cache.get("a", "20210801.120000") is not None
+
+    # A tail larger than the whole budget replaces the old entry but is not cached
+    cache.max_bytes = nbytes - 1
+    cache.put("a", make_dataset("2021-08-02"), "20210802.000000")
+    assert cache.get("a", "20210802.120000") is None
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from utils import bin_to_pixels, decimate_minmax, partition_by_time
+
+
+def _dataset() -> xr.Dataset:
+    time = pd.date_range("2021-08-01 06:00", "2021-08-04 06:00", freq="1h")
+    # A second time dimension sampled at a different rate, with a gap on 08/02
+    time_b5 = pd.date_range("2021-08-01 06:00", "2021-08-04 06:00", freq="30min")
+    time_b5 = time_b5[(time_b5 < "2021-08-02 06:00") | (time_b5 >= "2021-08-03 06:00")]
+    return xr.Dataset(
+        {
+            "vel": (("time",), np.arange(len(time), dtype=float)),
+            "vel_b5": (("time_b5",), np.arange(len(time_b5), dtype=float)),
+        },
+        coords={"time": time, "time_b5": time_b5},
+    )
+
+
+def test_partition_by_time_splits_every_time_dim():
+    ds = _dataset()
+    partitions = partition_by_time(ds, 1, "D")
+    assert len(partitions) == 3
+    assert [p.sizes["time"] for p in partitions] == [24, 24, 25]
+    assert [p.sizes["time_b5"] for p in partitions] == [48, 0, 49]
+
+    # Partitions don't overlap and together cover the whole dataset
+    xr.testing.assert_identical(xr.concat([p.vel for p in partitions], "time"), ds.vel)
+    assert sum(p.sizes["time_b5"] for p in partitions) == ds.sizes["time_b5"]
+    for partition in partitions[:-1]:
+        end = partition.time.values[0] + np.timedelta64(1, "D")
+        assert (partition.time_b5.values < end).all()
+
+
+def test_partition_by_time_uses_configured_dims():
+    ds = _dataset()
+    partitions = partition_by_time(ds, 12, "h", time_dims=["time"])
+    assert len(partitions) == 6
+    assert all(p.sizes["time_b5"] == ds.sizes["time_b5"] for p in partitions)
+
+
+def test_partition_by_time_aligns_to_utc_midnight():
+    partitions = partition_by_time(_dataset(), 1, "D", ["time"], align=True)
+    assert [p.sizes["time"] for p in partitions] == [18, 24, 24, 7]
+    assert str(partitions[1].time.values[0]) == "2021-08-02T00:00:00.000000000"
+    assert str(partitions[-1].time.values[-1]) == "2021-08-04T06:00:00.000000000"
+
+
+def test_bin_to_pixels_reduces_each_bin():
+    time = pd.date_range("2021-08-01", periods=100, freq="1s")
+    values = np.arange(200, dtype=float).reshape(2, 100)
+    values[:, 50:60] = np.nan  # A gap that fills a whole bin
+    da = xr.DataArray(values, dims=("range", "time"), coords={"time": time})
+
+    binned = bin_to_pixels(da, 10)
+    assert binned.dims == ("range", "time") and binned.shape == (2, 10)
+    assert binned.time.values[0] == np.datetime64("2021-08-01T00:00:04.950")
+    np.testing.assert_allclose(binned.values[0, :2], [4.5, 14.5])
+    assert np.isnan(binned.values[:, 5]).all()
+    np.testing.assert_allclose(bin_to_pixels(da, 10, how="max").values[1, 0], 109)
+
+    directions = xr.DataArray([[350.0, 10.0, 20.0, np.nan]], dims=("range", "time"))
+    directions["time"] = time[:4]
+    np.testing.assert_allclose(
+        bin_to_pixels(directions, 1, how="circmean").values, [[6.705]], atol=1e-3
+    )
+    assert bin_to_pixels(da, 100) is da
+
+
+def test_decimate_minmax_preserves_extremes():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=100_000)
+    values[123] = 50
+    values[40_000:41_000] = np.nan
+
+    index = decimate_minmax(values, 100)
+    assert index.size <= 400 and np.all(np.diff(index) > 0)
+    assert index[0] == 0 and index[-1] == values.size - 1
+    assert np.nanmax(values[index]) == 50
+    assert np.nanmin(values[index]) == np.nanmin(values)
+    np.testing.assert_array_equal(decimate_minmax(values[:300], 100), np.arange(300))
@@ -0,0 +1,26 @@
+import re
+import time
+
+from utils import FolderWatcher, PipelineDispatcher
+
+
+def test_watcher_waits_for_files_to_settle(tmp_path):
+    dispatcher = PipelineDispatcher(auto_discover=False)
+    dispatcher._cache._register(re.compile(r".*_FLT\.CSV"), None)
+
+    (tmp_path / "0000_FLT.CSV").write_text("existing")
+    watcher = FolderWatcher(str(tmp_path), dispatcher, settle=0.2)
+
+    new_file = tmp_path / "0001_FLT.CSV"
+    new_file.write_text("partial")
+    (tmp_path / "notes.txt").write_text("not an ingest file")
+    assert watcher.poll() == []
+
+    # Still being written, so the settle timer restarts
+    time.sleep(0.1)
+    new_file.write_text("partial, now complete")
+    assert watcher.poll() == []
+
+    time.sleep(0.3)
+    assert watcher.poll() == [(str(new_file.resolve()), None)]
+    assert watcher.poll() == []
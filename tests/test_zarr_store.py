@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+import zarr
+
+from utils import ZarrHandler
+
+
+def _dataset(start: str, hours: int = 24) -> xr.Dataset:
+    time = pd.date_range(start, periods=hours, freq="1h")
+    return xr.Dataset(
+        {
+            "vel": (("range", "time"), np.random.rand(2, hours).astype("float32")),
+            "vel_b5": (("time_b5",), np.random.rand(hours)),
+            "label": (("range",), ["a", "b"]),
+        },
+        coords={
+            "time": time,
+            "time_b5": time + pd.Timedelta("1min"),
+            "range": [1.0, 2.0],
+        },
+        attrs={"datastream_name": "clallam.spotter.b1"},
+    )
+
+
+def test_zarr_store_appends_along_each_time_dim(tmp_path):
+    store = str(tmp_path / "clallam.spotter.b1.zarr")
+    handler = ZarrHandler(parameters={"time_chunk": 24, "threads": 2})
+    day1, day2 = _dataset("2021-08-01"), _dataset("2021-08-02")
+    handler.write(day1, store)
+    handler.write(day2, store)
+
+    # Chunks written for the first day are not rewritten when the second is appended
+    group = zarr.open_group(store, mode="r")
+    assert group["vel"].chunks == (2, 24)
+    assert group["vel"].nchunks_initialized == 2
+
+    # Data already in the store is not appended again
+    handler.write(day2.isel(time=slice(12, None), time_b5=slice(12, None)), store)
+
+    result = handler.read(store).load()
+    assert result.sizes["time"] == result.sizes["time_b5"] == 48
+    xr.testing.assert_identical(result.vel, xr.concat([day1.vel, day2.vel], "time"))
+    np.testing.assert_array_equal(
+        result.vel_b5.values, np.concatenate([day1.vel_b5, day2.vel_b5])
+    )
+    assert list(result.label.values) == ["a", "b"]
+
+
+def test_zarr_store_is_located_in_local_storage(tmp_path):
+    class _Storage:
+        _root = str(tmp_path)
+
+    handler = ZarrHandler()
+    path = handler.append(_dataset("2021-08-01"), _Storage())
+    assert path == str(
+        tmp_path / "clallam" / "clallam.spotter.b1" / "clallam.spotter.b1.zarr"
+    )
+    assert handler.read(path).sizes["time"] == 24
@@ -1,8 +1,54 @@
-from . import *
-from .cache import *
-from .dispatcher import *
+import importlib
+
 from .env import *
 from .logger import *
-from .pipeline import *
-from .specification import *
-from .utils import *
+
+# The other submodules import tsdat, xarray, and matplotlib, so each is only imported
+# once one of its names is first used (e.g., `from utils import IngestSpec`), and only
+# the ones an ingest actually needs are loaded
+_LAZY_NAMES = {
+    "NoMatchError": "cache",
+    "MultipleMatchError": "cache",
+    "PatternMatcher": "cache",
+    "PipelineCache": "cache",
+    "load_pipeline_config": "config_cache",
+    "load_storage": "config_cache",
+    "invalidate_config_cache": "config_cache",
+    "DispatchResult": "dispatcher",
+    "PipelineDispatcher": "dispatcher",
+    "summarize": "dispatcher",
+    "netcdf_encoding": "encoding",
+    "IngestLedger": "ledger",
+    "IngestPipeline": "pipeline",
+    "PlotResult": "plot_queue",
+    "PlotQueue": "plot_queue",
+    "StageTimer": "profiling",
+    "format_memory_report": "profiling",
+    "FusedQualityManagement": "qc",
+    "IngestSpec": "specification",
+    "LazyIngestSpec": "specification",
+    "TailCache": "tail_cache",
+    "get_tail_cache": "tail_cache",
+    "expand": "utils",
+    "format_time_xticks": "utils",
+    "add_colorbar": "utils",
+    "axes_pixel_width": "utils",
+    "bin_to_pixels": "utils",
+    "decimate_minmax": "utils",
+    "partition_by_time": "utils",
+    "FolderWatcher": "watcher",
+    "ZarrHandler": "zarr_store",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".{_LAZY_NAMES[name]}", __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
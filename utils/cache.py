@@ -1,9 +1,114 @@
+import os
+import re
 import pkgutil
 import importlib
 
 from tsdat.io import S3Path
-from typing import AnyStr, Dict, List, Union
-from .specification import IngestSpec
+from typing import AnyStr, Dict, List, Optional, Tuple, Union
+from .logger import logger
+from .specification import IngestSpec, LazyIngestSpec
+
+
+class NoMatchError(LookupError):
+    """Raised when a filepath does not match any registered regex pattern."""
+
+
+class MultipleMatchError(LookupError):
+    """Raised when a filepath matches more than one registered regex pattern."""
+
+
+class PatternMatcher:
+    """----------------------------------------------------------------------------
+    Indexed matcher for a collection of compiled regex patterns. When a pattern is
+    added, the longest run of literal characters that any match of it must contain
+    (e.g., "_sea_spider" for `.*_sea_spider.ad2cp`) is extracted. Matching a filepath
+    then only runs the regexes whose required literal appears in the filepath. This
+    is a fast substring check, so most registered patterns are ruled out without a
+    regex call.
+
+    ----------------------------------------------------------------------------"""
+
+    def __init__(self):
+        self._patterns: List[Tuple[Optional[str], "AnyStr@compile"]] = list()
+
+    def add(self, regex: "AnyStr@compile"):
+        """----------------------------------------------------------------------------
+        Adds a compiled regex pattern to the matcher.
+
+        Args:
+            regex (AnyStr@compile): The compiled regex pattern to add.
+
+        ----------------------------------------------------------------------------"""
+        self._patterns.append((_required_literal(regex), regex))
+
+    def match(self, filepath: str) -> Tuple["AnyStr@compile", ...]:
+        """----------------------------------------------------------------------------
+        Returns every registered regex pattern that matches the provided filepath, in
+        the order in which they were added.
+
+        Args:
+            filepath (str): The filepath to match.
+
+        Returns:
+            Tuple[AnyStr@compile, ...]: The matching regex patterns.
+
+        ----------------------------------------------------------------------------"""
+        return tuple(
+            regex
+            for literal, regex in self._patterns
+            if (literal is None or literal in filepath) and regex.match(filepath)
+        )
+
+
+def _required_literal(regex: "AnyStr@compile") -> Optional[str]:
+    # Scans the pattern's text for runs of literal characters outside of any group,
+    # character class, or repeat, as anything inside those may be skipped by a match.
+    # Case-insensitive and verbose patterns, and patterns with a top-level branch, are
+    # not prefiltered.
+    pattern = regex.pattern
+    if not isinstance(pattern, str) or regex.flags & (re.IGNORECASE | re.VERBOSE):
+        return None
+    runs, run = list(), list()
+    depth, i = 0, 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            # Escaped punctuation is literal; escaped letters and digits are classes,
+            # anchors, or references
+            if depth == 0 and not escaped.isalnum():
+                run.append(escaped)
+                continue
+        elif char == "[":
+            # Skip the character class, whose first character may be a literal "]"
+            i += 2 if pattern[i + 1 : i + 2] == "^" else 1
+            i += 1
+            while pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+        elif char in "*?{":
+            # The preceding character may be repeated zero times
+            if run and depth == 0:
+                run.pop()
+            i = pattern.index("}", i) + 1 if char == "{" else i + 1
+        elif char in "()":
+            depth += 1 if char == "(" else -1
+            i += 1
+        elif char == "|" and depth == 0:
+            return None
+        elif depth == 0 and char not in ".^$+*?{}":
+            run.append(char)
+            i += 1
+            continue
+        else:
+            i += 1
+        if run:
+            runs.append("".join(run))
+            run = list()
+    if run:
+        runs.append("".join(run))
+    return max(runs, key=len) if runs else None
 
 
 class PipelineCache:
@@ -15,22 +120,59 @@ class PipelineCache:
 
     def __init__(self, auto_discover: bool = False):
         self._modules: List[str] = list()
-        self._cache: Dict["AnyStr@compile", IngestSpec] = dict()
+        self._cache: Dict["AnyStr@compile", Union[IngestSpec, LazyIngestSpec]] = dict()
+        self._matcher = PatternMatcher()
         if auto_discover:
             self.discover_all()
 
-    def discover_all(self, parent_module="ingest"):
+    def discover_all(self, parent_module="ingest", use_manifest: bool = True):
         """----------------------------------------------------------------------------
         Discovers all ingests under the parent module and registers them for later use.
 
+        If the ingest registry manifest (see `utils/registry.py`) is up to date for an
+        ingest, its specifications are registered from the manifest without importing
+        the ingest module. The module is then only imported once a file matches one of
+        its patterns. Ingests that are missing from the manifest or whose `mapping.py`
+        has changed since the manifest was generated are imported eagerly.
 
         Args:
             parent_module (str, optional): The module (relative to the repository root
             folder) under which individual ingests live. Defaults to "ingest".
+            use_manifest (bool, optional): Whether to use the ingest registry manifest.
+            Defaults to True.
 
         ----------------------------------------------------------------------------"""
+        # Imported here so that `python -m utils.registry` can regenerate the manifest
+        from .registry import ROOT_DIR, load_manifest, mapping_hash
+
+        manifest = load_manifest() if use_manifest else dict()
+
         for ingest_module_info in pkgutil.iter_modules([parent_module]):
             self._modules.append(ingest_module_info.name)
+
+            entry = manifest.get(ingest_module_info.name)
+            if entry and entry["mapping_hash"] == mapping_hash(
+                ingest_module_info.name, parent_module
+            ):
+                for spec in entry["specifications"]:
+                    specification = LazyIngestSpec(
+                        module=entry["module"],
+                        pattern=spec["pattern"],
+                        pipeline_config=os.path.join(ROOT_DIR, spec["pipeline_config"]),
+                        storage_config=os.path.join(ROOT_DIR, spec["storage_config"]),
+                        name=spec["name"],
+                    )
+                    self._register(
+                        re.compile(spec["pattern"], spec["flags"]), specification
+                    )
+                continue
+
+            if use_manifest:
+                logger.debug(
+                    "Ingest registry manifest is stale for %s; importing it. Run"
+                    " `python -m utils.registry` to regenerate it.",
+                    ingest_module_info.name,
+                )
             ingest_module_classname = f"ingest.{ingest_module_info.name}"
             ingest_module = importlib.import_module(ingest_module_classname)
             mappings: Dict["AnyStr@compile", IngestSpec] = ingest_module.mapping
@@ -58,12 +200,17 @@ class PipelineCache:
         ----------------------------------------------------------------------------"""
         query_filepath = input_files[0].__str__()
         regex_key = self._match_key(query_filepath)
-        return self._cache[regex_key]
+        specification = self._cache[regex_key]
+        if isinstance(specification, LazyIngestSpec):
+            # Only import the ingest module now that a file has actually matched it
+            specification = specification.resolve()
+            self._cache[regex_key] = specification
+        return specification
 
     def _register(
         self,
         regex: "AnyStr@compile",
-        specification: IngestSpec,
+        specification: Union[IngestSpec, LazyIngestSpec],
     ):
         """----------------------------------------------------------------------------
         Adds a compiled regex pattern to the internal cache. The regex helps to map
@@ -86,24 +233,32 @@ class PipelineCache:
         ----------------------------------------------------------------------------"""
         assert regex not in self._cache
         self._cache[regex] = specification
+        self._matcher.add(regex)
 
     def _match_key(self, filepath: str) -> "AnyStr@compile":
         """----------------------------------------------------------------------------
         Matches the provided filepath against the list of registered regex patterns. If
         and only if there is exactly one match this returns the regex pattern matching
         the filepath, as this is the key in the `PipelineCache._cache` dictionary.
-        Raises an `AssertionError` if there is not exactly one match.
 
         Args:
             filepath (str): The filepath to match with a registered regex pattern.
 
+        Raises:
+            NoMatchError: If no registered regex pattern matches the filepath.
+            MultipleMatchError: If more than one registered regex pattern matches the
+            filepath.
+
         Returns:
             "AnyStr@compile": The (single) regex pattern that matches the filepath.
 
         ----------------------------------------------------------------------------"""
-        matches: List[str] = [
-            regex for regex in self._cache.keys() if regex.match(filepath)
-        ]
-        # TODO: Probably helpful to distinguish 0 matches from >1 matches
-        assert len(matches) == 1
+        matches = self._matcher.match(filepath)
+        if not matches:
+            raise NoMatchError(f"No registered ingest matches {filepath}")
+        if len(matches) > 1:
+            patterns = [regex.pattern for regex in matches]
+            raise MultipleMatchError(
+                f"{filepath} matches more than one registered ingest: {patterns}"
+            )
         return matches[0]
@@ -0,0 +1,157 @@
+import copy
+import os
+import re
+import yaml
+
+from tsdat.config import Config
+from tsdat.config.utils import configure_yaml, instantiate_handler
+from tsdat.io import DatastreamStorage, FileHandler
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Cached objects are keyed by the config's real path. Each entry records the key the
+# object was built under (mtime and referenced environment variables) so that edits
+# to the file or changes to the environment cause it to be rebuilt.
+_PIPELINE_CONFIGS: Dict[str, Tuple[Tuple, Config]] = dict()
+_STORAGES: Dict[str, Tuple[Tuple, "_CachedStorage"]] = dict()
+
+_ENV_VAR_PATTERN = re.compile(r"\$\{([^}^{]+)\}")
+
+
+class _CachedStorage:
+    def __init__(
+        self,
+        storage: DatastreamStorage,
+        readers: List[Tuple[str, Any]],
+        writers: List[Tuple[str, str, Any]],
+    ):
+        self.storage = storage
+        self.readers = readers
+        self.writers = writers
+
+    def register_file_handlers(self):
+        # FileHandler registrations are global, so they must be replayed every time
+        # the storage is handed out in case another ingest's storage replaced them.
+        for pattern, handler in self.readers:
+            FileHandler.register_file_handler("read", pattern, handler)
+
+        for key, file_extension, handler in self.writers:
+            file_pattern = f".*\\{file_extension}"
+            FileHandler.register_file_handler("write", file_pattern, handler)
+            regex = re.compile(file_pattern)
+
+            def filter_func(x, regex=regex):
+                return True if regex.match(x.__str__()) else False
+
+            DatastreamStorage.file_filters[key] = filter_func
+            DatastreamStorage.output_file_extensions[key] = file_extension
+
+            if DatastreamStorage.default_file_type is None:
+                DatastreamStorage.default_file_type = key
+
+
+def _cache_key(filepath: str, extra_env: Dict[str, str] = None) -> Tuple:
+    with open(filepath, "r") as file:
+        env_vars = sorted(set(_ENV_VAR_PATTERN.findall(file.read())))
+    env = dict(extra_env or {})
+    env.update({var: os.environ.get(var, "") for var in env_vars})
+    return (os.path.getmtime(filepath), tuple(sorted(env.items())))
+
+
+def load_pipeline_config(pipeline_config: str) -> Config:
+    """----------------------------------------------------------------------------
+    Returns the parsed `Config` for the provided pipeline config file, copied from
+    the previously-parsed object if the file and the environment variables it
+    references have not changed since it was last loaded in this process. Each call
+    returns a new copy because tsdat modifies the config while running a pipeline
+    (e.g., `QualityManager` replaces the `DATA_VARS` keyword with the names of the
+    dataset's variables).
+
+    Args:
+        pipeline_config (str): The path to the pipeline config file.
+
+    Returns:
+        Config: The parsed pipeline configuration.
+
+    ----------------------------------------------------------------------------"""
+    path = os.path.realpath(pipeline_config)
+    key = _cache_key(path)
+    cached = _PIPELINE_CONFIGS.get(path)
+    if cached is None or cached[0] != key:
+        cached = (key, Config.load(path))
+        _PIPELINE_CONFIGS[path] = cached
+    return copy.deepcopy(cached[1])
+
+
+def load_storage(storage_config: str) -> DatastreamStorage:
+    """----------------------------------------------------------------------------
+    Returns the `DatastreamStorage` for the provided storage config file, reusing the
+    previously-instantiated storage and file handlers if the file and the environment
+    variables it references have not changed since it was last loaded in this
+    process. The storage's file handlers are (re-)registered on every call.
+
+    Args:
+        storage_config (str): The path to the storage config file.
+
+    Returns:
+        DatastreamStorage: The instantiated storage.
+
+    ----------------------------------------------------------------------------"""
+    path = os.path.realpath(storage_config)
+    config_dir = os.path.dirname(path)
+    key = _cache_key(path, {"CONFIG_DIR": config_dir})
+    cached = _STORAGES.get(path)
+    if cached is None or cached[0] != key:
+        cached = (key, _instantiate_storage(path))
+        _STORAGES[path] = cached
+    else:
+        os.environ["CONFIG_DIR"] = config_dir
+    cached[1].register_file_handlers()
+    return cached[1].storage
+
+
+def invalidate_config_cache(config_path: Optional[str] = None):
+    """----------------------------------------------------------------------------
+    Drops cached pipeline configs and storages so they are rebuilt the next time they
+    are requested. Changes to a config file's mtime are detected automatically; use
+    this when a config changes in a way that is not (e.g., a file it references).
+
+    Args:
+        config_path (str, optional): The path to the pipeline or storage config file
+        to invalidate. If not provided, the entire cache is cleared.
+
+    ----------------------------------------------------------------------------"""
+    if config_path is None:
+        _PIPELINE_CONFIGS.clear()
+        _STORAGES.clear()
+        return
+    path = os.path.realpath(config_path)
+    _PIPELINE_CONFIGS.pop(path, None)
+    _STORAGES.pop(path, None)
+
+
+def _instantiate_storage(path: str) -> _CachedStorage:
+    # Mirrors `DatastreamStorage.from_config()`, but keeps hold of the file handlers
+    # so their registrations can be replayed when the storage is reused.
+    os.environ["CONFIG_DIR"] = os.path.dirname(path)
+    configure_yaml()
+
+    with open(path, "r") as file:
+        storage_dict = yaml.load(file, Loader=yaml.SafeLoader).get("storage", {})
+
+    storage = instantiate_handler(handler_desc=storage_dict)
+
+    file_handlers = storage_dict.get("file_handlers", {})
+    readers = [
+        (handler_dict["file_pattern"], instantiate_handler(handler_desc=handler_dict))
+        for handler_dict in file_handlers.get("input", {}).values()
+    ]
+    writers = [
+        (
+            key,
+            handler_dict["file_extension"],
+            instantiate_handler(handler_desc=handler_dict),
+        )
+        for key, handler_dict in file_handlers.get("output", {}).items()
+    ]
+    return _CachedStorage(storage, readers, writers)
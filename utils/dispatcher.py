@@ -2,16 +2,52 @@
 # method (Pipeline.run(...) vs Pipeline.run_plots(...)) based on mapping – if "plots"
 # is part of the IngestSpec.name string then dispatch to _run_plots()
 
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tsdat.io import S3Path
-from typing import List, Union
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 from .cache import PipelineCache
+from .env import set_env
+from .ledger import IngestLedger
+from .logger import init_worker_logging, logger, log_exception, worker_log_config
+from .plot_queue import PlotQueue, PlotResult, _plot_file
+from .specification import IngestSpec
+
+
+class DispatchResult(NamedTuple):
+    """----------------------------------------------------------------------------
+    The outcome of dispatching a single input file as part of a batch.
+
+    ----------------------------------------------------------------------------"""
+
+    filepath: str
+    ingest: Optional[str]
+    success: bool
+    elapsed: float
+    error: Optional[str] = None
+    # Saved files whose plots were deferred to the dispatching process's PlotQueue
+    plot_files: Tuple[str, ...] = ()
 
 
 class PipelineDispatcher:
-    def __init__(self, auto_discover: bool = False):
+    def __init__(
+        self,
+        auto_discover: bool = False,
+        ledger: Optional[IngestLedger] = None,
+        plot_queue: Optional[PlotQueue] = None,
+    ):
         self._cache = PipelineCache(auto_discover=auto_discover)
+        # If provided, input files already processed with the current configs are
+        # skipped, and successfully processed files are recorded.
+        self._ledger = ledger
+        # If provided, plots are rendered by the queue's worker processes instead of
+        # by the pipeline before it returns.
+        self._plot_queue = plot_queue
 
-    def dispatch(self, input_files: Union[List[S3Path], List[str]]) -> bool:
+    def dispatch(
+        self, input_files: Union[List[S3Path], List[str]], daily: bool = False
+    ) -> bool:
         """----------------------------------------------------------------------------
         Instantiates the appropriate `IngestPipeline` for the provided input files and
         calls either the `IngestPipeline.run()` or `IngestPipeline.run_plots()` method
@@ -21,6 +57,9 @@ class PipelineDispatcher:
             input_files (Union[List[S3Path], List[str]]): A list of filepaths that the
             pipeline will later be run against. This will either be S3 paths if running
             in AWS mode or string paths if running in local mode.
+            daily (bool, optional): Whether to call `IngestPipeline.run_daily()`
+            instead, which reads the files concurrently and processes and saves their
+            data once per UTC day. Defaults to False.
 
         Returns:
             bool: True if the Pipeline and method were dispatched and ran without
@@ -33,21 +72,171 @@ class PipelineDispatcher:
         if "plot" in specification.name:
             return self._run_plots(input_files)
 
-        return self._run_pipeline(input_files)
+        return self._run_pipeline(input_files, daily)
+
+    def dispatch_batch(
+        self, input_files: Union[List[S3Path], List[str]], workers: int = 1
+    ) -> List[DispatchResult]:
+        """----------------------------------------------------------------------------
+        Dispatches each of the provided input files independently across a pool of
+        worker processes. Each file is run in its own pipeline invocation so that one
+        slow or failing file does not hold up the rest of the batch; the workers reuse
+        the pipeline configs and storages of the ingests they have already run (see
+        `utils.config_cache`).
+
+        Args:
+            input_files (Union[List[S3Path], List[str]]): The filepaths to process.
+            Unlike `dispatch()`, these are *not* assumed to be co-processed.
+            workers (int, optional): The number of worker processes to use. Defaults
+            to 1.
+
+        Returns:
+            List[DispatchResult]: One result per input file, in the order in which the
+            files finished processing.
+
+        ----------------------------------------------------------------------------"""
+        results: List[DispatchResult] = []
+        matched: List[Tuple[str, IngestSpec]] = []
+
+        for input_file in input_files:
+            filepath = input_file.__str__()
+            try:
+                specification = self._cache.match_filepath([filepath])
+            except BaseException as error:
+                log_exception(f"Could not match an ingest to {filepath}")
+                results.append(DispatchResult(filepath, None, False, 0.0, str(error)))
+                continue
+            matched.append((filepath, specification))
+
+        if not matched:
+            return results
+
+        with ProcessPoolExecutor(
+            max_workers=max(1, workers),
+            initializer=_init_worker,
+            initargs=(
+                self._ledger_path(),
+                self._plot_queue is not None,
+                worker_log_config(),
+            ),
+        ) as executor:
+            futures = {
+                executor.submit(_dispatch_file, filepath, spec.name): (filepath, spec)
+                for filepath, spec in matched
+            }
+            for future in as_completed(futures):
+                filepath, spec = futures[future]
+                try:
+                    result = future.result()
+                except BaseException as error:
+                    # The worker process itself died (e.g., killed by the OS)
+                    result = DispatchResult(filepath, spec.name, False, 0.0, repr(error))
+                _log_result(result)
+                self.submit_plots(spec, result)
+                results.append(result)
+
+        return results
+
+    def dispatch_plots(
+        self, input_files: Union[List[S3Path], List[str]], workers: int = 1
+    ) -> List[PlotResult]:
+        """----------------------------------------------------------------------------
+        Regenerates the plots for a batch of processed files (e.g., after a change to
+        an ingest's plotting style) without reprocessing their data. Each file is
+        plotted by the `IngestPipeline.run_plots()` method of the ingest it matches,
+        which only reads the variables the ingest's `plot_variables` declares. Files
+        are rendered in parallel by a `PlotQueue` of `workers` processes.
+
+        Args:
+            input_files (Union[List[S3Path], List[str]]): The processed files to plot.
+            workers (int, optional): The number of worker processes. If 1, the files
+            are plotted in this process instead. Defaults to 1.
+
+        Returns:
+            List[PlotResult]: One result per file, including its render time, in the
+            order the files were provided.
+
+        ----------------------------------------------------------------------------"""
+        results: List[Optional[PlotResult]] = [None] * len(input_files)
+        futures = dict()
+        plot_queue = PlotQueue(workers=workers) if workers > 1 else None
+
+        for i, input_file in enumerate(input_files):
+            try:
+                specification = self._cache.match_filepath([input_file])
+            except BaseException as error:
+                log_exception(f"Could not match an ingest to {input_file}")
+                results[i] = PlotResult(str(input_file), None, False, 0.0, str(error))
+                continue
+            if plot_queue is None:
+                results[i] = _plot_file(specification, input_file)
+                logger.info(
+                    f"Plotted {results[i].filepath} in {results[i].elapsed:.2f}s"
+                    if results[i].success
+                    else f"Plotting failed on {results[i].filepath}"
+                )
+            else:
+                futures[i] = plot_queue.submit(specification, input_file)
+
+        if plot_queue is not None:
+            queued = plot_queue.wait()
+            plot_queue.shutdown()
+            for i, result in zip(futures, queued):
+                results[i] = result
+        return results
+
+    def submit_plots(self, specification: IngestSpec, result: DispatchResult):
+        """----------------------------------------------------------------------------
+        Submits the files whose plots a worker process deferred (see
+        `DispatchResult.plot_files`) to this dispatcher's plot queue.
 
-    def _run_pipeline(self, input_files: Union[List[S3Path], List[str]]) -> bool:
+        Args:
+            specification (IngestSpec): The specification of the ingest that processed
+            the file.
+            result (DispatchResult): The result of processing the file.
+
+        ----------------------------------------------------------------------------"""
+        if self._plot_queue is None:
+            return
+        for plot_file in result.plot_files:
+            self._plot_queue.submit(specification, plot_file)
+
+    def _run_pipeline(
+        self, input_files: Union[List[S3Path], List[str]], daily: bool = False
+    ) -> bool:
 
         # TODO: Catch possible exceptions:
-        # AssertionError – no regex match, or too many matches`
+        # NoMatchError / MultipleMatchError – no regex match, or too many matches
         # FileNotFoundError – bad config file path or data file path
         # DefinitionError – a config file not defined correctly.
         # QCError – pipeline failed because of poor data quality – manual intervention
         # BaseException – any other error: catch, report, and carry on.
         try:
             specification = self._cache.match_filepath(input_files)
+            config_files = [specification.pipeline_config, specification.storage_config]
+            if self._ledger and all(
+                self._ledger.is_processed(str(path), specification.name, config_files)
+                for path in input_files
+            ):
+                logger.info(f"Skipping already-processed input(s): {input_files}")
+                return True
             pipeline = specification.instantiate()
-            pipeline.run(input_files)
+            if self._plot_queue is not None:
+                pipeline.defer_plots(self._plot_queue, specification)
+            if daily:
+                pipeline.run_daily(input_files)
+            else:
+                pipeline.run(input_files)
+            if self._ledger:
+                for path in input_files:
+                    self._ledger.record(
+                        str(path),
+                        specification.name,
+                        config_files,
+                        getattr(pipeline, "output_files", None),
+                    )
         except BaseException:
+            log_exception(f"Pipeline failed on {input_files}")
             return False
 
         return True
@@ -55,7 +244,7 @@ class PipelineDispatcher:
     def _run_plots(self, input_files: Union[List[S3Path], List[str]]) -> bool:
 
         # TODO: Catch possible exceptions:
-        # AssertionError – no regex match, or too many matches
+        # NoMatchError / MultipleMatchError – no regex match, or too many matches
         # FileNotFoundError – bad config file path or data file path
         # DefinitionError – a config file not defined correctly.
         # QCError – pipeline failed because of poor data quality – manual intervention
@@ -65,6 +254,94 @@ class PipelineDispatcher:
             pipeline = specification.instantiate()
             pipeline.run_plots(input_files)
         except BaseException:
+            log_exception(f"Plotting failed on {input_files}")
             return False
 
         return True
+
+    def _ledger_path(self) -> Optional[str]:
+        return self._ledger.ledger_path if self._ledger else None
+
+
+def summarize(results: List[DispatchResult]) -> Dict:
+    """----------------------------------------------------------------------------
+    Aggregates the per-file results of `PipelineDispatcher.dispatch_batch()`.
+
+    Args:
+        results (List[DispatchResult]): The results to summarize.
+
+    Returns:
+        Dict: The total, succeeded, and failed file counts, the summed processing
+        time, a per-ingest breakdown, and the list of files that failed.
+
+    ----------------------------------------------------------------------------"""
+    summary = {
+        "Total": len(results),
+        "Succeeded": sum(result.success for result in results),
+        "Failed": sum(not result.success for result in results),
+        "Elapsed": round(sum(result.elapsed for result in results), 3),
+        "Ingests": dict(),
+        "Failed_Files": [result.filepath for result in results if not result.success],
+    }
+    for result in results:
+        counts = summary["Ingests"].setdefault(
+            result.ingest, {"Succeeded": 0, "Failed": 0}
+        )
+        counts["Succeeded" if result.success else "Failed"] += 1
+    return summary
+
+
+class _PlotCollector:
+    # Stands in for a PlotQueue in worker processes: the saved files are returned to
+    # the dispatching process, whose PlotQueue renders their plots.
+    def __init__(self):
+        self.plot_files: List[str] = list()
+
+    def submit(self, specification: IngestSpec, filepath: Union[S3Path, str]):
+        self.plot_files.append(filepath)
+
+
+# Each worker process holds its own dispatcher so discovered ingests are reused across
+# all of the files that worker is handed.
+_worker_dispatcher: Optional[PipelineDispatcher] = None
+
+
+def _init_worker(
+    ledger_path: Optional[str] = None,
+    defer_plots: bool = False,
+    log_config: Optional[Tuple] = None,
+):
+    global _worker_dispatcher
+    set_env()
+    init_worker_logging(log_config)
+    ledger = IngestLedger(ledger_path) if ledger_path else None
+    plot_queue = _PlotCollector() if defer_plots else None
+    _worker_dispatcher = PipelineDispatcher(
+        auto_discover=True, ledger=ledger, plot_queue=plot_queue
+    )
+
+
+def _dispatch_file(filepath: str, ingest: str) -> DispatchResult:
+    # The ingest was matched by the dispatching process. Errors raised outside of the
+    # pipeline (e.g., if this worker can't match the file) are the file's result too,
+    # so that only a worker that died is reported as such.
+    start = time.perf_counter()
+    try:
+        success = _worker_dispatcher.dispatch([filepath])
+        error = None if success else "Pipeline raised an exception; see worker log"
+    except BaseException as exception:
+        log_exception(f"Could not dispatch {filepath}")
+        success, error = False, str(exception)
+    elapsed = time.perf_counter() - start
+    plot_files: Tuple[str, ...] = ()
+    if _worker_dispatcher._plot_queue is not None:
+        plot_files = tuple(_worker_dispatcher._plot_queue.plot_files)
+        _worker_dispatcher._plot_queue.plot_files.clear()
+    return DispatchResult(filepath, ingest, success, elapsed, error, plot_files)
+
+
+def _log_result(result: DispatchResult):
+    logger.info(
+        f"{'Processed' if result.success else 'Failed'} {result.filepath} "
+        f"({result.ingest}) in {result.elapsed:.2f}s"
+    )
@@ -0,0 +1,80 @@
+import xarray as xr
+
+from typing import Dict, Optional
+from .utils import _time_dims
+
+
+def netcdf_encoding(
+    ds: xr.Dataset, policy: Dict, overrides: Optional[Dict[str, Dict]] = None
+) -> Dict[str, Dict]:
+    """----------------------------------------------------------------------------
+    Builds the `encoding` argument for `xr.Dataset.to_netcdf()` from an encoding
+    policy, typically provided by the `encoding` write parameter of a netCDF
+    FileHandler in the storage config file, e.g.:
+
+    .. code-block:: yaml
+
+        encoding:
+          # Applied to every variable that is encoded
+          default: {zlib: True, complevel: 1, shuffle: True}
+          # Applied (after the default) to variables of the given dtype
+          dtypes:
+            float64: {complevel: 4}
+          # Applied last to the named variables
+          variables:
+            velocity: {complevel: 5}
+          # Chunk length along the time dimensions; other dimensions are unchunked
+          time_chunk: 3600
+          # Variables smaller than this many bytes are left unencoded
+          min_size: 4096
+          # Whether dimension coordinates are left unencoded
+          skip_coordinates: True
+
+    String and object variables are never encoded, as the netCDF compression
+    filters do not apply to them.
+
+    Args:
+        ds (xr.Dataset): The dataset that will be written.
+        policy (Dict): The encoding policy.
+        overrides (Dict[str, Dict], optional): Explicit per-variable encodings (e.g.,
+        the `encoding` argument passed to `to_netcdf`), which take precedence over
+        the policy. Defaults to None.
+
+    Returns:
+        Dict[str, Dict]: The encoding for each variable.
+
+    ----------------------------------------------------------------------------"""
+    default = policy.get("default", {})
+    dtype_rules = policy.get("dtypes", {})
+    variable_rules = policy.get("variables", {})
+    time_chunk = policy.get("time_chunk")
+    min_size = policy.get("min_size", 0)
+    skip_coordinates = policy.get("skip_coordinates", False)
+    time_dims = policy.get("time_dims") or _time_dims(ds)
+
+    encoding: Dict[str, Dict] = dict()
+    for name, variable in ds.variables.items():
+        if variable.dtype.kind in "OSU":
+            continue
+        if name not in variable_rules:
+            if skip_coordinates and name in ds.dims:
+                continue
+            if variable.nbytes < min_size:
+                continue
+
+        var_encoding = dict(default)
+        var_encoding.update(dtype_rules.get(str(variable.dtype), {}))
+        var_encoding.update(variable_rules.get(name, {}))
+
+        if time_chunk and "chunksizes" not in var_encoding and 0 not in variable.shape:
+            if any(dim in time_dims for dim in variable.dims):
+                var_encoding["chunksizes"] = tuple(
+                    min(time_chunk, size) if dim in time_dims else size
+                    for dim, size in zip(variable.dims, variable.shape)
+                )
+        encoding[name] = var_encoding
+
+    for name, var_encoding in (overrides or {}).items():
+        encoding[name] = {**encoding.get(name, {}), **var_encoding}
+
+    return encoding
@@ -18,6 +18,8 @@ def set_env(**kwargs):
         "STORAGE_CLASSNAME": "tsdat.io.FilesystemStorage",
         "STORAGE_BUCKET": "N/A",
         "ROOT_DIR": "storage",
+        "PIPELINE_TIMING": "False",
+        "PIPELINE_MEMORY": "False",
     }
     defaults.update(kwargs)
 
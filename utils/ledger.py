@@ -0,0 +1,171 @@
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+
+from typing import List, Optional
+from .config_cache import _ENV_VAR_PATTERN
+
+
+class IngestLedger:
+    """----------------------------------------------------------------------------
+    Persistent local record of the input files that have been ingested. Each entry
+    records the input file's content hash, the name of the ingest that processed it,
+    a hash of the configuration files used, and the output files that were written.
+    This allows reruns over the same inputs (e.g., a backfill) to skip files whose
+    content and configuration are unchanged.
+
+    Content hashes are cached against each file's path, size, and modification time,
+    so unchanged files are not re-read to check whether they have been processed.
+
+    ----------------------------------------------------------------------------"""
+
+    def __init__(self, ledger_path: Optional[str] = None):
+        """----------------------------------------------------------------------------
+        Opens (and creates, if needed) the ledger database.
+
+        Args:
+            ledger_path (str, optional): The path to the SQLite ledger file. Defaults
+            to the `INGEST_LEDGER` environment variable if set, otherwise to
+            `ingest_ledger.sqlite` in the `ROOT_DIR` storage folder.
+
+        ----------------------------------------------------------------------------"""
+        if ledger_path is None:
+            ledger_path = os.environ.get("INGEST_LEDGER") or os.path.join(
+                os.environ.get("ROOT_DIR", "storage"), "ingest_ledger.sqlite"
+            )
+        ledger_dir = os.path.dirname(os.path.abspath(ledger_path))
+        os.makedirs(ledger_dir, exist_ok=True)
+
+        self.ledger_path = ledger_path
+        self._connection = sqlite3.connect(ledger_path, timeout=30)
+        with self._connection:
+            # Allows worker processes to read while another one records a result
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, sha256 TEXT)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS ingested ("
+                "sha256 TEXT, name TEXT, config_hash TEXT, input_path TEXT, "
+                "output_files TEXT, processed_at TEXT, "
+                "PRIMARY KEY (sha256, name, config_hash))"
+            )
+
+    def content_hash(self, filepath: str) -> str:
+        """----------------------------------------------------------------------------
+        Returns the sha256 hash of the file's contents. The file is only read if its
+        size or modification time changed since it was last hashed.
+
+        Args:
+            filepath (str): The path to the file to hash.
+
+        Returns:
+            str: The hex digest of the file's contents.
+
+        ----------------------------------------------------------------------------"""
+        path = os.path.realpath(filepath)
+        stat = os.stat(path)
+        row = self._connection.execute(
+            "SELECT size, mtime, sha256 FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        if row is not None and row[:2] == (stat.st_size, stat.st_mtime):
+            return row[2]
+
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                sha256.update(block)
+        digest = sha256.hexdigest()
+
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, digest),
+            )
+        return digest
+
+    @staticmethod
+    def config_hash(config_files: List[str]) -> str:
+        """----------------------------------------------------------------------------
+        Returns a hash of the provided configuration files and the values of the
+        environment variables they reference, so that a change to either causes
+        previously-processed inputs to be processed again.
+
+        Args:
+            config_files (List[str]): The paths to the pipeline and storage config
+            files.
+
+        Returns:
+            str: The hex digest of the configuration.
+
+        ----------------------------------------------------------------------------"""
+        sha256 = hashlib.sha256()
+        for config_file in config_files:
+            with open(config_file, "rb") as file:
+                contents = file.read()
+            sha256.update(contents)
+            for env_var in sorted(set(_ENV_VAR_PATTERN.findall(contents.decode()))):
+                sha256.update(f"{env_var}={os.environ.get(env_var, '')}".encode())
+        return sha256.hexdigest()
+
+    def is_processed(self, filepath: str, name: str, config_files: List[str]) -> bool:
+        """----------------------------------------------------------------------------
+        Checks whether the file's current contents have already been processed by the
+        named ingest using the current configuration.
+
+        Args:
+            filepath (str): The path to the input file.
+            name (str): The name of the ingest (e.g., the `IngestSpec.name`).
+            config_files (List[str]): The paths to the pipeline and storage config
+            files used by the ingest.
+
+        Returns:
+            bool: True if the file has already been processed, False otherwise.
+
+        ----------------------------------------------------------------------------"""
+        row = self._connection.execute(
+            "SELECT 1 FROM ingested WHERE sha256 = ? AND name = ? AND config_hash = ?",
+            (
+                self.content_hash(filepath),
+                name,
+                self.config_hash(config_files),
+            ),
+        ).fetchone()
+        return row is not None
+
+    def record(
+        self,
+        filepath: str,
+        name: str,
+        config_files: List[str],
+        output_files: Optional[List[str]] = None,
+    ):
+        """----------------------------------------------------------------------------
+        Records that the file was successfully processed by the named ingest.
+
+        Args:
+            filepath (str): The path to the input file.
+            name (str): The name of the ingest (e.g., the `IngestSpec.name`).
+            config_files (List[str]): The paths to the pipeline and storage config
+            files used by the ingest.
+            output_files (List[str], optional): The output files that were written.
+
+        ----------------------------------------------------------------------------"""
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO ingested VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.content_hash(filepath),
+                    name,
+                    self.config_hash(config_files),
+                    os.path.realpath(filepath),
+                    json.dumps([str(path) for path in output_files or []]),
+                    datetime.datetime.utcnow().isoformat(),
+                ),
+            )
+
+    def close(self):
+        self._connection.close()
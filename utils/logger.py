@@ -1,46 +1,351 @@
 import traceback
 
+import atexit
+import copy
 import json
 import logging
+import multiprocessing
+import os
+import queue
 import sys
+import time
+import uuid
+
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
 
-def log_exception(error_message=""):
-    exception_type, exception_value, exception_traceback = sys.exc_info()
-    traceback_string = traceback.format_exception(
-        exception_type, exception_value, exception_traceback
-    )
-    err_msg = json.dumps(
-        {
-            "Error_Message": error_message,
-            "Error_Type": exception_type.__name__,
-            "Exception_Message": str(exception_value),
-            "Stack_Trace": traceback_string,
+class LazyJson:
+    """----------------------------------------------------------------------------
+    A structured log message that is only built when a handler emits it, e.g.:
+
+    .. code-block:: python
+
+        logger.debug(LazyJson(lambda: {"Variables": describe(dataset)}))
+
+    If the logger's level filters the record out, the fields are never built. When
+    logging is queued (see `start_logging()`), they are built and serialized on the
+    listener's thread instead of the caller's. `str()` gives the fields as JSON, so
+    handlers that are not JSON-aware still log the same message.
+
+    Args:
+        fields (Union[Dict, Callable[..., Dict]]): The fields of the message, or a
+        function that returns them.
+        *args: Arguments passed to the function.
+
+    ----------------------------------------------------------------------------"""
+
+    __slots__ = ("_fields", "_args")
+
+    def __init__(self, fields: Union[Dict, Callable[..., Dict]], *args):
+        self._fields = fields
+        self._args = args
+
+    def fields(self) -> Dict:
+        if callable(self._fields):
+            self._fields = self._fields(*self._args)
+            self._args = ()
+        return self._fields
+
+    def __str__(self) -> str:
+        return json.dumps(self.fields(), default=str)
+
+
+class JsonFormatter(logging.Formatter):
+    """----------------------------------------------------------------------------
+    Formats each record as a single line of JSON with the time, level, run id, and
+    worker id of the record. Structured messages (`LazyJson` or dict) are merged
+    into the line; other messages are stored under "Message".
+
+    ----------------------------------------------------------------------------"""
+
+    def __init__(self):
+        super().__init__()
+        # (second, formatted second); one attribute so that threads sharing the
+        # formatter never see a second and another second's text
+        self._second: Tuple[int, str] = (-1, "")
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "Time": self._format_time(record.created),
+            "Level": record.levelname,
+            "Run_Id": getattr(record, "run_id", None),
+            "Worker_Id": getattr(record, "worker_id", None),
         }
+        fields = _structured_fields(record)
+        if fields is None:
+            entry["Message"] = record.getMessage()
+        else:
+            entry.update(fields)
+        if record.exc_info:
+            entry.setdefault("Stack_Trace", self.formatException(record.exc_info))
+        elif record.exc_text:
+            entry.setdefault("Stack_Trace", record.exc_text)
+        return json.dumps(entry, default=str)
+
+    def _format_time(self, created: float) -> str:
+        # Records arrive in bursts, so the date and time are only formatted once per
+        # second
+        second, text = self._second
+        if int(created) != second:
+            second = int(created)
+            text = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._second = (second, text)
+        return f"{text}.{int((created - second) * 1000):03d}Z"
+
+
+class _QueueHandler(QueueHandler):
+    # Records are queued without being formatted, so building and serializing
+    # messages happens on the listener's thread (objects passed as message arguments
+    # must therefore not be modified after they are logged). Records sent to another
+    # process must be picklable, so their messages and tracebacks are rendered first.
+
+    def __init__(self, log_queue: Any, pickle: bool = False):
+        super().__init__(log_queue)
+        self.pickle = pickle
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if not self.pickle:
+            return record
+        record = copy.copy(record)
+        fields = _structured_fields(record)
+        record.msg = fields if fields is not None else record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.stack_info = None
+        return record
+
+
+class _ContextFilter(logging.Filter):
+    # Stamps each record with the run and worker ids on the thread that logs it
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.run_id = _context["run_id"]
+        record.worker_id = (
+            _context["worker_id"] or multiprocessing.current_process().name
+        )
+        return True
+
+
+# The worker id defaults to the name of the process
+_context: Dict[str, Optional[str]] = {"run_id": None, "worker_id": None}
+logger.addFilter(_ContextFilter())
+
+# The handlers installed on `logger` by this module, and the listeners writing
+# queued records
+_installed: List[logging.Handler] = list()
+_listener: Optional[QueueListener] = None
+_worker_queue: Any = None
+_worker_listener: Optional[QueueListener] = None
+
+
+def start_logging(
+    handlers: List[logging.Handler] = None, run_id: Optional[str] = None
+) -> str:
+    """----------------------------------------------------------------------------
+    Routes `logger`'s records through a queue to a listener thread that formats and
+    writes them, so that logging does not block the pipeline. Records logged by
+    worker processes set up with `init_worker_logging()` are sent to the same
+    handlers. Stopped by `stop_logging()`, which is also registered to run at exit.
+    Calling this again while logging is queued has no effect.
+
+    Args:
+        handlers (List[logging.Handler], optional): The handlers that write the
+        records. Defaults to a handler that writes `JsonFormatter` lines to stderr.
+        run_id (str, optional): The id added to every record of this run. Defaults to
+        a random id.
+
+    Returns:
+        str: The run id.
+
+    ----------------------------------------------------------------------------"""
+    global _listener
+    if _listener is not None:
+        return _context["run_id"]
+
+    if handlers is None:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        handlers = [handler]
+
+    _context["run_id"] = run_id or uuid.uuid4().hex[:12]
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _install_handlers([_QueueHandler(log_queue)])
+    atexit.register(stop_logging)
+    return _context["run_id"]
+
+
+def stop_logging():
+    """----------------------------------------------------------------------------
+    Writes any queued records and restores `logger`'s default (unqueued) setup.
+
+    ----------------------------------------------------------------------------"""
+    global _listener, _worker_queue, _worker_listener
+    if _worker_listener is not None:
+        _worker_listener.stop()
+        _worker_queue.close()
+        _worker_listener, _worker_queue = None, None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    _install_handlers([])
+    logger.propagate = True
+    _context["run_id"] = None
+
+
+def worker_log_config() -> Optional[Tuple[Any, Optional[str]]]:
+    """----------------------------------------------------------------------------
+    Returns the configuration to pass to `init_worker_logging()` in the initializer
+    of a worker process pool, so that the workers' records are written by this
+    process's listener. The first call starts a listener for a queue shared with the
+    workers.
+
+    Returns:
+        Optional[Tuple[Any, Optional[str]]]: The configuration, or None if logging
+        is not queued (see `start_logging()`).
+
+    ----------------------------------------------------------------------------"""
+    global _worker_queue, _worker_listener
+    if _listener is None:
+        return None
+    if _worker_listener is None:
+        _worker_queue = multiprocessing.Queue()
+        _worker_listener = QueueListener(
+            _worker_queue, *_listener.handlers, respect_handler_level=True
+        )
+        _worker_listener.start()
+    return _worker_queue, _context["run_id"]
+
+
+def init_worker_logging(
+    config: Optional[Tuple[Any, Optional[str]]], worker_id: Optional[str] = None
+):
+    """----------------------------------------------------------------------------
+    Sends the records `logger` receives in a worker process to the parent process
+    that created `config` (see `worker_log_config()`), tagged with the parent's run
+    id and this worker's id.
+
+    Args:
+        config (Optional[Tuple[Any, Optional[str]]]): The parent's configuration.
+        Logging is left unchanged if None.
+        worker_id (str, optional): The id of the worker. Defaults to the name of the
+        process.
+
+    ----------------------------------------------------------------------------"""
+    if config is None:
+        return
+    worker_queue, run_id = config
+    _context["run_id"] = run_id
+    _context["worker_id"] = worker_id
+    _install_handlers([_QueueHandler(worker_queue, pickle=True)])
+
+
+def set_log_context(**fields: Optional[str]):
+    """----------------------------------------------------------------------------
+    Sets the `run_id` and/or `worker_id` added to every record `logger` receives in
+    this process (see `JsonFormatter`).
+
+    ----------------------------------------------------------------------------"""
+    unknown = set(fields) - set(_context)
+    if unknown:
+        raise ValueError(f"Unknown log context fields: {sorted(unknown)}")
+    _context.update(fields)
+
+
+def _install_handlers(handlers: List[logging.Handler]):
+    for handler in _installed:
+        logger.removeHandler(handler)
+    _installed[:] = handlers
+    for handler in handlers:
+        logger.addHandler(handler)
+    if handlers:
+        logger.propagate = False
+
+
+def _after_fork_in_child():
+    # A forked child (e.g., of a pool that doesn't call `init_worker_logging()`)
+    # doesn't have the parent's listener thread, so it writes records directly
+    if _listener is not None and any(
+        isinstance(handler, _QueueHandler) and not handler.pickle
+        for handler in _installed
+    ):
+        _install_handlers(list(_listener.handlers))
+    _context["worker_id"] = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _structured_fields(record: logging.LogRecord) -> Optional[Dict]:
+    if isinstance(record.msg, LazyJson):
+        return record.msg.fields()
+    if isinstance(record.msg, dict) and not record.args:
+        return record.msg
+    return None
+
+
+def _capture_exception(exc_info: Tuple) -> Tuple[str, traceback.TracebackException]:
+    # Summarizes the exception without keeping a reference to its traceback, whose
+    # frames (and all of their local variables) would otherwise stay alive until the
+    # record is emitted
+    exception_type, exception_value, exception_traceback = exc_info
+    return exception_type.__name__, traceback.TracebackException(
+        exception_type, exception_value, exception_traceback, lookup_lines=False
     )
-    logger.error(err_msg)
+
+
+def _exception_fields(
+    error_message: str, exception: Tuple[str, traceback.TracebackException]
+) -> Dict:
+    error_type, summary = exception
+    return {
+        "Error_Message": error_message,
+        "Error_Type": error_type,
+        "Exception_Message": str(summary),
+        "Stack_Trace": list(summary.format()),
+    }
+
+
+def log_exception(error_message=""):
+    # The traceback is formatted when the record is emitted
+    exception = _capture_exception(sys.exc_info())
+    logger.error(LazyJson(_exception_fields, error_message, exception))
 
 
 def get_log_message(
     pipeline_state, pipeline_name, location, input_files, exception=False
-):
+) -> str:
+    return str(
+        get_lazy_log_message(
+            pipeline_state, pipeline_name, location, input_files, exception
+        )
+    )
+
 
+def get_lazy_log_message(
+    pipeline_state, pipeline_name, location, input_files, exception=False
+) -> LazyJson:
+    # Same message as `get_log_message()`, serialized when the record is emitted
     log_msg = {
         "Pipeline_Name": pipeline_name,
         "State": pipeline_state,
         "Location": location,
         "Input_Files": input_files,
     }
+    if not exception:
+        return LazyJson(log_msg)
 
-    if exception:
-        exception_type, exception_value, exception_traceback = sys.exc_info()
-        traceback_string = traceback.format_exception(
-            exception_type, exception_value, exception_traceback
-        )
-        log_msg["Error_Type"] = exception_type.__name__
-        log_msg["Exception_Message"] = str(exception_value)
-        log_msg["Stack_Trace"] = traceback_string
+    def build(captured: Tuple[str, traceback.TracebackException]) -> Dict:
+        fields = _exception_fields("", captured)
+        log_msg["Error_Type"] = fields["Error_Type"]
+        log_msg["Exception_Message"] = fields["Exception_Message"]
+        log_msg["Stack_Trace"] = fields["Stack_Trace"]
+        return log_msg
 
-    return json.dumps(log_msg)
+    return LazyJson(build, _capture_exception(sys.exc_info()))
@@ -1,10 +1,34 @@
+import datetime
+import time
 import xarray as xr
-from tsdat import IngestPipeline, FileHandler, S3Path
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from tsdat import IngestPipeline, DatastreamStorage, FileHandler, S3Path
+from tsdat.config import DatasetDefinition
+from tsdat.io.filehandlers import NetCdfHandler
 from tsdat.qc import QualityManagement
-from typing import Union, List, Dict
+from tsdat.utils import DSUtil
+from typing import TYPE_CHECKING, Any, Optional, Tuple, Union, List, Dict
+from .logger import logger
+from .profiling import StageTimer
+from .qc import FusedQualityManagement
+from .tail_cache import get_tail_cache
+from .utils import partition_by_time
+from .zarr_store import ZarrHandler
+
+if TYPE_CHECKING:
+    from .plot_queue import PlotQueue
+    from .specification import IngestSpec
 
 
 class IngestPipeline(IngestPipeline):
+    # The variables `hook_generate_and_persist_plots()` uses. If set, `run_plots()`
+    # only reads these (and their coordinates) from each file. None reads everything.
+    plot_variables: Optional[List[str]] = None
+
+    # (PlotQueue, IngestSpec) that plots are handed off to; see `defer_plots()`
+    _deferred_plots: Optional[Tuple[Any, Any]] = None
+
     def run(self, filepath: Union[str, List[str]]) -> xr.Dataset:
         """----------------------------------------------------------------------------
         Runs the pipeline from start to finish.
@@ -19,42 +43,307 @@ class IngestPipeline(IngestPipeline):
             written to disk.
 
         ----------------------------------------------------------------------------"""
-        # If the file is a zip/tar, then we need to extract the individual files
-        with self.storage.tmp.extract_files(filepath) as file_paths:
+        timer = StageTimer(self.config.pipeline_definition.output_datastream_name)
+        success = False
+        try:
+            with ExitStack() as stack:
+                # If the file is a zip/tar, then we need to extract the individual files
+                with timer.stage("extract"):
+                    file_paths = stack.enter_context(
+                        self.storage.tmp.extract_files(filepath)
+                    )
+                timer.add_input_files(_as_list(file_paths))
 
-            # Open each raw file into a Dataset, standardize the raw file names and store.
-            raw_dataset_mapping: Dict[
-                str, xr.Dataset
-            ] = self.read_and_persist_raw_files(file_paths)
+                # Open each raw file into a Dataset, standardize the raw file names and
+                # store.
+                with timer.stage("read_and_persist_raw"):
+                    raw_dataset_mapping: Dict[
+                        str, xr.Dataset
+                    ] = self.read_and_persist_raw_files(file_paths)
+                timer.inspect("read_and_persist_raw", raw_dataset_mapping)
 
-            # Customize the raw data before it is used as input for standardization
-            raw_dataset_mapping: Dict[
-                str, xr.Dataset
-            ] = self.hook_customize_raw_datasets(raw_dataset_mapping)
+                # Customize the raw data before it is used as input for standardization
+                with timer.stage("customize_raw"):
+                    raw_dataset_mapping: Dict[
+                        str, xr.Dataset
+                    ] = self.hook_customize_raw_datasets(raw_dataset_mapping)
+                timer.inspect("customize_raw", raw_dataset_mapping)
 
-            # Standardize the dataset and apply corrections / customizations
-            dataset = self.standardize_dataset(raw_dataset_mapping)
-            dataset = self.hook_customize_dataset(dataset, raw_dataset_mapping)
+                # Standardize the dataset and apply corrections / customizations
+                with timer.stage("standardize"):
+                    dataset = self.standardize_dataset(raw_dataset_mapping)
+                timer.inspect("standardize", dataset)
+                with timer.stage("customize"):
+                    dataset = self.hook_customize_dataset(dataset, raw_dataset_mapping)
+                timer.inspect("customize", dataset)
 
-            # Apply quality control / quality assurance to the dataset.
-            previous_dataset = self.get_previous_dataset(dataset)
-            dataset = QualityManagement.run(dataset, self.config, previous_dataset)
+                # Apply quality control / quality assurance to the dataset.
+                with timer.stage("previous_dataset"):
+                    previous_dataset = self.get_previous_dataset(dataset)
+                with timer.stage("qc"):
+                    dataset = self.run_quality_management(dataset, previous_dataset)
+                timer.inspect("qc", dataset)
 
-            # Apply any final touches to the dataset and persist the dataset
-            dataset = self.hook_finalize_dataset(dataset)
-            dataset = self.decode_cf(dataset)
-            self.storage.save(dataset)
+                # Apply any final touches to the dataset and persist the dataset
+                with timer.stage("finalize"):
+                    dataset = self.hook_finalize_dataset(dataset)
+                timer.inspect("finalize", dataset)
+                with timer.stage("decode_cf"):
+                    dataset = self.decode_cf(dataset)
+                timer.inspect("decode_cf", dataset)
+                with timer.stage("save"):
+                    self.output_files = self.save_dataset(dataset)
+                timer.add_output_files(self.output_files)
 
-            # Hook to generate custom plots
-            self.hook_generate_and_persist_plots(dataset)
+                # Hook to generate custom plots
+                with timer.stage("plots"):
+                    self.generate_plots(dataset, self.output_files)
+            success = True
+        finally:
+            timer.emit(success)
 
         return dataset
 
+    def run_daily(
+        self, filepath: Union[str, List[str]], workers: int = 4
+    ) -> List[xr.Dataset]:
+        """----------------------------------------------------------------------------
+        Runs the pipeline on a batch of sequential files from one instrument (e.g., the
+        NNNN_FLT.CSV files from a Spotter SD card). The files are read concurrently,
+        concatenated and standardized once, and the standardized data are then split
+        on UTC midnights so that quality control, saving, and plotting run once per
+        day of data instead of once per file.
+
+        Args:
+            filepath (Union[str, List[str]]): The path or list of paths to the file(s)
+            to run the pipeline on.
+            workers (int, optional): The number of threads used to read the files.
+            Defaults to 4.
+
+        Returns:
+            List[xr.Dataset]: The processed dataset for each day, in time order. The
+            paths of every saved file are collected in `self.output_files`.
+
+        ----------------------------------------------------------------------------"""
+        datasets: List[xr.Dataset] = list()
+        output_files: List[Any] = list()
+        timer = StageTimer(self.config.pipeline_definition.output_datastream_name)
+        success = False
+        try:
+            with ExitStack() as stack:
+                with timer.stage("extract"):
+                    file_paths = stack.enter_context(
+                        self.storage.tmp.extract_files(filepath)
+                    )
+                timer.add_input_files(_as_list(file_paths))
+
+                with timer.stage("read_and_persist_raw"):
+                    raw_dataset_mapping: Dict[
+                        str, xr.Dataset
+                    ] = self.read_and_persist_raw_files(file_paths, workers=workers)
+                timer.inspect("read_and_persist_raw", raw_dataset_mapping)
+                with timer.stage("customize_raw"):
+                    raw_dataset_mapping: Dict[
+                        str, xr.Dataset
+                    ] = self.hook_customize_raw_datasets(raw_dataset_mapping)
+                timer.inspect("customize_raw", raw_dataset_mapping)
+
+                with timer.stage("standardize"):
+                    dataset = self.standardize_dataset(raw_dataset_mapping)
+                timer.inspect("standardize", dataset)
+                with timer.stage("customize"):
+                    dataset = self.hook_customize_dataset(dataset, raw_dataset_mapping)
+                timer.inspect("customize", dataset)
+
+                # Each day is saved before the next one is processed, so it is found
+                # as the previous dataset of the next day by the QC tests. Stage
+                # times are summed over the days.
+                with timer.stage("partition"):
+                    daily_datasets = partition_by_time(dataset, 1, "D", ["time"], True)
+                for daily_dataset in daily_datasets:
+                    with timer.stage("previous_dataset"):
+                        previous_dataset = self.get_previous_dataset(daily_dataset)
+                    with timer.stage("qc"):
+                        daily_dataset = self.run_quality_management(
+                            daily_dataset, previous_dataset
+                        )
+                    timer.inspect("qc", daily_dataset)
+                    with timer.stage("finalize"):
+                        daily_dataset = self.hook_finalize_dataset(daily_dataset)
+                    timer.inspect("finalize", daily_dataset)
+                    with timer.stage("decode_cf"):
+                        daily_dataset = self.decode_cf(daily_dataset)
+                    timer.inspect("decode_cf", daily_dataset)
+                    with timer.stage("save"):
+                        saved_paths = self.save_dataset(daily_dataset)
+                    timer.add_output_files(saved_paths)
+                    with timer.stage("plots"):
+                        self.generate_plots(daily_dataset, saved_paths)
+                    output_files += saved_paths
+                    datasets.append(daily_dataset)
+            success = True
+        finally:
+            timer.emit(success)
+
+        self.output_files = output_files
+        return datasets
+
+    def defer_plots(self, plot_queue: "PlotQueue", specification: "IngestSpec"):
+        """----------------------------------------------------------------------------
+        Hands plot generation off to the provided `PlotQueue`: each saved output file
+        is submitted to the queue, which runs `hook_generate_and_persist_plots()` on
+        it in a worker process, instead of the pipeline rendering the plots before it
+        returns.
+
+        Args:
+            plot_queue (PlotQueue): The queue to submit saved files to.
+            specification (IngestSpec): The specification this pipeline was
+            instantiated from, used to instantiate it again in the worker.
+
+        ----------------------------------------------------------------------------"""
+        self._deferred_plots = (plot_queue, specification)
+
+    def generate_plots(self, dataset: xr.Dataset, saved_paths: List[Any]):
+        """----------------------------------------------------------------------------
+        Generates the plots for a dataset that was just saved, either by calling
+        `hook_generate_and_persist_plots()` or, if plots are deferred (see
+        `defer_plots()`), by submitting the saved file to the plot queue.
+
+        Args:
+            dataset (xr.Dataset): The dataset that was saved.
+            saved_paths (List[Any]): The paths the dataset was saved to.
+
+        ----------------------------------------------------------------------------"""
+        if self._deferred_plots is not None:
+            # The workers read the file written by the default output handler
+            filter_func = DatastreamStorage.file_filters.get(
+                DatastreamStorage.default_file_type
+            )
+            paths = [path for path in saved_paths if filter_func and filter_func(path)]
+            if paths:
+                # Datasets split into several files (e.g., per day) are plotted per file
+                plot_queue, specification = self._deferred_plots
+                for path in paths:
+                    plot_queue.submit(specification, path)
+                return
+        self.hook_generate_and_persist_plots(dataset)
+
+    def run_quality_management(
+        self, dataset: xr.Dataset, previous_dataset: Optional[xr.Dataset]
+    ) -> xr.Dataset:
+        """----------------------------------------------------------------------------
+        Applies the quality managers defined in the pipeline config file. Pipelines
+        that set `qc_engine: fused` in the `pipeline` section of their config file use
+        `FusedQualityManagement`, which applies the standard missing and valid range
+        checks in a single pass over each variable; otherwise tsdat's
+        `QualityManagement` is used.
+
+        Args:
+            dataset (xr.Dataset): The dataset to apply quality control to.
+            previous_dataset (xr.Dataset, optional): The previous dataset for the same
+            datastream, if any.
+
+        Returns:
+            xr.Dataset: The dataset after quality control.
+
+        ----------------------------------------------------------------------------"""
+        engine = self.config.pipeline_definition.dictionary.get("qc_engine", "tsdat")
+        if engine == "fused":
+            return FusedQualityManagement.run(dataset, self.config, previous_dataset)
+        if engine != "tsdat":
+            raise ValueError(f"Unknown qc_engine '{engine}'. Use 'tsdat' or 'fused'.")
+        return QualityManagement.run(dataset, self.config, previous_dataset)
+
+    def read_and_persist_raw_files(
+        self, file_paths: Union[str, List[str]], workers: int = 1
+    ) -> Dict[str, xr.Dataset]:
+        """----------------------------------------------------------------------------
+        Reads each raw file into a Dataset and saves a copy of the file to storage
+        under its standardized raw filename. Files are read on `workers` threads; the
+        returned mapping is in the same order as the provided files regardless.
+
+        Args:
+            file_paths (Union[str, List[str]]): The path(s) to the raw file(s).
+            workers (int, optional): The number of threads used to read the files.
+            Defaults to 1.
+
+        Returns:
+            Dict[str, xr.Dataset]: The raw datasets, keyed by their standardized raw
+            filenames.
+
+        ----------------------------------------------------------------------------"""
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+
+        if workers > 1 and len(file_paths) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._read_and_persist, file_paths))
+        else:
+            results = [self._read_and_persist(file_path) for file_path in file_paths]
+
+        return {filename: dataset for filename, dataset in filter(None, results)}
+
+    def _read_and_persist(self, file_path: str) -> Optional[Tuple[str, xr.Dataset]]:
+        with self.storage.tmp.fetch(file_path) as tmp_path:
+            dataset = FileHandler.read(tmp_path)
+            if dataset is None:
+                logger.warning(f"Couldn't use extracted raw file: {tmp_path}")
+                return None
+            new_filename = DSUtil.get_raw_filename(dataset, tmp_path, self.config)
+            self.storage.save(tmp_path, new_filename)
+        return new_filename, dataset
+
+    def reduce_raw_datasets(
+        self, raw_mapping: Dict[str, xr.Dataset], definition: DatasetDefinition
+    ) -> List[xr.Dataset]:
+        """----------------------------------------------------------------------------
+        Reduces each raw dataset to the variables used by the dataset definition.
+        Sequential files from one instrument reduce to datasets with the same
+        variables over consecutive times and the same other coordinates; these are
+        concatenated along "time" here, which is linear in their size, rather than
+        being aligned against one another by `xr.merge()` during standardization.
+
+        Args:
+            raw_mapping (Dict[str, xr.Dataset]): The raw datasets.
+            definition (DatasetDefinition): The definition of the output dataset.
+
+        Returns:
+            List[xr.Dataset]: The reduced dataset(s).
+
+        ----------------------------------------------------------------------------"""
+        reduced = super().reduce_raw_datasets(raw_mapping, definition)
+        if len(reduced) < 2 or any(ds.sizes.get("time", 0) == 0 for ds in reduced):
+            return reduced
+        names = set(reduced[0].variables)
+        if any(set(ds.variables) != names for ds in reduced[1:]):
+            return reduced
+
+        # Files whose other coordinates (e.g., range) or time-independent variables
+        # differ are left for xr.merge() to align
+        try:
+            combined = xr.concat(
+                sorted(reduced, key=lambda ds: ds["time"].values[0]),
+                dim="time",
+                data_vars="minimal",
+                coords="minimal",
+                compat="equals",
+                join="exact",
+            )
+        except (ValueError, xr.MergeError):
+            return reduced
+        # Overlapping files are left for xr.merge() to reconcile
+        time_index = combined.indexes["time"]
+        if not (time_index.is_monotonic_increasing and time_index.is_unique):
+            return reduced
+        return [combined]
+
     def run_plots(self, files: Union[List[S3Path], List[str]]):
         """----------------------------------------------------------------------------
         Runs the `IngestPipeline.hook_generate_and_persist_plots()` function on the
         provided file or list of files. This is useful for re-running plots without the
-        need to also reprocess the data.
+        need to also reprocess the data. Only the `plot_variables` are read, if the
+        pipeline declares them. To regenerate the plots for many files in parallel,
+        see `PipelineDispatcher.dispatch_plots()`.
 
         Args:
             files (Union[List[S3Path], str]): The file(s) to read in and produce plots
@@ -62,6 +351,153 @@ class IngestPipeline(IngestPipeline):
 
         ----------------------------------------------------------------------------"""
         for _file in files:
+            start = time.perf_counter()
             with self.storage.tmp.fetch(_file) as tmp_file:
-                ds = FileHandler.read(tmp_file)
+                ds = self.read_plot_dataset(tmp_file)
                 self.hook_generate_and_persist_plots(ds)
+                ds.close()
+            logger.debug("Plotted %s in %.2fs", _file, time.perf_counter() - start)
+
+    def read_plot_dataset(self, filepath: str) -> xr.Dataset:
+        """----------------------------------------------------------------------------
+        Reads a processed file for `run_plots()`. If the pipeline declares its
+        `plot_variables`, only those variables and their coordinates are read; tsdat's
+        netCDF FileHandler (which loads every variable) is bypassed to do so.
+
+        Args:
+            filepath (str): The local path to the file.
+
+        Returns:
+            xr.Dataset: The dataset to plot.
+
+        ----------------------------------------------------------------------------"""
+        handler = FileHandler._get_handler(filepath, "read")
+        if self.plot_variables and type(handler) is NetCdfHandler:
+            kwargs = handler.parameters.get("read", {}).get("load_dataset", {})
+            with xr.open_dataset(filepath, **kwargs) as ds:
+                return ds[[name for name in self.plot_variables if name in ds]].load()
+
+        ds = FileHandler.read(filepath, config=self.config)
+        if self.plot_variables:
+            ds = ds[[name for name in self.plot_variables if name in ds]]
+        return ds
+
+    def save_dataset(self, dataset: xr.Dataset) -> List[Any]:
+        """----------------------------------------------------------------------------
+        Saves the dataset with every registered output FileHandler. Mirrors
+        `DatastreamStorage.save()`, except that handlers which update a persistent
+        store in place (i.e., the `ZarrHandler`) write to it directly instead of to a
+        temporary file that is then copied into storage. The tail of the dataset is
+        then cached for `get_previous_dataset()`.
+
+        Handlers that split the dataset into several files (e.g., per day) save the
+        extra files themselves; their paths are returned too.
+
+        Args:
+            dataset (xr.Dataset): The dataset to save.
+
+        Returns:
+            List[Any]: The paths where the dataset was saved.
+
+        ----------------------------------------------------------------------------"""
+        saved_paths = []
+        for file_extension in DatastreamStorage.output_file_extensions.values():
+            dataset_filename = DSUtil.get_dataset_filename(
+                dataset, file_extension=file_extension
+            )
+            handler = FileHandler._get_handler(dataset_filename, "write")
+            if isinstance(handler, ZarrHandler):
+                saved_paths.append(handler.append(dataset, self.storage, self.config))
+                continue
+
+            storage = _RecordingStorage(self.storage)
+            with self.storage.tmp.get_temp_filepath(dataset_filename) as tmp_path:
+                FileHandler.write(dataset, tmp_path, storage=storage)
+                saved_paths.append(self.storage.save_local_path(tmp_path))
+            saved_paths.extend(storage.saved_paths)
+
+        start_date, start_time = DSUtil.get_start_time(dataset)
+        end_date, end_time = DSUtil.get_end_time(dataset)
+        get_tail_cache().put(
+            self._tail_cache_key(dataset),
+            dataset,
+            f"{start_date}.{start_time}",
+            f"{end_date}.{end_time}",
+        )
+        return saved_paths
+
+    def get_previous_dataset(self, dataset: xr.Dataset) -> xr.Dataset:
+        """----------------------------------------------------------------------------
+        Retrieves the previous set of data for the same datastream as the provided
+        dataset. If this process saved the previous dataset, and storage (which is
+        listed, not read) has no newer file before the dataset, its tail is returned
+        from the `TailCache` without reading storage. Otherwise the previous file is
+        fetched; it may be a temporary copy that is deleted once it has been fetched,
+        so datasets read lazily (see the `read` parameters of the netCDF FileHandler)
+        are loaded into memory before the file is released.
+
+        Args:
+            dataset (xr.Dataset): The reference dataset used to search the storage for
+            prior data.
+
+        Returns:
+            xr.Dataset: The previous dataset if it exists, otherwise None.
+
+        ----------------------------------------------------------------------------"""
+        start_date, start_time = DSUtil.get_start_time(dataset)
+        start = f"{start_date}.{start_time}"
+        datastream_name = DSUtil.get_datastream_name(dataset, self.config)
+        latest = self._latest_file_date(datastream_name, start)
+        prev_dataset = None
+        if latest is not None:
+            prev_dataset = get_tail_cache().get(
+                self._tail_cache_key(dataset), start, latest
+            )
+            if prev_dataset is not None:
+                return prev_dataset
+
+        with self.storage.tmp.fetch_previous_file(datastream_name, start) as netcdf_file:
+            if netcdf_file:
+                prev_dataset = FileHandler.read(netcdf_file, config=self.config)
+                prev_dataset.load()
+                prev_dataset.close()
+
+        return prev_dataset
+
+    def _latest_file_date(self, datastream_name: str, start: str) -> Optional[str]:
+        # The date of the file `fetch_previous_file()` would fetch, from a listing of
+        # the same window of storage
+        earliest = datetime.datetime.strptime(start, "%Y%m%d.%H%M%S")
+        earliest = (earliest - datetime.timedelta(days=1)).strftime("%Y%m%d.%H%M%S")
+        files = self.storage.find(
+            datastream_name,
+            earliest,
+            start,
+            filetype=DatastreamStorage.default_file_type,
+        )
+        dates = [DSUtil.get_date_from_filename(str(file)) for file in files]
+        return max(dates) if dates else None
+
+    def _tail_cache_key(self, dataset: xr.Dataset) -> Tuple[str, str]:
+        datastream_name = DSUtil.get_datastream_name(dataset, self.config)
+        return str(getattr(self.storage, "_root", None)), datastream_name
+
+
+class _RecordingStorage:
+    # Passed to output FileHandlers in place of the storage, so that the paths of the
+    # files they save themselves (e.g., `SplitNetCdfHandler`) are known
+    def __init__(self, storage: DatastreamStorage):
+        self._storage = storage
+        self.saved_paths: List[Any] = list()
+
+    def save_local_path(self, local_path: str, new_filename: str = None) -> Any:
+        path = self._storage.save_local_path(local_path, new_filename)
+        self.saved_paths.append(path)
+        return path
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._storage, name)
+
+
+def _as_list(file_paths: Union[Any, List[Any]]) -> List[Any]:
+    return file_paths if isinstance(file_paths, list) else [file_paths]
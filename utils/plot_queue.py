@@ -0,0 +1,127 @@
+import time
+
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from threading import Lock
+from tsdat.io import S3Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+from .env import set_env
+from .logger import init_worker_logging, logger, log_exception, worker_log_config
+from .specification import IngestSpec
+
+
+class PlotResult(NamedTuple):
+    """----------------------------------------------------------------------------
+    The outcome of rendering the plots for a single saved output file.
+
+    ----------------------------------------------------------------------------"""
+
+    filepath: str
+    ingest: Optional[str]
+    success: bool
+    elapsed: float
+    error: Optional[str] = None
+
+
+class PlotQueue:
+    """----------------------------------------------------------------------------
+    Pool of worker processes that render plots off the ingest's critical path.
+    Pipelines that defer their plots (see `IngestPipeline.defer_plots()`) submit the
+    path of each file they save instead of calling `hook_generate_and_persist_plots()`
+    themselves, and can move on to the next file while a worker reads the saved file
+    and runs the hook on it (via `IngestPipeline.run_plots()`). The outcome of each
+    file is logged as it completes and returned by `wait()`.
+
+    ----------------------------------------------------------------------------"""
+
+    def __init__(self, workers: int = 1):
+        self._executor = ProcessPoolExecutor(
+            max_workers=max(1, workers),
+            initializer=_init_plot_worker,
+            initargs=(worker_log_config(),),
+        )
+        self._futures: Dict[Future, Tuple[str, str]] = dict()
+        self._lock = Lock()
+
+    def submit(
+        self, specification: IngestSpec, filepath: Union[S3Path, str]
+    ) -> "Future[PlotResult]":
+        """----------------------------------------------------------------------------
+        Queues the plots for a saved output file.
+
+        Args:
+            specification (IngestSpec): The specification of the ingest that saved the
+            file, used to instantiate its pipeline in the worker.
+            filepath (Union[S3Path, str]): The path to the saved file.
+
+        Returns:
+            Future[PlotResult]: The future result of rendering the plots.
+
+        ----------------------------------------------------------------------------"""
+        future = self._executor.submit(_plot_file, specification, filepath)
+        with self._lock:
+            self._futures[future] = (str(filepath), specification.name)
+        future.add_done_callback(self._log)
+        return future
+
+    def wait(self) -> List[PlotResult]:
+        """----------------------------------------------------------------------------
+        Blocks until every queued file has been plotted.
+
+        Returns:
+            List[PlotResult]: One result per queued file, in the order they were
+            submitted.
+
+        ----------------------------------------------------------------------------"""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures)
+        return [self._result(future) for future in futures]
+
+    def shutdown(self, wait: bool = True):
+        """----------------------------------------------------------------------------
+        Stops accepting plots. Files that were already queued are still plotted.
+
+        Args:
+            wait (bool, optional): Whether to block until they have been. Defaults to
+            True.
+
+        ----------------------------------------------------------------------------"""
+        self._executor.shutdown(wait=wait)
+
+    def _result(self, future: Future) -> PlotResult:
+        filepath, ingest = self._futures[future]
+        try:
+            return future.result()
+        except BaseException as error:
+            # The worker process itself died (e.g., killed by the OS)
+            return PlotResult(filepath, ingest, False, 0.0, repr(error))
+
+    def _log(self, future: Future):
+        with self._lock:
+            result = self._result(future)
+        if result.success:
+            logger.info(f"Plotted {result.filepath} in {result.elapsed:.2f}s")
+        else:
+            logger.error(f"Plotting failed on {result.filepath}: {result.error}")
+
+
+def _init_plot_worker(log_config: Optional[Tuple] = None):
+    import matplotlib
+
+    set_env()
+    init_worker_logging(log_config)
+    # Workers only write image files, so use the non-interactive backend
+    matplotlib.use("Agg")
+
+
+def _plot_file(specification: IngestSpec, filepath: Union[S3Path, str]) -> PlotResult:
+    start = time.perf_counter()
+    try:
+        pipeline = specification.instantiate()
+        pipeline.run_plots([filepath])
+    except BaseException as error:
+        log_exception(f"Plotting failed on {filepath}")
+        elapsed = time.perf_counter() - start
+        return PlotResult(str(filepath), specification.name, False, elapsed, repr(error))
+    elapsed = time.perf_counter() - start
+    return PlotResult(str(filepath), specification.name, True, elapsed)
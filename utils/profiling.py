@@ -0,0 +1,347 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import xarray as xr
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from .logger import LazyJson, logger
+
+
+class StageTimer:
+    """----------------------------------------------------------------------------
+    Times the stages of a pipeline run and emits a single structured JSON record for
+    the run through `utils.logger`, e.g.:
+
+    .. code-block:: json
+
+        {"Pipeline_Name": "clallam.wave_buoy-motion.a1", "State": "success",
+         "Input_Files": ["0001_FLT.CSV"], "Input_Bytes": 1048576,
+         "Output_Bytes": 524288, "Wall": 2.31, "CPU": 2.05,
+         "Stages": {"extract": {"Wall": 0.001, "CPU": 0.001}, ...}}
+
+    Wall and CPU (process) times are in seconds. Stages that run more than once
+    (e.g., per day in `IngestPipeline.run_daily()`) are summed. Enabled by setting
+    the `PIPELINE_TIMING` environment variable to "True" (see `set_env`); when
+    disabled, stages are not timed and nothing is logged.
+
+    Setting `PIPELINE_MEMORY` to "True" also accounts for the memory used by each
+    stage, and adds to each stage's entry:
+
+    - `Peak_Alloc`: the peak Python-allocated memory (per `tracemalloc`) above what
+      was allocated when the stage started, in bytes.
+    - `Net_Alloc`: the memory still allocated when the stage ended minus what was
+      allocated when it started (summed over repeated stages), in bytes.
+    - `Peak_RSS`: the peak resident set size of the process during the stage, as
+      sampled every `MEMORY_SAMPLE_INTERVAL` seconds, in bytes. Unlike tracemalloc,
+      this includes memory allocated by C libraries (e.g., netCDF, HDF5).
+    - `Peak_Child_RSS`: the peak total resident set size of the process's child
+      processes during the stage (e.g., the pool `SplitNetCdfHandler` writes files
+      with), sampled like `Peak_RSS`, in bytes. Child processes are found through
+      /proc, so this is 0 on platforms without it.
+    - `Largest_Variables`: the `MEMORY_TOP_VARIABLES` largest variables of the
+      dataset(s) the stage produced (see `inspect()`), in bytes.
+
+    The per-stage memory is also logged as a human-readable table (see
+    `format_memory_report()`). Memory accounting slows the pipeline down
+    considerably, so it is meant for diagnosing a problem rather than production.
+
+    ----------------------------------------------------------------------------"""
+
+    # Seconds between RSS samples, and the number of variables kept per stage
+    MEMORY_SAMPLE_INTERVAL: float = 0.01
+    MEMORY_TOP_VARIABLES: int = 5
+
+    def __init__(self, pipeline_name: str, enabled: bool = None, memory: bool = None):
+        if memory is None:
+            memory = os.environ.get("PIPELINE_MEMORY", "False").lower() == "true"
+        if enabled is None:
+            enabled = os.environ.get("PIPELINE_TIMING", "False").lower() == "true"
+        self.memory = memory
+        self.enabled = enabled or memory
+        self.pipeline_name = pipeline_name
+        self.input_files: List[str] = list()
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.stages: Dict[str, Dict[str, Any]] = dict()
+        self._sampler: Optional[_RssSampler] = None
+        self._started_tracemalloc = False
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            self._sampler = _RssSampler(self.MEMORY_SAMPLE_INTERVAL)
+        self._start = (time.perf_counter(), time.process_time())
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """----------------------------------------------------------------------------
+        Context manager that times the enclosed stage of the run.
+
+        Args:
+            name (str): The name of the stage.
+
+        ----------------------------------------------------------------------------"""
+        if not self.enabled:
+            yield
+            return
+        if self.memory:
+            tracemalloc.reset_peak()
+            allocated = tracemalloc.get_traced_memory()[0]
+            self._sampler.reset()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, {"Wall": 0.0, "CPU": 0.0})
+            stage["Wall"] += time.perf_counter() - wall
+            stage["CPU"] += time.process_time() - cpu
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                stage["Peak_Alloc"] = max(stage.get("Peak_Alloc", 0), peak - allocated)
+                stage["Net_Alloc"] = stage.get("Net_Alloc", 0) + current - allocated
+                rss, child_rss = self._sampler.peak()
+                stage["Peak_RSS"] = max(stage.get("Peak_RSS", 0), rss)
+                stage["Peak_Child_RSS"] = max(stage.get("Peak_Child_RSS", 0), child_rss)
+
+    def inspect(self, name: str, dataset: Union[xr.Dataset, Dict[str, xr.Dataset]]):
+        """----------------------------------------------------------------------------
+        Records the largest variables of the dataset(s) produced by a stage, if memory
+        accounting is enabled. For stages that run more than once, the largest size
+        seen for each variable is kept.
+
+        Args:
+            name (str): The name of the stage that produced the dataset(s).
+            dataset (Union[xr.Dataset, Dict[str, xr.Dataset]]): The dataset, or the
+            mapping of raw datasets, at the end of the stage. Variables of mapped
+            datasets are prefixed with their key.
+
+        ----------------------------------------------------------------------------"""
+        if not self.memory:
+            return
+        datasets = dataset if isinstance(dataset, dict) else {None: dataset}
+        stage = self.stages.setdefault(name, {"Wall": 0.0, "CPU": 0.0})
+        sizes: Dict[str, int] = dict(stage.get("Largest_Variables", {}))
+        for key, ds in datasets.items():
+            for var_name, var in ds.variables.items():
+                var_name = str(var_name) if key is None else f"{key}:{var_name}"
+                sizes[var_name] = max(sizes.get(var_name, 0), int(var.nbytes))
+        largest = sorted(sizes.items(), key=lambda item: item[1], reverse=True)
+        stage["Largest_Variables"] = dict(largest[: self.MEMORY_TOP_VARIABLES])
+
+    def add_input_files(self, paths: List[Any]):
+        """----------------------------------------------------------------------------
+        Records the files read by the run. Their sizes are measured immediately, as
+        extracted input files are temporary.
+
+        Args:
+            paths (List[Any]): The paths to the (local) input files.
+
+        ----------------------------------------------------------------------------"""
+        if self.enabled:
+            self.input_files += [str(path) for path in paths]
+            self.input_bytes += sum(_size(path) for path in paths)
+
+    def add_output_files(self, paths: List[Any]):
+        """----------------------------------------------------------------------------
+        Records the files written by the run.
+
+        Args:
+            paths (List[Any]): The paths the outputs were saved to.
+
+        ----------------------------------------------------------------------------"""
+        if self.enabled:
+            self.output_bytes += sum(_size(path) for path in paths)
+
+    def record(self, success: bool = True) -> Dict[str, Any]:
+        """----------------------------------------------------------------------------
+        Returns the record for the run so far.
+
+        Args:
+            success (bool, optional): Whether the run succeeded. Defaults to True.
+
+        Returns:
+            Dict[str, Any]: The run's timing record.
+
+        ----------------------------------------------------------------------------"""
+        return {
+            "Pipeline_Name": self.pipeline_name,
+            "State": "success" if success else "failure",
+            "Input_Files": self.input_files,
+            "Input_Bytes": self.input_bytes,
+            "Output_Bytes": self.output_bytes,
+            "Wall": round(time.perf_counter() - self._start[0], 6),
+            "CPU": round(time.process_time() - self._start[1], 6),
+            "Stages": {
+                name: {
+                    key: round(value, 6) if isinstance(value, float) else value
+                    for key, value in stage.items()
+                }
+                for name, stage in self.stages.items()
+            },
+        }
+
+    def emit(self, success: bool = True):
+        """----------------------------------------------------------------------------
+        Logs the record for the run as JSON, if timing is enabled.
+
+        Args:
+            success (bool, optional): Whether the run succeeded. Defaults to True.
+
+        ----------------------------------------------------------------------------"""
+        if not self.enabled:
+            return
+        record = self.record(success)
+        if self.memory:
+            self._sampler.stop()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        logger.info(LazyJson(record))
+        if self.memory:
+            logger.info(format_memory_report(record))
+
+
+def format_memory_report(record: Dict[str, Any]) -> str:
+    """----------------------------------------------------------------------------
+    Formats the per-stage memory of a `StageTimer` record as a table, e.g.:
+
+    .. code-block:: text
+
+        Memory report for mcrl.water_velocity-1s.b1 (success)
+        Stage                   Peak alloc   Net alloc    Peak RSS   Child RSS  Largest variable
+        read_and_persist_raw      412.3 MB     96.1 MB      1.2 GB         0 B  vel (32.0 MB)
+        ...
+        save                        8.1 MB    204.8 KB      1.2 GB      2.3 GB  vel (32.0 MB)
+
+    Args:
+        record (Dict[str, Any]): The record returned by `StageTimer.record()`.
+
+    Returns:
+        str: The table.
+
+    ----------------------------------------------------------------------------"""
+    lines = [
+        f"Memory report for {record['Pipeline_Name']} ({record['State']})",
+        f"{'Stage':<22}{'Peak alloc':>12}{'Net alloc':>12}{'Peak RSS':>12}"
+        f"{'Child RSS':>12}  Largest variable",
+    ]
+    for name, stage in record["Stages"].items():
+        largest = stage.get("Largest_Variables", {})
+        variable = next(
+            (f"{var} ({_format_bytes(size)})" for var, size in largest.items()), ""
+        )
+        lines.append(
+            f"{name:<22}{_format_bytes(stage.get('Peak_Alloc', 0)):>12}"
+            f"{_format_bytes(stage.get('Net_Alloc', 0)):>12}"
+            f"{_format_bytes(stage.get('Peak_RSS', 0)):>12}"
+            f"{_format_bytes(stage.get('Peak_Child_RSS', 0)):>12}  {variable}"
+        )
+    return "\n".join(lines)
+
+
+class _RssSampler:
+    # Background thread that samples the resident set size of the process and of its
+    # child processes, so that short-lived spikes within a stage are caught, not just
+    # its start and end. Finding the children means scanning /proc, so it is only
+    # done every `CHILD_SCAN_SAMPLES` samples; pool workers live much longer.
+
+    CHILD_SCAN_SAMPLES = 10
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        self.reset()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        samples = 0
+        while not self._stopped.wait(self._interval):
+            samples += 1
+            if samples % self.CHILD_SCAN_SAMPLES == 0:
+                self._children = _child_pids()
+            self._sample()
+
+    def _sample(self):
+        self._peak = max(self._peak, _rss())
+        child_rss = sum(_rss(pid) for pid in self._children)
+        self._peak_children = max(self._peak_children, child_rss)
+
+    def reset(self):
+        self._children = _child_pids()
+        self._peak = _rss()
+        self._peak_children = sum(_rss(pid) for pid in self._children)
+
+    def peak(self) -> Tuple[int, int]:
+        self._sample()
+        return self._peak, self._peak_children
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+def _rss(pid: Optional[int] = None) -> int:
+    # Current resident set size of this (or another) process in bytes. Read from
+    # /proc on Linux; elsewhere, fall back to the peak RSS of this process so far (0
+    # if unavailable, or for other processes)
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        if pid is not None:
+            return 0
+    try:
+        import resource
+    except ImportError:
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _child_pids() -> List[int]:
+    # The ids of this process's child processes, per /proc (empty without it)
+    parent = str(os.getpid())
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    pids = list()
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # The command name may contain spaces, so the fields (state, parent
+                # id, ...) are split after its closing parenthesis
+                fields = stat.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if len(fields) > 1 and fields[1] == parent:
+            pids.append(int(entry))
+    return pids
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(size) < 1024 or unit == "GB":
+            break
+        size /= 1024
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+def _size(path: Any) -> int:
+    # Size in bytes of a local file or directory (e.g., a Zarr store); 0 for remote
+    # (S3) or missing paths
+    if not isinstance(path, (str, os.PathLike)) or not os.path.exists(path):
+        return 0
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, filename))
+        for root, _, filenames in os.walk(path)
+        for filename in filenames
+    )
@@ -0,0 +1,284 @@
+import copy
+import numpy as np
+import xarray as xr
+
+from tsdat.config import Config, QualityManagerDefinition
+from tsdat.qc import QualityManagement
+from tsdat.qc.qc import QualityManager
+from tsdat.utils import DSUtil
+from typing import Callable, Dict, List, Optional
+
+
+_FUSED_CHECKERS = {
+    "tsdat.qc.checkers.CheckMissing",
+    "tsdat.qc.checkers.CheckValidMin",
+    "tsdat.qc.checkers.CheckValidMax",
+}
+_REMOVE_HANDLER = "tsdat.qc.handlers.RemoveFailedValues"
+_RECORD_HANDLER = "tsdat.qc.handlers.RecordQualityResults"
+
+# Number of elements processed at a time, so that every check of a chunk runs while
+# it is still in cache
+_CHUNK_SIZE = 1 << 16
+
+
+class FusedQualityManagement(QualityManagement):
+    """----------------------------------------------------------------------------
+    Drop-in replacement for `tsdat.qc.QualityManagement` that fuses the standard
+    missing and valid range checks. Enabled for a pipeline by setting `qc_engine:
+    fused` in the `pipeline` section of its config file.
+
+    Consecutive quality managers whose checker is `CheckMissing`, `CheckValidMin` or
+    `CheckValidMax` and whose handlers are `RemoveFailedValues` and/or
+    `RecordQualityResults` are applied together, one variable at a time: each
+    variable is traversed once, in cache-sized chunks, applying every check (and
+    removal) in config order and setting the qc bits directly, instead of once per
+    checker and handler with a new boolean array for each. The qc_ variables and
+    data are identical to those produced by tsdat. Any other quality manager (or a
+    variable that cannot be fused, e.g., a datetime variable) is run by tsdat.
+
+    ----------------------------------------------------------------------------"""
+
+    @staticmethod
+    def run(ds: xr.Dataset, config: Config, previous_data: xr.Dataset) -> xr.Dataset:
+        """----------------------------------------------------------------------------
+        Applies the quality managers defined in the given Config to the dataset.
+        Unlike tsdat's `QualityManagement.run()`, the quality manager definitions
+        are not modified, so a Config can be reused for many datasets.
+
+        Args:
+            ds (xr.Dataset): The dataset to apply quality managers to.
+            config (Config): The pipeline configuration.
+            previous_data (xr.Dataset): The dataset from the previous processing
+            interval, if any.
+
+        Returns:
+            xr.Dataset: The dataset after the quality managers have been applied.
+
+        ----------------------------------------------------------------------------"""
+        group: List[QualityManagerDefinition] = list()
+        for definition in config.quality_managers.values():
+            definition = _copy_definition(definition)
+            if _is_fusable(definition):
+                group.append(definition)
+                continue
+            ds = _run_fused(ds, config, group, previous_data)
+            group = list()
+            ds = QualityManager(ds, config, definition, previous_data).run()
+
+        return _run_fused(ds, config, group, previous_data)
+
+
+class _Step:
+    # One quality manager's check and handlers, as applied to one variable
+    def __init__(self, check: Optional[Callable[[np.ndarray], np.ndarray]]):
+        self.check = check
+        self.fill_value = None
+        self.bit: Optional[int] = None
+        self.correction: Optional[str] = None
+        self.failed = False
+
+
+def _copy_definition(definition: QualityManagerDefinition) -> QualityManagerDefinition:
+    # QualityManager resolves its variables by editing the definition's lists in place
+    definition = copy.copy(definition)
+    definition.variables = list(definition.variables)
+    definition.exclude = list(definition.exclude)
+    return definition
+
+
+def _is_fusable(definition: QualityManagerDefinition) -> bool:
+    if (definition.checker or {}).get("classname") not in _FUSED_CHECKERS:
+        return False
+    for handler in definition.handlers or []:
+        classname = handler.get("classname")
+        params = handler.get("parameters") or {}
+        if classname == _RECORD_HANDLER:
+            bit = params.get("bit")
+            if not isinstance(bit, int) or not 0 < bit < 32:
+                return False
+            if params.get("assessment") is None or params.get("meaning") is None:
+                return False
+        elif classname != _REMOVE_HANDLER:
+            return False
+    return True
+
+
+def _run_fused(
+    ds: xr.Dataset,
+    config: Config,
+    definitions: List[QualityManagerDefinition],
+    previous_data: xr.Dataset,
+) -> xr.Dataset:
+    managers = [
+        QualityManager(ds, config, definition, previous_data)
+        for definition in definitions
+    ]
+    variable_names = dict.fromkeys(
+        name for manager in managers for name in manager.variable_names
+    )
+    for variable_name in variable_names:
+        applicable = [m for m in managers if variable_name in m.variable_names]
+        if not _fuse_variable(ds, variable_name, applicable):
+            for manager in applicable:
+                manager.ds, manager.checker.ds = ds, ds
+                manager.variable_names, names = [variable_name], manager.variable_names
+                ds = manager.run()
+                manager.variable_names = names
+    return ds
+
+
+def _fuse_variable(
+    ds: xr.Dataset, variable_name: str, managers: List[QualityManager]
+) -> bool:
+    # Applies the managers' checks and handlers to the variable in a single pass.
+    # Returns False (before changing the dataset) if they cannot be fused.
+    data = ds[variable_name].values
+    if data.dtype.kind not in "fiu":
+        return False
+
+    steps: List[_Step] = list()
+    for manager in managers:
+        step = _build_step(ds, variable_name, manager.definition)
+        if step is None:
+            return False
+        steps.append(step)
+
+    qc, qc_name = None, None
+    if any(step.bit for step in steps):
+        qc_name = ds.qcfilter.check_for_ancillary_qc(variable_name)
+        if isinstance(qc_name, list):
+            qc_name = qc_name[0]
+        qc = ds[qc_name].values
+        if qc.dtype.kind not in "iu" or qc.shape != data.shape:
+            return False
+        if any(step.bit and 1 << (step.bit - 1) > np.iinfo(qc.dtype).max for step in steps):
+            return False
+        qc = _writeable(qc, ds, qc_name)
+
+    removes = any(step.fill_value is not None for step in steps)
+    if removes:
+        data = _writeable(data, ds, variable_name)
+
+    data_flat = data.reshape(-1)
+    qc_flat = None if qc is None else qc.reshape(-1)
+    for start in range(0, data_flat.size, _CHUNK_SIZE):
+        values = data_flat[start : start + _CHUNK_SIZE]
+        for step in steps:
+            if step.check is None:
+                continue
+            failed = step.check(values)
+            if not failed.any():
+                continue
+            step.failed = True
+            if step.fill_value is not None:
+                np.copyto(values, step.fill_value, where=failed)
+            if step.bit is not None:
+                flags = qc_flat[start : start + _CHUNK_SIZE]
+                bits = np.left_shift(failed, step.bit - 1, dtype=flags.dtype)
+                np.bitwise_or(flags, bits, out=flags)
+
+    for manager, step in zip(managers, steps):
+        for handler in manager.handlers or []:
+            _record_handler(ds, qc_name, handler)
+        if step.failed and step.fill_value is not None and step.correction:
+            DSUtil.record_corrections_applied(ds, variable_name, step.correction)
+
+    if removes and any(step.failed for step in steps if step.fill_value is not None):
+        ds[variable_name].data = data
+    if qc is not None:
+        ds[qc_name].values = qc
+    return True
+
+
+def _build_step(
+    ds: xr.Dataset, variable_name: str, definition: QualityManagerDefinition
+) -> Optional[_Step]:
+    variable = ds[variable_name]
+    dtype = variable.dtype
+    classname = definition.checker["classname"]
+
+    # The checks mirror tsdat's CheckMissing, CheckValidMin and CheckValidMax
+    if classname == "tsdat.qc.checkers.CheckMissing":
+        check = _missing_check(dtype, DSUtil.get_fill_value(ds, variable_name))
+    else:
+        is_min = classname.endswith("Min")
+        limit = variable.attrs.get("valid_range", None)
+        if isinstance(limit, List):
+            limit = limit[0] if is_min else limit[-1]
+        if limit is not None and np.ndim(limit) != 0:
+            return None
+        check = None if limit is None else _range_check(limit, is_min)
+
+    step = _Step(check)
+    for handler in definition.handlers or []:
+        params = handler.get("parameters") or {}
+        if handler["classname"] == _REMOVE_HANDLER:
+            fill_value = DSUtil.get_fill_value(ds, variable_name)
+            # RemoveFailedValues uses np.where, which may change the dtype
+            if fill_value is None:
+                return None
+            if np.result_type(np.empty(0, dtype), fill_value) != dtype:
+                return None
+            step.fill_value = np.array(fill_value).astype(dtype)
+            step.correction = params.get("correction", None)
+        else:
+            step.bit = params["bit"]
+    return step
+
+
+def _missing_check(dtype: np.dtype, fill_value) -> Callable[[np.ndarray], np.ndarray]:
+    missing = np.array(-9999 if fill_value is None else fill_value, dtype.type)
+    is_float = dtype.type in (float, np.float16, np.float32, np.float64)
+
+    def check(x: np.ndarray) -> np.ndarray:
+        failed = np.equal(x, missing)
+        return failed | np.isnan(x) if is_float else failed
+
+    return check
+
+
+def _range_check(limit, is_min: bool) -> Callable[[np.ndarray], np.ndarray]:
+    compare = np.less if is_min else np.greater
+
+    def check(x: np.ndarray) -> np.ndarray:
+        return compare(x, limit)
+
+    return check
+
+
+def _record_handler(ds: xr.Dataset, qc_name: Optional[str], handler: Dict):
+    # Adds the test's metadata to the qc variable as act's QCFilter.add_test() does.
+    # The qc bits themselves are set by the fused pass.
+    if handler["classname"] != _RECORD_HANDLER:
+        return
+    params = handler.get("parameters") or {}
+    attrs = ds[qc_name].attrs
+    bit = params["bit"]
+
+    flag_masks = np.array(attrs["flag_masks"])
+    mask_dtype = flag_masks.dtype
+    if not np.issubdtype(mask_dtype, np.integer):
+        mask_dtype = np.uint32
+    if np.iinfo(mask_dtype).max - (1 << (bit - 1)) <= -1:
+        mask_dtype = {1: np.uint16, 2: np.uint32, 4: np.uint64}.get(
+            np.dtype(mask_dtype).itemsize, mask_dtype
+        )
+    flag_masks = flag_masks.astype(mask_dtype)
+    flag_masks = np.append(flag_masks, np.array(1 << (bit - 1), dtype=mask_dtype))
+    attrs["flag_masks"] = list(flag_masks)
+
+    attrs.setdefault("flag_meanings", []).append(params["meaning"])
+    attrs.setdefault("flag_assessments", []).append(params["assessment"].capitalize())
+
+
+def _writeable(array: np.ndarray, ds: xr.Dataset, variable_name: str) -> np.ndarray:
+    # The fused pass updates arrays in place, so arrays that are read-only, not
+    # contiguous, or that may be shared with another variable are copied first
+    if not array.flags.writeable or not array.flags.c_contiguous:
+        return np.array(array)
+    for name, variable in ds.variables.items():
+        if name != variable_name and isinstance(variable.data, np.ndarray):
+            if np.may_share_memory(array, variable.data):
+                return np.array(array)
+    return array
@@ -0,0 +1,125 @@
+import hashlib
+import importlib
+import json
+import os
+import pkgutil
+
+from typing import Dict, List
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+MANIFEST_PATH = os.path.join(ROOT_DIR, "utils", "registry.json")
+
+
+def mapping_hash(module_name: str, parent_module: str = "ingest") -> str:
+    """----------------------------------------------------------------------------
+    Computes a fingerprint of an ingest's `mapping.py` file so that stale manifest
+    entries can be detected without importing the ingest.
+
+    Args:
+        module_name (str): The name of the ingest module (e.g., "wave_clallam").
+        parent_module (str, optional): The module under which individual ingests
+        live. Defaults to "ingest".
+
+    Returns:
+        str: The sha1 hex digest of the ingest's `mapping.py` file, or an empty
+        string if the ingest has no `mapping.py` file.
+
+    ----------------------------------------------------------------------------"""
+    mapping_file = os.path.join(ROOT_DIR, parent_module, module_name, "mapping.py")
+    if not os.path.isfile(mapping_file):
+        return ""
+    with open(mapping_file, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def build_manifest(parent_module: str = "ingest") -> Dict[str, Dict]:
+    """----------------------------------------------------------------------------
+    Imports every ingest under the parent module and records the information needed
+    to match files against its `mapping` without importing it again. Paths are
+    stored relative to the repository root.
+
+    Args:
+        parent_module (str, optional): The module (relative to the repository root
+        folder) under which individual ingests live. Defaults to "ingest".
+
+    Returns:
+        Dict[str, Dict]: A mapping of ingest module name to its `mapping.py`
+        fingerprint and the list of its registered specifications.
+
+    ----------------------------------------------------------------------------"""
+    manifest: Dict[str, Dict] = dict()
+    for ingest_module_info in pkgutil.iter_modules(
+        [os.path.join(ROOT_DIR, parent_module)]
+    ):
+        ingest_module_classname = f"{parent_module}.{ingest_module_info.name}"
+        ingest_module = importlib.import_module(ingest_module_classname)
+        entries: List[Dict] = list()
+        for regex, specification in ingest_module.mapping.items():
+            entries.append(
+                {
+                    "pattern": regex.pattern,
+                    "flags": regex.flags,
+                    "name": specification.name,
+                    "pipeline_config": os.path.relpath(
+                        specification.pipeline_config, ROOT_DIR
+                    ),
+                    "storage_config": os.path.relpath(
+                        specification.storage_config, ROOT_DIR
+                    ),
+                }
+            )
+        manifest[ingest_module_info.name] = {
+            "module": ingest_module_classname,
+            "mapping_hash": mapping_hash(ingest_module_info.name, parent_module),
+            "specifications": entries,
+        }
+    return manifest
+
+
+def write_manifest(
+    manifest_path: str = MANIFEST_PATH, parent_module: str = "ingest"
+) -> Dict[str, Dict]:
+    """----------------------------------------------------------------------------
+    Builds the ingest registry manifest and writes it to disk. This should be re-run
+    any time an ingest is added or its `mapping.py` file is changed.
+
+    Args:
+        manifest_path (str, optional): Where to write the manifest. Defaults to
+        `utils/registry.json`.
+        parent_module (str, optional): The module under which individual ingests
+        live. Defaults to "ingest".
+
+    Returns:
+        Dict[str, Dict]: The manifest that was written.
+
+    ----------------------------------------------------------------------------"""
+    manifest = build_manifest(parent_module)
+    with open(manifest_path, "w") as file:
+        json.dump(manifest, file, indent=4, sort_keys=True)
+        file.write("\n")
+    return manifest
+
+
+def load_manifest(manifest_path: str = MANIFEST_PATH) -> Dict[str, Dict]:
+    """----------------------------------------------------------------------------
+    Loads the ingest registry manifest from disk.
+
+    Args:
+        manifest_path (str, optional): The path to the manifest. Defaults to
+        `utils/registry.json`.
+
+    Returns:
+        Dict[str, Dict]: The manifest, or an empty dictionary if the manifest does
+        not exist.
+
+    ----------------------------------------------------------------------------"""
+    if not os.path.isfile(manifest_path):
+        return dict()
+    with open(manifest_path, "r") as file:
+        return json.load(file)
+
+
+if __name__ == "__main__":
+    write_manifest()
+    print(f"Wrote ingest registry manifest to {MANIFEST_PATH}")
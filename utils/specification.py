@@ -1,4 +1,6 @@
+import importlib
 import os
+from .config_cache import load_pipeline_config, load_storage
 from .pipeline import IngestPipeline
 
 
@@ -38,12 +40,76 @@ class IngestSpec:
         self.storage_config = storage_config
         self.name = name
 
-    def instantiate(self) -> IngestPipeline:
+    def instantiate(self, use_cache: bool = True) -> IngestPipeline:
         """----------------------------------------------------------------------------
         Instantiates the pipeline using the previously-provided specifications.
 
+        Args:
+            use_cache (bool, optional): Whether to reuse the parsed pipeline config and
+            instantiated storage from earlier calls in this process, if the config
+            files and the environment variables they reference are unchanged. See
+            `utils.config_cache`. Defaults to True.
+
         Returns:
             IngestPipeline: An instance of the provided pipeline class.
 
         ----------------------------------------------------------------------------"""
-        return self.pipeline(self.pipeline_config, self.storage_config)
+        if not use_cache:
+            return self.pipeline(self.pipeline_config, self.storage_config)
+        return self.pipeline(
+            load_pipeline_config(self.pipeline_config),
+            load_storage(self.storage_config),
+        )
+
+
+class LazyIngestSpec:
+    """----------------------------------------------------------------------------
+    Placeholder for an `IngestSpec` read from the ingest registry manifest. Holds
+    enough information to match files and label the ingest, but defers importing
+    the ingest module (and its dependencies) until `resolve()` is called.
+
+    ----------------------------------------------------------------------------"""
+
+    def __init__(
+        self,
+        module: str,
+        pattern: str,
+        pipeline_config: str,
+        storage_config: str,
+        name: str,
+    ) -> None:
+        """----------------------------------------------------------------------------
+        Instantiates a LazyIngestSpec class.
+
+        Args:
+            module (str): The full name of the ingest module that defines the
+            specification (e.g., "ingest.wave_clallam").
+            pattern (str): The regex pattern the specification is registered under.
+            pipeline_config (str): The path to the pipeline config file.
+            storage_config (str): The path to the storage config file.
+            name (str): The name of the ingest specification.
+
+        ----------------------------------------------------------------------------"""
+        self.module = module
+        self.pattern = pattern
+        self.pipeline_config = pipeline_config
+        self.storage_config = storage_config
+        self.name = name
+
+    def resolve(self) -> IngestSpec:
+        """----------------------------------------------------------------------------
+        Imports the ingest module and returns the `IngestSpec` this placeholder
+        stands in for.
+
+        Returns:
+            IngestSpec: The specification registered in the ingest's `mapping`.
+
+        ----------------------------------------------------------------------------"""
+        ingest_module = importlib.import_module(self.module)
+        for regex, specification in ingest_module.mapping.items():
+            if regex.pattern == self.pattern and specification.name == self.name:
+                return specification
+        raise LookupError(
+            f"'{self.name}' ({self.pattern}) is not in {self.module}.mapping; the"
+            " ingest registry manifest is stale. Run `python -m utils.registry`."
+        )
@@ -0,0 +1,146 @@
+import datetime
+import os
+import threading
+import xarray as xr
+
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+from .utils import _time_dims
+
+
+class TailCache:
+    """----------------------------------------------------------------------------
+    Least-recently-used cache of the trailing records of the last dataset saved for
+    each datastream. Pipelines put each dataset they save into the cache and look up
+    the previous dataset of the next one here before fetching it from storage, so
+    consecutive runs on the same datastream (e.g., the days of `run_daily()` or the
+    files picked up by the watcher) do not read back the file that was just written.
+
+    Storage may have gained a newer file since a tail was cached (e.g., one saved by
+    another worker process, or reprocessed out of order), so callers pass the date
+    of the latest file storage holds before the dataset being processed, and the
+    tail is only returned if that file was written from the cached dataset.
+
+    Only the trailing `max_records` records along the time dimension(s) are kept:
+    tsdat's checks only compare the first record of a dataset with the last record
+    of the previous one. Memory is bounded by `max_bytes`; the least recently used
+    datastreams are evicted first and a tail larger than the budget is not cached.
+
+    ----------------------------------------------------------------------------"""
+
+    def __init__(self, max_records: int = 1000, max_bytes: int = 64 * 2**20):
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[str, str, xr.Dataset]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(
+        self, key: Hashable, dataset: xr.Dataset, start: str, end: Optional[str] = None
+    ):
+        """----------------------------------------------------------------------------
+        Caches the tail of a dataset that was just saved, replacing any previous entry
+        for the same key.
+
+        Args:
+            key (Hashable): Identifies the datastream, e.g., the storage root and the
+            datastream name.
+            dataset (xr.Dataset): The dataset that was saved.
+            start (str): The start of the dataset, formatted like the dates in the
+            saved filenames (e.g., "20210106.000000").
+            end (str, optional): The end of the dataset, formatted the same way. Files
+            split from the dataset (e.g., per day) start between `start` and `end`.
+            Defaults to `start`.
+
+        ----------------------------------------------------------------------------"""
+        tail = dataset.isel(
+            {dim: slice(-self.max_records, None) for dim in _time_dims(dataset)}
+        )
+        # Copied so that the tail does not keep the whole dataset's arrays in memory
+        tail = tail.copy(deep=True)
+        with self._lock:
+            self._pop(key)
+            if tail.nbytes > self.max_bytes:
+                return
+            self._entries[key] = (start, end or start, tail)
+            self.nbytes += tail.nbytes
+            while self.nbytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def get(
+        self, key: Hashable, start: str, latest: Optional[str] = None
+    ) -> Optional[xr.Dataset]:
+        """----------------------------------------------------------------------------
+        Returns the cached tail of the dataset that storage would return as the
+        previous dataset of a dataset starting at `start`, i.e., if the cached dataset
+        starts before `start` and no more than one day earlier, and if the latest file
+        in storage before `start` was split from the cached dataset.
+
+        Args:
+            key (Hashable): Identifies the datastream.
+            start (str): The start of the dataset being processed, formatted like the
+            dates in the saved filenames.
+            latest (str, optional): The date (from its filename) of the latest file in
+            storage that starts within the day before `start`. If not provided,
+            storage is assumed not to have changed since the tail was cached.
+
+        Returns:
+            Optional[xr.Dataset]: The cached tail, or None if it is not cached.
+
+        ----------------------------------------------------------------------------"""
+        # Mirrors the search window of tsdat's `fetch_previous_file()`
+        earliest = datetime.datetime.strptime(start, "%Y%m%d.%H%M%S")
+        earliest = (earliest - datetime.timedelta(days=1)).strftime("%Y%m%d.%H%M%S")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            first, last, tail = entry
+            if latest is None and not earliest <= first < start:
+                return None
+            if latest is not None and not first <= latest <= last:
+                return None
+            self._entries.move_to_end(key)
+            return tail.copy(deep=False)
+
+    def clear(self):
+        """----------------------------------------------------------------------------
+        Removes every entry from the cache.
+
+        ----------------------------------------------------------------------------"""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _pop(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[2].nbytes
+
+
+_TAIL_CACHE: Optional[TailCache] = None
+
+
+def get_tail_cache() -> TailCache:
+    """----------------------------------------------------------------------------
+    Returns the process-wide `TailCache` used by the pipelines, creating it on first
+    use. Its size is configured by the `TAIL_CACHE_RECORDS` (default 1000) and
+    `TAIL_CACHE_MB` (default 64) environment variables; set `TAIL_CACHE_MB=0` to
+    always read the previous dataset from storage.
+
+    Returns:
+        TailCache: The shared cache.
+
+    ----------------------------------------------------------------------------"""
+    global _TAIL_CACHE
+    if _TAIL_CACHE is None:
+        _TAIL_CACHE = TailCache(
+            max_records=int(os.environ.get("TAIL_CACHE_RECORDS", 1000)),
+            max_bytes=int(float(os.environ.get("TAIL_CACHE_MB", 64)) * 2**20),
+        )
+    return _TAIL_CACHE
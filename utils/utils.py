@@ -1,7 +1,9 @@
 import os
 import matplotlib as mpl
 import matplotlib.pyplot as plt
-from typing import Any
+import numpy as np
+import xarray as xr
+from typing import Any, List, Optional
 
 
 def expand(relpath: str, invocation_file: str) -> str:
@@ -61,3 +63,203 @@ def add_colorbar(ax: plt.Axes, plot: Any, label: str = "") -> plt.colorbar:
     cb.ax.tick_params(size=0)
     cb.ax.minorticks_off()
     return cb
+
+
+def axes_pixel_width(ax: plt.Axes) -> int:
+    """----------------------------------------------------------------------------
+    Returns the width of the provided `plt.Axes` in display pixels, i.e., the number
+    of distinct x positions that data drawn on it can occupy when the figure is
+    saved at the figure's dpi.
+
+    Args:
+        ax (plt.Axes): The axes that will be drawn on.
+
+    Returns:
+        int: The width of the axes in pixels.
+
+    ----------------------------------------------------------------------------"""
+    return max(1, int(np.ceil(ax.get_window_extent().width)))
+
+
+def bin_to_pixels(
+    da: xr.DataArray, n_bins: int, dim: str = "time", how: str = "mean"
+) -> xr.DataArray:
+    """----------------------------------------------------------------------------
+    Reduces a (typically 2-D, e.g., range x time) field to at most `n_bins`
+    equal-width bins along `dim` before it is drawn with `pcolormesh`, so that the
+    number of drawn cells depends on the width of the plot (see `axes_pixel_width`)
+    rather than on the length of the deployment. NaNs are ignored; bins with no
+    valid data (e.g., gaps in the record) are NaN. Data that already fit in
+    `n_bins` are returned unchanged.
+
+    Args:
+        da (xr.DataArray): The data to bin. `dim` must have a sorted numeric or
+        datetime64 coordinate.
+        n_bins (int): The maximum number of bins, e.g., the plot width in pixels.
+        dim (str, optional): The dimension to bin along. Defaults to "time".
+        how (str, optional): How the values in each bin are reduced: "mean", "max",
+        "min", or "circmean" (the circular mean of angles in degrees, e.g., for
+        directions). Defaults to "mean".
+
+    Returns:
+        xr.DataArray: The binned data, with the bin centers as the `dim` coordinate.
+
+    ----------------------------------------------------------------------------"""
+    if how not in ("mean", "max", "min", "circmean"):
+        raise ValueError(f"Unknown reduction '{how}'.")
+    if da.sizes[dim] <= n_bins:
+        return da
+
+    coord = da[dim].values
+    # Offsets from the first sample, so that datetimes keep ns precision as floats
+    x = (coord - coord[0]).astype("float64")
+    edges = np.linspace(0, x[-1], n_bins + 1)
+    starts = np.searchsorted(x, edges[:-1], side="left")
+    starts[0] = 0
+    counts = np.diff(np.append(starts, x.size))
+    empty = counts == 0
+
+    axis = da.get_axis_num(dim)
+    values = da.values.astype(np.result_type(da.dtype, np.float32))
+    valid = ~np.isnan(values)
+    n_valid = np.add.reduceat(valid, starts, axis=axis)
+    if how == "mean":
+        binned = np.add.reduceat(np.where(valid, values, 0), starts, axis=axis)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            binned = binned / n_valid
+    elif how == "circmean":
+        radians = np.deg2rad(values)
+        sin, cos = np.sin(radians), np.cos(radians, out=radians)
+        sin[~valid], cos[~valid] = 0, 0
+        sin = np.add.reduceat(sin, starts, axis=axis)
+        cos = np.add.reduceat(cos, starts, axis=axis)
+        binned = np.rad2deg(np.arctan2(sin, cos, dtype="float64")) % 360
+    else:
+        reduce = np.fmax if how == "max" else np.fmin
+        binned = reduce.reduceat(values, starts, axis=axis)
+
+    shape = [1] * binned.ndim
+    shape[axis] = n_bins
+    binned[(n_valid == 0) | empty.reshape(shape)] = np.nan
+
+    centers = (edges[:-1] + edges[1:]) / 2
+    if coord.dtype.kind == "M":
+        centers = coord[0] + centers.round().astype("int64").astype(coord[0] - coord[0])
+    else:
+        centers = coord[0] + centers
+    coords = {name: da[name] for name in da.dims if name != dim and name in da.coords}
+    coords[dim] = centers
+    return xr.DataArray(
+        binned, dims=da.dims, coords=coords, name=da.name, attrs=da.attrs
+    )
+
+
+def decimate_minmax(values: np.ndarray, n_bins: int) -> np.ndarray:
+    """----------------------------------------------------------------------------
+    Selects the samples of a line series worth drawing at a width of `n_bins`
+    pixels: the series is split into `n_bins` consecutive groups of samples, and
+    the first, last, minimum, and maximum sample of each group are kept. The drawn
+    line then spans the same range in every pixel column as the full series, so
+    spikes and extremes are preserved, while at most 4 * `n_bins` points are
+    drawn regardless of the length of the series. NaNs are ignored.
+
+    Args:
+        values (np.ndarray): The 1-D series to decimate.
+        n_bins (int): The number of groups, e.g., the plot width in pixels.
+
+    Returns:
+        np.ndarray: The sorted indices of the samples to draw, e.g.,
+        `ax.plot(time[indices], values[indices])`.
+
+    ----------------------------------------------------------------------------"""
+    values = np.asarray(values)
+    n = values.size
+    if n <= 4 * n_bins:
+        return np.arange(n)
+
+    size = -(-n // n_bins)
+    n_groups = -(-n // size)
+    padded = np.full(n_groups * size, np.nan)
+    padded[:n] = values
+    groups = padded.reshape(n_groups, size)
+    offsets = np.arange(n_groups) * size
+
+    nan = np.isnan(groups)
+    imin = np.argmin(np.where(nan, np.inf, groups), axis=1) + offsets
+    imax = np.argmax(np.where(nan, -np.inf, groups), axis=1) + offsets
+    ifirst = offsets
+    ilast = np.minimum(offsets + size - 1, n - 1)
+    return np.unique(np.concatenate([ifirst, imin, imax, ilast]))
+
+
+def partition_by_time(
+    ds: xr.Dataset,
+    interval: int = 1,
+    unit: str = "D",
+    time_dims: Optional[List[str]] = None,
+    align: bool = False,
+) -> List[xr.Dataset]:
+    """----------------------------------------------------------------------------
+    Splits the dataset into consecutive partitions spanning `interval` `unit`s each,
+    starting from the first timestamp of the primary time dimension ("time" if it is
+    one of the `time_dims`, otherwise the first of them), or from the multiple of the
+    interval (since the Unix epoch) preceding it if `align` is True. Every time dimension is
+    split at the same boundaries: the boundary indices are found all at once with
+    `np.searchsorted` and each partition is an integer-indexed (`isel`) view, so
+    splitting is linear in the size of the time coordinates. Partitions are
+    half-open intervals, except for the last one, which extends to the end of every
+    time dimension. Intervals with no data along the primary time dimension are
+    skipped.
+
+    Args:
+        ds (xr.Dataset): The dataset to split. Each time dimension must have a
+        sorted datetime64 coordinate.
+        interval (int, optional): The length of each partition. Defaults to 1.
+        unit (str, optional): The numpy datetime unit of `interval`. Defaults to
+        "D".
+        time_dims (List[str], optional): The time dimensions to split along.
+        Defaults to every dimension with a datetime64 coordinate.
+        align (bool, optional): Whether partition boundaries fall on multiples of the
+        interval, e.g., on UTC midnights for daily partitions. Defaults to False.
+
+    Returns:
+        List[xr.Dataset]: The partitions of the dataset, in time order.
+
+    ----------------------------------------------------------------------------"""
+    if time_dims is None:
+        time_dims = _time_dims(ds)
+    if not time_dims:
+        raise ValueError("The dataset has no datetime64 dimensions to split along.")
+    primary = "time" if "time" in time_dims else time_dims[0]
+
+    times = ds[primary].values
+    delta = np.timedelta64(int(interval), unit)
+    if align:
+        start = times[0] - (times[0] - np.datetime64(0, "ns")) % delta
+        n_partitions = int((times[-1] - start) // delta) + 1
+    else:
+        start = times[0]
+        n_partitions = max(1, int(np.ceil((times[-1] - start) / delta)))
+    edges = start + delta * np.arange(1, n_partitions)
+
+    bounds = dict()
+    for dim in time_dims:
+        indices = np.searchsorted(ds[dim].values, edges, side="left")
+        bounds[dim] = np.concatenate([[0], indices, [ds.sizes[dim]]])
+
+    partitions: List[xr.Dataset] = list()
+    for i in range(n_partitions):
+        start, stop = bounds[primary][i], bounds[primary][i + 1]
+        if start == stop:
+            continue
+        slices = {dim: slice(bounds[dim][i], bounds[dim][i + 1]) for dim in time_dims}
+        partitions.append(ds.isel(slices))
+    return partitions
+
+
+def _time_dims(ds: xr.Dataset) -> List[str]:
+    return [
+        dim
+        for dim in ds.dims
+        if dim in ds.coords and np.issubdtype(ds[dim].dtype, np.datetime64)
+    ]
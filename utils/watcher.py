@@ -0,0 +1,214 @@
+import os
+import time
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from .dispatcher import (
+    DispatchResult,
+    PipelineDispatcher,
+    _dispatch_file,
+    _init_worker,
+    _log_result,
+)
+from .logger import logger, log_exception, worker_log_config
+from .specification import IngestSpec
+
+
+class FolderWatcher:
+    """----------------------------------------------------------------------------
+    Watches a folder for newly-landed data files and dispatches each one to its
+    registered ingest as soon as it has finished being written. The process stays
+    resident, so the ingest registry, imported ingest modules, and parsed configs are
+    reused across files instead of being rebuilt for every file.
+
+    New files are detected by polling the folder. A file is considered fully written
+    once its size and modification time have not changed for `settle` seconds.
+    Files are processed by a pool of `workers` long-lived worker processes, which
+    bounds the number of files processed concurrently.
+
+    ----------------------------------------------------------------------------"""
+
+    def __init__(
+        self,
+        directory: str,
+        dispatcher: PipelineDispatcher,
+        workers: int = 1,
+        poll_interval: float = 1.0,
+        settle: float = 2.0,
+        recursive: bool = False,
+        process_existing: bool = False,
+    ):
+        """----------------------------------------------------------------------------
+        Instantiates a FolderWatcher class.
+
+        Args:
+            directory (str): The folder to watch.
+            dispatcher (PipelineDispatcher): The dispatcher used to match files to
+            ingests before they are handed to a worker.
+            workers (int, optional): The number of worker processes. Defaults to 1.
+            poll_interval (float, optional): Seconds between scans of the folder.
+            Defaults to 1.0.
+            settle (float, optional): Seconds a file's size and modification time must
+            be unchanged before it is dispatched. Defaults to 2.0.
+            recursive (bool, optional): Whether to also watch subfolders. Defaults to
+            False.
+            process_existing (bool, optional): Whether files already in the folder
+            when the watcher starts should be processed. Defaults to False.
+
+        ----------------------------------------------------------------------------"""
+        self.directory = directory
+        self.dispatcher = dispatcher
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.settle = settle
+        self.recursive = recursive
+
+        # filepath -> (size, mtime, time at which that size/mtime was first seen)
+        self._pending: Dict[str, Tuple[int, float, float]] = dict()
+        # filepath -> (size, mtime) of the version that was last handled
+        self._handled: Dict[str, Tuple[int, float]] = dict()
+        # future -> (filepath, matched ingest) of each file being processed
+        self._in_flight: Dict[Future, Tuple[str, IngestSpec]] = dict()
+
+        if not process_existing:
+            for filepath, size, mtime in self._scan():
+                self._handled[filepath] = (size, mtime)
+
+    def run(
+        self,
+        callback: Optional[Callable[[DispatchResult], None]] = None,
+        max_polls: Optional[int] = None,
+    ):
+        """----------------------------------------------------------------------------
+        Watches the folder until interrupted (or until `max_polls` scans have been
+        made), dispatching files as they become ready.
+
+        Args:
+            callback (Callable[[DispatchResult], None], optional): Called with the
+            result of each dispatched file. Defaults to logging the result.
+            max_polls (int, optional): Stop after this many scans of the folder and wait
+            for in-flight files to finish. Defaults to None (run until interrupted).
+
+        ----------------------------------------------------------------------------"""
+        callback = callback or _log_result
+        polls = 0
+        logger.info(f"Watching {self.directory} for new files")
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(
+                self.dispatcher._ledger_path(),
+                self.dispatcher._plot_queue is not None,
+                worker_log_config(),
+            ),
+        ) as executor:
+            try:
+                while max_polls is None or polls < max_polls:
+                    for filepath, specification in self.poll():
+                        future = executor.submit(
+                            _dispatch_file, filepath, specification.name
+                        )
+                        self._in_flight[future] = (filepath, specification)
+                    self._collect(callback)
+                    polls += 1
+                    time.sleep(self.poll_interval)
+            except KeyboardInterrupt:
+                logger.info("Stopping folder watcher")
+            finally:
+                for future, (filepath, specification) in self._in_flight.items():
+                    self._report(future, filepath, specification, callback)
+                self._in_flight.clear()
+
+    def poll(self) -> List[Tuple[str, IngestSpec]]:
+        """----------------------------------------------------------------------------
+        Scans the folder once and returns the files that have finished being written
+        and match a registered ingest. Each version of a file is only returned once.
+
+        Returns:
+            List[Tuple[str, IngestSpec]]: The filepaths that are ready to be
+            dispatched, each with the ingest it matched.
+
+        ----------------------------------------------------------------------------"""
+        now = time.monotonic()
+        ready: List[Tuple[str, IngestSpec]] = list()
+        seen: Set[str] = set()
+
+        for filepath, size, mtime in self._scan():
+            seen.add(filepath)
+            if self._handled.get(filepath) == (size, mtime):
+                continue
+
+            pending = self._pending.get(filepath)
+            if pending is None or pending[:2] != (size, mtime):
+                self._pending[filepath] = (size, mtime, now)
+                if self.settle > 0:
+                    continue
+                pending = self._pending[filepath]
+
+            if now - pending[2] < self.settle:
+                continue
+
+            del self._pending[filepath]
+            self._handled[filepath] = (size, mtime)
+            try:
+                specification = self.dispatcher._cache.match_filepath([filepath])
+            except LookupError:
+                logger.debug("Ignoring %s: no registered ingest matches it", filepath)
+                continue
+            ready.append((filepath, specification))
+
+        # Forget files that have been removed (e.g., moved away after processing)
+        for filepath in set(self._pending) - seen:
+            del self._pending[filepath]
+        for filepath in set(self._handled) - seen:
+            del self._handled[filepath]
+
+        return ready
+
+    def _scan(self) -> List[Tuple[str, int, float]]:
+        files: List[Tuple[str, int, float]] = list()
+        folders = [self.directory]
+        while folders:
+            try:
+                entries = list(os.scandir(folders.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if self.recursive:
+                            folders.append(entry.path)
+                        continue
+                    if entry.name.startswith("."):
+                        continue
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append(
+                    (os.path.realpath(entry.path), stat.st_size, stat.st_mtime)
+                )
+        return files
+
+    def _collect(self, callback: Callable[[DispatchResult], None]):
+        for future in [future for future in self._in_flight if future.done()]:
+            filepath, specification = self._in_flight.pop(future)
+            self._report(future, filepath, specification, callback)
+
+    def _report(
+        self,
+        future: Future,
+        filepath: str,
+        specification: IngestSpec,
+        callback: Callable[[DispatchResult], None],
+    ):
+        try:
+            result = future.result()
+        except BaseException as error:
+            # The worker process itself died (e.g., killed by the OS)
+            result = DispatchResult(filepath, None, False, 0.0, repr(error))
+        if result.plot_files:
+            self.dispatcher.submit_plots(specification, result)
+        try:
+            callback(result)
+        except BaseException:
+            log_exception(f"Result callback failed for {result.filepath}")
@@ -0,0 +1,145 @@
+import os
+import xarray as xr
+
+from tsdat import AbstractFileHandler, DatastreamStorage
+from tsdat.config import Config
+from tsdat.utils import DSUtil
+from typing import Dict, List
+from .logger import logger
+from .utils import _time_dims
+
+
+class ZarrHandler(AbstractFileHandler):
+    """----------------------------------------------------------------------------
+    FileHandler to write to and read from Zarr directory stores. Each datastream is
+    written to a single store that new data are appended to along its time
+    dimension(s), so adding a day of data only writes that day's chunks. Arrays are
+    compressed with Blosc, which compresses chunks on multiple threads. Takes the
+    following optional parameters from the storage config file:
+
+    .. code-block:: yaml
+
+        output:
+          zarr:
+            file_extension: ".zarr"
+            classname: utils.ZarrHandler
+            parameters:
+              # Folder for the datastream stores. Defaults to each datastream's
+              # folder in the (local) storage root.
+              store_dir: ${ROOT_DIR}/zarr
+              # Chunk length along the time dimensions. Matching this to the number of
+              # samples in each appended file means appends never rewrite a chunk.
+              time_chunk: 86400
+              # Parameters passed to numcodecs.Blosc
+              compressor: {cname: zstd, clevel: 3, shuffle: 1}
+              # Number of threads Blosc uses to compress
+              threads: 4
+              # Time dimensions to append along. Defaults to every datetime64 dim
+              time_dims: [time]
+
+    ----------------------------------------------------------------------------"""
+
+    def write(
+        self, ds: xr.Dataset, filename: str, config: Config = None, **kwargs
+    ) -> None:
+        """----------------------------------------------------------------------------
+        Writes the dataset to the Zarr store at the provided path, creating the store
+        if it does not exist and otherwise appending the data along its time
+        dimension(s). Data that are not newer than the data already in the store are
+        not written again.
+
+        Args:
+            ds (xr.Dataset): The dataset to write.
+            filename (str): The path to the Zarr store.
+            config (Config, optional): Optional Config object. Defaults to None.
+
+        ----------------------------------------------------------------------------"""
+        import numcodecs
+
+        numcodecs.blosc.use_threads = True
+        numcodecs.blosc.set_nthreads(self.parameters.get("threads", os.cpu_count()))
+
+        time_dims = self.parameters.get("time_dims") or _time_dims(ds)
+        if not os.path.exists(filename):
+            ds.to_zarr(filename, mode="w-", encoding=self._encoding(ds, time_dims))
+            return
+
+        with xr.open_zarr(filename) as store:
+            last_times = {dim: store[dim].values[-1] for dim in time_dims}
+        for dim in time_dims:
+            new_data = ds.isel({dim: ds[dim].values > last_times[dim]})
+            if new_data.sizes[dim] < ds.sizes[dim]:
+                logger.warning(
+                    f"Skipping {ds.sizes[dim] - new_data.sizes[dim]} value(s) of "
+                    f"'{dim}' already in {filename}"
+                )
+            if new_data.sizes[dim] == 0:
+                continue
+            names = [name for name in ds.data_vars if dim in ds[name].dims] or [dim]
+            new_data[names].to_zarr(filename, append_dim=dim)
+
+    def read(self, filename: str, **kwargs) -> xr.Dataset:
+        """----------------------------------------------------------------------------
+        Lazily opens the Zarr store at the provided path.
+
+        Args:
+            filename (str): The path to the Zarr store.
+
+        Returns:
+            xr.Dataset: The (dask-backed) dataset.
+
+        ----------------------------------------------------------------------------"""
+        return xr.open_zarr(filename)
+
+    def append(
+        self, ds: xr.Dataset, storage: DatastreamStorage, config: Config = None
+    ) -> str:
+        """----------------------------------------------------------------------------
+        Appends the dataset to its datastream's store. Zarr stores are directories
+        that are updated in place, so they are written directly rather than through a
+        temporary file that is then copied into storage.
+
+        Args:
+            ds (xr.Dataset): The dataset to write.
+            storage (DatastreamStorage): The storage the pipeline is saving to. Used to
+            locate the store if the `store_dir` parameter is not set.
+            config (Config, optional): Optional Config object. Defaults to None.
+
+        Returns:
+            str: The path to the Zarr store.
+
+        ----------------------------------------------------------------------------"""
+        datastream_name = DSUtil.get_datastream_name(ds, config)
+        store_dir = self.parameters.get("store_dir")
+        if store_dir is None:
+            root = getattr(storage, "_root", None)
+            if root is None or not os.path.isdir(root):
+                raise ValueError(
+                    "ZarrHandler requires a 'store_dir' parameter when the storage is "
+                    "not on the local filesystem."
+                )
+            store_dir = DSUtil.get_datastream_directory(datastream_name, root=root)
+        os.makedirs(store_dir, exist_ok=True)
+
+        store_path = os.path.join(store_dir, f"{datastream_name}.zarr")
+        self.write(ds, store_path, config)
+        return store_path
+
+    def _encoding(self, ds: xr.Dataset, time_dims: List[str]) -> Dict[str, Dict]:
+        from numcodecs import Blosc
+
+        compressor = Blosc(**self.parameters.get("compressor", {"cname": "zstd"}))
+        time_chunk = self.parameters.get("time_chunk", 86400)
+
+        encoding: Dict[str, Dict] = dict()
+        for name, variable in ds.variables.items():
+            var_encoding = dict(compressor=compressor)
+            if variable.dtype.kind in "OSU" or 0 in variable.shape:
+                encoding[name] = var_encoding
+                continue
+            var_encoding["chunks"] = tuple(
+                time_chunk if dim in time_dims else size
+                for dim, size in zip(variable.dims, variable.shape)
+            )
+            encoding[name] = var_encoding
+        return encoding